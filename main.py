@@ -46,6 +46,24 @@ app.include_router(agents_router)
 app.include_router(reports_router)
 app.include_router(training_router)
 
+# In-process RAG watcher: ingests new agent CSV outputs as they are written
+from services.api.rag.watcher import start_rag_watcher, stop_rag_watcher
+
+@app.on_event("startup")
+def start_watcher():
+    start_rag_watcher()
+
+@app.on_event("shutdown")
+def stop_watcher():
+    stop_rag_watcher()
+
+# Pooled keep-alive connections to Ollama / the LLM wrappers
+from services.api.llm.http_pool import llm_client
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_client().aclose()
+
 # Root/health
 @app.get("/")
 def root():
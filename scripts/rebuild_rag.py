@@ -1,16 +1,15 @@
 #!/usr/bin/env python3
-"""Reset and rebuild the chatbot RAG store."""
+"""Refresh (or with --full, reset and rebuild) the chatbot RAG store."""
 from __future__ import annotations
 
+import argparse
 import sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(ROOT))
 
-from services.api.rag.chroma_store import reset_collection  # noqa: E402
-from services.api.rag.ingest_agents import ingest_agent_pages  # noqa: E402
-from services.api.rag.ingest_csv import ingest_all_csvs, ingest_text_blob  # noqa: E402
+from services.api.rag.refresh import refresh_rag_store  # noqa: E402
 
 
 TARGET_DIRS = [
@@ -21,31 +20,25 @@ TARGET_DIRS = [
 ]
 
 
-def ingest_directory(path: str, namespace: str) -> None:
-    base = Path(path)
-    if not base.exists():
-        return
-    for file in base.rglob("*"):
-        if not file.is_file():
-            continue
-        try:
-            text = file.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            continue
-        ingest_text_blob(text, source=f"{namespace}:{file}", agent_id=namespace)
-
-
 def main() -> None:
-    print("Resetting vector store…")
-    reset_collection()
-    print("Ingesting CSV artifacts…")
-    ingest_all_csvs()
-    print("Ingesting agent UI pages…")
-    ingest_agent_pages()
-    for path, namespace in TARGET_DIRS:
-        print(f"Ingesting directory {path} → namespace {namespace}")
-        ingest_directory(path, namespace)
-    print("RAG rebuild complete.")
+    parser = argparse.ArgumentParser(description="Sync the chatbot RAG store with CSV outputs, UI pages and docs.")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Reset the vector store and re-ingest everything instead of only changed files.",
+    )
+    args = parser.parse_args()
+
+    print("Resetting and rebuilding vector store…" if args.full else "Refreshing changed sources…")
+    stats = refresh_rag_store(full=args.full, text_dirs=TARGET_DIRS)
+    for kind, kind_stats in stats.items():
+        if isinstance(kind_stats, dict):
+            print(
+                f"  {kind:<9} indexed={kind_stats['files_processed']} unchanged={kind_stats['unchanged']} "
+                f"removed={kind_stats['removed']} rows={kind_stats['rows_indexed']} "
+                f"near_dupes_skipped={kind_stats['duplicates_skipped']}"
+            )
+    print(f"RAG {stats['mode']} refresh complete in {stats['seconds']}s.")
 
 
 if __name__ == "__main__":
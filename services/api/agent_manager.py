@@ -27,9 +27,11 @@ from transformers import (
 # Import existing Ollama client
 try:
     from services.api.llm.ollama_client import ollama_generate, OllamaError, OLLAMA_URL, OLLAMA_MODEL
+    from services.api.llm.http_pool import llm_client_sync
 except ImportError:
     # Fallback if Ollama client not available
     ollama_generate = None
+    llm_client_sync = None
     OllamaError = Exception
     OLLAMA_URL = "http://localhost:11434"
     OLLAMA_MODEL = "phi3:latest"
@@ -97,8 +99,7 @@ class AgentManager:
         # Check Ollama availability
         if ollama_generate:
             try:
-                import requests
-                resp = requests.get(f"{OLLAMA_URL.rstrip('/')}/api/tags", timeout=2)
+                resp = llm_client_sync().request("GET", f"{OLLAMA_URL.rstrip('/')}/api/tags", timeout=2, retries=0)
                 if resp.status_code == 200:
                     self.loaded_models["ollama"] = True
                     logger.info("✅ Ollama server detected")
@@ -345,10 +346,10 @@ class AgentManager:
 
         model_name = model or "sentence-transformers/all-MiniLM-L6-v2"
         
-        # Try sentence-transformers first (faster, better)
+        # Try sentence-transformers first (faster, better); models are shared process-wide
         try:
-            from sentence_transformers import SentenceTransformer
-            st_model = SentenceTransformer(model_name)
+            from services.api.rag.encoder_registry import get_encoder
+            st_model = get_encoder(model_name)
             embeddings = st_model.encode(text if isinstance(text, list) else [text])
             result = embeddings[0].tolist() if isinstance(text, str) else embeddings.tolist()
             return {"result": result, "source": "sentence_transformers"}
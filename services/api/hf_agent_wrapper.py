@@ -233,6 +233,18 @@ class HuggingFaceAgent:
         """Generate embeddings for text."""
         model_name = model or "sentence-transformers/all-MiniLM-L6-v2"
         device_map = -1 if self.device == "cpu" else 0
+
+        # Prefer the process-wide sentence-transformers encoder over a fresh pipeline per call
+        try:
+            from services.api.rag.encoder_registry import get_encoder
+            encoder = get_encoder(model_name, device=self.device)
+            is_single = isinstance(text, str)
+            vectors = encoder.encode([text] if is_single else list(text), normalize_embeddings=normalize)
+            return vectors[0].tolist() if is_single else vectors.tolist()
+        except ImportError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Shared encoder unavailable, falling back to pipeline: {e}")
         
         try:
             emb_pipe = pipeline(
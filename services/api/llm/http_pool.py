@@ -0,0 +1,300 @@
+"""Pooled HTTP client shared by every LLM call site (Ollama, the Gemma wrapper).
+
+One ``httpx.AsyncClient`` is kept per event loop and host, so connections
+stay alive between calls and each host gets at most
+``LLM_MAX_CONNECTIONS_PER_HOST`` of them. Timeouts are split into connect
+and read; the read timeout bounds the gap between bytes, so a long
+generation is fine as long as the model keeps producing tokens.
+
+Failures that happen before the server saw the request (refused or timed out
+connects, an exhausted pool) and 429/503 answers are retried with exponential
+backoff and full jitter. Idempotent requests (GET, ...) are also retried on
+502/504 and on a pooled keep-alive socket the server already closed; a POST
+is not, because the model may already be generating for it. A request that
+reached the model and then timed out is not retried: that would only double
+the wait.
+
+``llm_client()`` is for coroutines (FastAPI handlers). ``llm_client_sync()``
+runs the same client on a private event-loop thread for blocking code
+(Streamlit pages, worker threads, the agent manager).
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Dict, FrozenSet, Iterator, Optional, Tuple, TypeVar, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT_SECONDS", os.getenv("OLLAMA_TIMEOUT_SECONDS", "120")))
+LLM_MAX_CONNECTIONS_PER_HOST = int(os.getenv("LLM_MAX_CONNECTIONS_PER_HOST", "8"))
+LLM_RETRIES = int(os.getenv("LLM_HTTP_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_HTTP_RETRY_BACKOFF_SECONDS", "0.25"))
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Answers that say the request was not processed: safe to send again whatever the method.
+_RETRY_STATUSES = frozenset({429, 503})
+# A gateway error may come after the upstream started work; only repeat idempotent requests.
+_IDEMPOTENT_RETRY_STATUSES = _RETRY_STATUSES | {502, 504}
+# The request never reached the server: safe to send again.
+_RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# A stale pooled socket may also fail after the request was written.
+_IDEMPOTENT_RETRY_ERRORS = _RETRY_ERRORS + (httpx.RemoteProtocolError,)
+
+Timeout = Union[None, float, Tuple[float, float]]  # seconds, or (connect, read) like requests
+T = TypeVar("T")
+
+
+class LLMClientError(RuntimeError):
+    """Transport failure after the retries, or an HTTP error status."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMClientError):
+    """The server accepted the request but did not answer within the read timeout."""
+
+
+def _retry_policy(method: str) -> Tuple[FrozenSet[int], Tuple[type, ...]]:
+    """(statuses, transport errors) that may be retried for ``method``."""
+    if method.upper() in _IDEMPOTENT_METHODS:
+        return _IDEMPOTENT_RETRY_STATUSES, _IDEMPOTENT_RETRY_ERRORS
+    return _RETRY_STATUSES, _RETRY_ERRORS
+
+
+def _timeout(value: Timeout) -> httpx.Timeout:
+    if value is None:
+        connect, read = LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT
+    elif isinstance(value, tuple):
+        connect, read = value
+    else:
+        connect, read = min(LLM_CONNECT_TIMEOUT, value), value
+    return httpx.Timeout(connect=connect, read=read, write=read, pool=read)
+
+
+def _host(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _json_body(resp: httpx.Response) -> Any:
+    if resp.status_code >= 400:
+        raise LLMClientError(f"HTTP {resp.status_code}: {resp.text[:1000]}", status_code=resp.status_code)
+    try:
+        return resp.json()
+    except json.JSONDecodeError as exc:
+        raise LLMClientError(f"Invalid JSON from {resp.url}: {resp.text[:200]}") from exc
+
+
+def _wrap(method: str, url: str, exc: httpx.HTTPError) -> LLMClientError:
+    if isinstance(exc, httpx.TimeoutException):
+        return LLMTimeoutError(f"{method} {url} timed out: {exc!r}")
+    return LLMClientError(f"{method} {url} failed: {exc!r}")
+
+
+class AsyncLLMClient:
+    def __init__(
+        self,
+        *,
+        max_connections_per_host: int = LLM_MAX_CONNECTIONS_PER_HOST,
+        retries: int = LLM_RETRIES,
+        backoff: float = LLM_RETRY_BACKOFF,
+    ):
+        self.max_connections_per_host = max(1, max_connections_per_host)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        # httpx clients are bound to the loop that created them.
+        self._pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def _client(self, url: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        host = _host(url)
+        with self._lock:
+            clients = self._pools.setdefault(loop, {})
+            client = clients.get(host)
+            if client is None or client.is_closed:
+                limit = self.max_connections_per_host
+                client = clients[host] = httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit),
+                    timeout=_timeout(None),
+                )
+        return client
+
+    async def _backoff(self, attempt: int, method: str, url: str, reason: Any) -> None:
+        delay = random.uniform(0.0, self.backoff * 2**attempt)
+        logger.debug("Retrying %s %s in %.2fs (attempt %d): %s", method, url, delay, attempt + 1, reason)
+        await asyncio.sleep(delay)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        json: Any = None,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Timeout = None,
+        retries: Optional[int] = None,
+    ) -> httpx.Response:
+        """Send one request; the body is read before returning."""
+        attempts = (self.retries if retries is None else max(0, retries)) + 1
+        retry_statuses, retry_errors = _retry_policy(method)
+        client = self._client(url)
+        for attempt in range(attempts):
+            last = attempt + 1 >= attempts
+            try:
+                resp = await client.request(method, url, json=json, params=params, timeout=_timeout(timeout))
+            except retry_errors as exc:
+                if last:
+                    raise _wrap(method, url, exc) from exc
+                reason: Any = exc
+            except httpx.HTTPError as exc:
+                raise _wrap(method, url, exc) from exc
+            else:
+                if resp.status_code not in retry_statuses or last:
+                    return resp
+                reason = f"HTTP {resp.status_code}"
+            await self._backoff(attempt, method, url, reason)
+        raise AssertionError("unreachable")
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        return _json_body(await self.request("GET", url, **kwargs))
+
+    async def post_json(self, url: str, payload: Any, **kwargs: Any) -> Any:
+        return _json_body(await self.request("POST", url, json=payload, **kwargs))
+
+    async def stream_json_lines(
+        self, url: str, payload: Any, *, timeout: Timeout = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """POST ``payload`` and yield each line of the NDJSON response as it arrives.
+
+        Retries stop once the first line has been yielded, so callers never
+        see a fragment twice.
+        """
+        client = self._client(url)
+        attempts = self.retries + 1
+        for attempt in range(attempts):
+            last = attempt + 1 >= attempts
+            yielded = False
+            try:
+                async with client.stream("POST", url, json=payload, timeout=_timeout(timeout)) as resp:
+                    if resp.status_code >= 400:
+                        body = (await resp.aread()).decode("utf-8", "replace")[:1000]
+                        if resp.status_code not in _RETRY_STATUSES or last:
+                            raise LLMClientError(f"HTTP {resp.status_code}: {body}", status_code=resp.status_code)
+                        reason: Any = f"HTTP {resp.status_code}"
+                    else:
+                        async for line in resp.aiter_lines():
+                            if not line.strip():
+                                continue
+                            try:
+                                chunk = json.loads(line)
+                            except json.JSONDecodeError as exc:
+                                raise LLMClientError(f"Invalid JSON line from {url}: {line[:200]}") from exc
+                            yielded = True
+                            yield chunk
+                        return
+            except _RETRY_ERRORS as exc:
+                if yielded or last:
+                    raise _wrap("POST", url, exc) from exc
+                reason = exc
+            except httpx.HTTPError as exc:
+                raise _wrap("POST", url, exc) from exc
+            await self._backoff(attempt, "POST", url, reason)
+
+    async def aclose(self) -> None:
+        """Close the connections opened from the running loop."""
+        with self._lock:
+            clients = self._pools.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+
+class SyncLLMClient:
+    """Blocking facade: runs ``AsyncLLMClient`` calls on a private event-loop thread."""
+
+    def __init__(self, client: AsyncLLMClient):
+        self._async = client
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _background_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="llm-http", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run ``coro`` on the facade's loop and wait for its result."""
+        loop = self._background_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            raise RuntimeError("SyncLLMClient cannot be used from its own event loop; await the async client")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """Drive an async iterator from blocking code, one item at a time."""
+        loop = self._background_loop()
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(agen.__anext__(), loop).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None:
+                asyncio.run_coroutine_threadsafe(aclose(), loop).result()
+
+    def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        return self.run(self._async.request(method, url, **kwargs))
+
+    def get_json(self, url: str, **kwargs: Any) -> Any:
+        return self.run(self._async.get_json(url, **kwargs))
+
+    def post_json(self, url: str, payload: Any, **kwargs: Any) -> Any:
+        return self.run(self._async.post_json(url, payload, **kwargs))
+
+    def stream_json_lines(self, url: str, payload: Any, *, timeout: Timeout = None) -> Iterator[Dict[str, Any]]:
+        return self.iterate(self._async.stream_json_lines(url, payload, timeout=timeout))
+
+
+_CLIENT = AsyncLLMClient()
+_SYNC_CLIENT = SyncLLMClient(_CLIENT)
+
+
+def llm_client() -> AsyncLLMClient:
+    """Process-wide async client (await it from coroutines)."""
+    return _CLIENT
+
+
+def llm_client_sync() -> SyncLLMClient:
+    """Process-wide blocking facade over the same client."""
+    return _SYNC_CLIENT
+
+
+__all__ = [
+    "AsyncLLMClient",
+    "LLMClientError",
+    "LLMTimeoutError",
+    "SyncLLMClient",
+    "llm_client",
+    "llm_client_sync",
+]
@@ -1,6 +1,7 @@
 """Lightweight Ollama client for Phi-3 (Ollama) inference."""
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import os
@@ -10,9 +11,9 @@ import time
 from pathlib import Path
 from urllib.parse import urlsplit, urlunsplit
 from threading import Lock
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, Iterator
 
-import requests
+from services.api.llm.http_pool import LLM_CONNECT_TIMEOUT, LLMClientError, llm_client, llm_client_sync
 
 logger = logging.getLogger(__name__)
 
@@ -64,13 +65,16 @@ def _build_payload(prompt: str, model: str | None = None) -> Dict[str, Any]:
     }
 
 
-def _ping_ollama() -> bool:
+async def _aping_ollama() -> bool:
     try:
-        resp = requests.get(f"{OLLAMA_URL.rstrip('/')}/api/tags", timeout=5)
-        resp.raise_for_status()
-        return True
-    except requests.RequestException:
+        resp = await llm_client().request("GET", f"{OLLAMA_URL.rstrip('/')}/api/tags", timeout=5, retries=0)
+    except LLMClientError:
         return False
+    return resp.status_code < 400
+
+
+def _ping_ollama() -> bool:
+    return llm_client_sync().run(_aping_ollama())
 
 
 def _ensure_ollama_server(force_pull: bool = False) -> None:
@@ -129,7 +133,8 @@ def _ensure_ollama_server(force_pull: bool = False) -> None:
                 logger.debug("Ollama model pull skipped", exc_info=True)
 
             try:
-                requests.post(
+                llm_client_sync().request(
+                    "POST",
                     f"{OLLAMA_URL.rstrip('/')}/api/chat",
                     json={
                         "model": OLLAMA_MODEL,
@@ -138,7 +143,7 @@ def _ensure_ollama_server(force_pull: bool = False) -> None:
                     },
                     timeout=30,
                 )
-            except requests.RequestException:
+            except LLMClientError:
                 logger.debug("Ollama warm-up request failed; continuing.")
         finally:
             try:
@@ -148,17 +153,21 @@ def _ensure_ollama_server(force_pull: bool = False) -> None:
                 pass
 
 
-def _generate_via_http(payload: Dict[str, Any], *, timeout: int | None = None) -> str:
+async def _ensure_ollama_server_async() -> None:
+    # The autostart path spawns processes and sleeps; keep it off the event loop.
+    if not await _aping_ollama():
+        await asyncio.to_thread(_ensure_ollama_server)
+
+
+async def _generate_via_http(payload: Dict[str, Any], *, timeout: int | None = None) -> str:
     url = f"{OLLAMA_URL.rstrip('/')}/api/chat"
     try:
-        resp = requests.post(url, json=payload, timeout=timeout or OLLAMA_TIMEOUT)
-    except requests.RequestException as exc:
+        resp = await llm_client().request("POST", url, json=payload, timeout=timeout or OLLAMA_TIMEOUT)
+    except LLMClientError as exc:
         raise OllamaError(f"Ollama request failed: {exc}") from exc
-    try:
-        resp.raise_for_status()
-    except requests.HTTPError as exc:
+    if resp.status_code >= 400:
         snippet = resp.text[:1000]
-        raise OllamaError(f"Ollama HTTP {resp.status_code}: {snippet}") from exc
+        raise OllamaError(f"Ollama HTTP {resp.status_code}: {snippet}")
 
     try:
         data = resp.json()
@@ -200,20 +209,61 @@ def _generate_via_cli(prompt: str, model: str) -> str:
     return (proc.stdout or "").strip()
 
 
-def ollama_generate(prompt: str, *, model: str | None = None, timeout: int | None = None) -> str:
+async def ollama_astream(
+    prompt: str, *, model: str | None = None, timeout: int | None = None
+) -> AsyncIterator[str]:
     """
-    Send a blocking generate request to a local Ollama server.
-    Falls back to the `ollama run` CLI when the HTTP endpoint is unavailable.
+    Yield the assistant reply fragment by fragment as Ollama produces it.
+    ``timeout`` bounds the wait between fragments rather than the whole answer;
+    there is no CLI fallback, so failures surface as ``OllamaError``.
     """
-    _ensure_ollama_server()
+    await _ensure_ollama_server_async()
+    payload = _build_payload(prompt, model=model)
+    payload["stream"] = True
+    url = f"{OLLAMA_URL.rstrip('/')}/api/chat"
+    try:
+        async for chunk in llm_client().stream_json_lines(
+            url, payload, timeout=(LLM_CONNECT_TIMEOUT, timeout or OLLAMA_TIMEOUT)
+        ):
+            if chunk.get("error"):
+                raise OllamaError(f"Ollama stream failed: {chunk['error']}")
+            content = (chunk.get("message") or {}).get("content")
+            if content:
+                yield content
+            if chunk.get("done"):
+                return
+    except LLMClientError as exc:
+        raise OllamaError(f"Ollama request failed: {exc}") from exc
+
+
+def ollama_stream(prompt: str, *, model: str | None = None, timeout: int | None = None) -> Iterator[str]:
+    """Blocking ``ollama_astream`` for threads and scripts."""
+    return llm_client_sync().iterate(ollama_astream(prompt, model=model, timeout=timeout))
+
+
+async def ollama_agenerate(prompt: str, *, model: str | None = None, timeout: int | None = None) -> str:
+    """
+    Send a generate request to a local Ollama server over the shared connection pool.
+    Falls back to the `ollama run` CLI (in a worker thread) when the HTTP endpoint is unavailable.
+    """
+    await _ensure_ollama_server_async()
     payload = _build_payload(prompt, model=model)
     target_model = payload["model"]
     try:
-        return _generate_via_http(payload, timeout=timeout)
+        return await _generate_via_http(payload, timeout=timeout)
     except OllamaError as exc:
         logger.warning("Ollama HTTP path failed (%s). Falling back to CLI.", exc)
-        _ensure_ollama_server(force_pull=True)
-        return _generate_via_cli(prompt, target_model)
+        await asyncio.to_thread(_ensure_ollama_server, True)
+        return await asyncio.to_thread(_generate_via_cli, prompt, target_model)
+
+
+def ollama_generate(prompt: str, *, model: str | None = None, timeout: int | None = None) -> str:
+    """
+    Send a blocking generate request to a local Ollama server.
+    Falls back to the `ollama run` CLI when the HTTP endpoint is unavailable.
+    Coroutines should await ``ollama_agenerate`` instead.
+    """
+    return llm_client_sync().run(ollama_agenerate(prompt, model=model, timeout=timeout))
 
 
-__all__ = ["ollama_generate", "OllamaError"]
+__all__ = ["ollama_agenerate", "ollama_astream", "ollama_generate", "ollama_stream", "OllamaError"]
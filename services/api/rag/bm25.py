@@ -0,0 +1,329 @@
+"""Persistent, incrementally updated BM25 inverted index.
+
+The vector stores mirror every chunk they hold into a SQLite index next to
+their files (``docs`` + ``postings`` tables, WAL mode), so exact terms that
+embeddings blur (acronyms like DTI/LTV, application ids) can be matched
+lexically. Adding or removing chunks only touches their own postings; nothing
+is ever refit. Scoring runs as one aggregate query over the postings of the
+query terms.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BM25_ENABLED = os.getenv("RAG_BM25_ENABLED", "true").lower() in {"true", "1", "yes"}
+BM25_K1 = float(os.getenv("RAG_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("RAG_BM25_B", "0.75"))
+_SQL_BATCH = 500  # stay well below SQLite's bound-parameter limit
+_SNIPPET_CHARS = 600
+
+# Compound tokens (application_id, app-00123) are kept whole and also split into parts.
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[_\-./][a-z0-9]+)*")
+_PART_RE = re.compile(r"[_\-./]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was what when "
+    "where which who why will with you your".split()
+)
+
+LexicalDoc = Tuple[str, str, Dict[str, Any]]  # (id, text, metadata)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens: List[str] = []
+    for token in _TOKEN_RE.findall((text or "").lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = _PART_RE.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in _STOPWORDS)
+    return tokens
+
+
+def _payload(text: str, meta: Dict[str, Any]) -> str:
+    # Scalars only: enough to render and filter a hit without the vector store.
+    # Underscore keys are storage internals (e.g. Chroma's metadata codec fields).
+    data = {
+        key: value
+        for key, value in meta.items()
+        if isinstance(value, (str, int, float, bool)) and not key.startswith("_")
+    }
+    data.pop("text", None)
+    data["snippet"] = str(meta.get("snippet") or text)[:_SNIPPET_CHARS]
+    return json.dumps(data, ensure_ascii=False)
+
+
+class BM25Index:
+    """BM25 over ``(id, text, metadata)`` chunks stored in SQLite."""
+
+    def __init__(self, path: Path, *, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                namespace TEXT,
+                payload TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_doc ON postings(doc_id);
+            CREATE INDEX IF NOT EXISTS idx_docs_namespace ON docs(namespace);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+        self._corpus_version: Optional[int] = None
+        self._corpus: Tuple[int, float] = (0, 0.0)
+
+    # ── writes ───────────────────────────────────────────────────
+    def _delete_locked(self, ids: Sequence[str]) -> None:
+        for start in range(0, len(ids), _SQL_BATCH):
+            chunk = list(ids[start : start + _SQL_BATCH])
+            placeholders = ",".join("?" * len(chunk))
+            self._conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", chunk)
+            self._conn.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", chunk)
+
+    def add(self, docs: Iterable[LexicalDoc]) -> int:
+        """Insert or replace ``docs``; only their own postings are rewritten."""
+        rows = []
+        postings = []
+        for doc_id, text, meta in docs:
+            counts = Counter(tokenize(text))
+            if not counts:
+                continue
+            rows.append((doc_id, sum(counts.values()), meta.get("namespace"), _payload(text, meta)))
+            postings.extend((term, doc_id, tf) for term, tf in counts.items())
+        if not rows:
+            return 0
+        with self._lock:
+            self._delete_locked([row[0] for row in rows])
+            self._conn.executemany(
+                "INSERT INTO docs (id, length, namespace, payload) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", postings)
+            self._conn.commit()
+        return len(rows)
+
+    def remove(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            self._delete_locked(list(ids))
+            self._conn.commit()
+
+    def remove_namespace(self, namespace: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM postings WHERE doc_id IN (SELECT id FROM docs WHERE namespace = ?)", (namespace,)
+            )
+            self._conn.execute("DELETE FROM docs WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("DELETE FROM meta WHERE key = 'synced_version'")
+            self._conn.commit()
+
+    def mark_synced(self, version: Any) -> None:
+        """Record that the index mirrors the store as of its write ``version``."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('synced_version', ?)", (str(version),)
+            )
+            self._conn.commit()
+
+    # ── reads ────────────────────────────────────────────────────
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0])
+
+    def synced_version(self) -> Optional[str]:
+        """Store version last recorded by :meth:`mark_synced` (None if never backfilled)."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'synced_version'").fetchone()
+        return row[0] if row else None
+
+    def _corpus_stats_locked(self) -> Tuple[int, float]:
+        # data_version changes whenever another connection commits, so the
+        # cached totals stay right when a different process writes the index.
+        version = (self._conn.execute("PRAGMA data_version").fetchone()[0], self._conn.total_changes)
+        if version != self._corpus_version:
+            total, avg_length = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs").fetchone()
+            self._corpus = (int(total), float(avg_length or 0.0))
+            self._corpus_version = version
+        return self._corpus
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        namespace: Optional[str] = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k BM25 matches as metadata dicts with ``id``, ``score`` and ``snippet``."""
+        terms = Counter(tokenize(query))
+        if not terms or top_k <= 0:
+            return []
+        with self._lock:
+            total, avg_length = self._corpus_stats_locked()
+            if not total:
+                return []
+            placeholders = ",".join("?" * len(terms))
+            doc_freq = dict(
+                self._conn.execute(
+                    f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term",
+                    list(terms),
+                ).fetchall()
+            )
+            weights = [
+                (term, count * math.log(1.0 + (total - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5)))
+                for term, count in terms.items()
+                if term in doc_freq
+            ]
+            if not weights:
+                return []
+            values = ",".join("(?, ?)" for _ in weights)
+            params: List[Any] = [value for pair in weights for value in pair]
+            params += [self.k1 + 1.0, self.k1, 1.0 - self.b, self.b / max(avg_length, 1e-9)]
+            where = ""
+            if namespace is not None:
+                where = "WHERE d.namespace = ?"
+                params.append(namespace)
+            # Over-fetch when post-filtering on metadata.
+            params.append(top_k * 4 if filter_dict else top_k)
+            rows = self._conn.execute(
+                f"""
+                WITH q(term, weight) AS (VALUES {values})
+                SELECT d.id, d.payload,
+                       SUM(q.weight * p.tf * ? / (p.tf + ? * (? + ? * d.length))) AS score
+                FROM q
+                JOIN postings p ON p.term = q.term
+                JOIN docs d ON d.id = p.doc_id
+                {where}
+                GROUP BY d.id
+                ORDER BY score DESC
+                LIMIT ?
+                """,
+                params,
+            ).fetchall()
+        hits: List[Dict[str, Any]] = []
+        for doc_id, payload, score in rows:
+            meta = json.loads(payload)
+            if filter_dict and any(meta.get(key) != value for key, value in filter_dict.items()):
+                continue
+            meta.update({"id": doc_id, "score": float(score), "text": meta.get("snippet", "")})
+            hits.append(meta)
+            if len(hits) >= top_k:
+                break
+        return hits
+
+    # ── maintenance ──────────────────────────────────────────────
+    def rebuild(self, docs: Iterable[LexicalDoc], batch_size: int = 1000) -> int:
+        """Replace the whole index with ``docs`` (used to backfill existing stores)."""
+        self.clear()
+        batch: List[LexicalDoc] = []
+        indexed = 0
+        for doc in docs:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                indexed += self.add(batch)
+                batch = []
+        if batch:
+            indexed += self.add(batch)
+        return indexed
+
+
+_INDEXES: Dict[Path, BM25Index] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_bm25_index(path: Path) -> Optional[BM25Index]:
+    """Shared index at ``path``; None when disabled or the file cannot be opened."""
+    if not BM25_ENABLED:
+        return None
+    path = Path(path).resolve()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(path)
+        if index is None:
+            try:
+                index = _INDEXES[path] = BM25Index(path)
+            except Exception as exc:
+                logger.warning("BM25 index %s unavailable: %s", path, exc)
+                return None
+        return index
+
+
+def drop_bm25_index(path: Path) -> None:
+    """Forget the shared index at ``path`` and delete its files."""
+    path = Path(path).resolve()
+    with _INDEXES_LOCK:
+        index = _INDEXES.pop(path, None)
+    if index is not None:
+        with index._lock:
+            index._conn.close()
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def ensure_lexical_index(store: Any) -> Optional[threading.Thread]:
+    """Backfill ``store.lexical`` in the background unless it already mirrors the store.
+
+    Writes keep the mirror in step, so the check is whether the index was
+    synced at the store's current write version (``store.version()``), not a
+    row count: chunks without indexable terms never reach BM25, and counting
+    them would force a full rebuild on every start. Stores without a version
+    are backfilled once.
+    """
+    index = getattr(store, "lexical", None)
+    if index is None:
+        return None
+    try:
+        version_fn = getattr(store, "version", None)
+        version = str(version_fn()) if callable(version_fn) else "0"
+        if index.synced_version() == version:
+            return None
+    except Exception as exc:
+        logger.debug("Cannot compare BM25 index with store: %s", exc)
+        return None
+
+    def _backfill() -> None:
+        try:
+            indexed = index.rebuild(store.iter_documents())
+            index.mark_synced(version)
+            logger.info("Backfilled BM25 index %s with %d chunks", index.path, indexed)
+        except Exception as exc:
+            logger.warning("BM25 backfill of %s failed: %s", index.path, exc)
+
+    thread = threading.Thread(target=_backfill, name="bm25-backfill", daemon=True)
+    thread.start()
+    return thread
+
+
+__all__ = ["BM25Index", "LexicalDoc", "drop_bm25_index", "ensure_lexical_index", "get_bm25_index", "tokenize"]
@@ -0,0 +1,288 @@
+"""Batched, size-bounded bulk upserts into Chroma collections.
+
+Every ingest path streams ``(id, text, metadata)`` records through
+:class:`BulkWriter`. Records are embedded ``CHROMA_BULK_EMBED_ROWS`` at a time
+on a worker thread while the previous batch is written, and each write is
+split so it never exceeds the client's maximum batch size. Ids default to a
+hash of ``(source, text)`` so re-ingesting the same content overwrites rows
+instead of duplicating them. With a :class:`~.dedup.NearDuplicateIndex`,
+near-duplicates of chunks already stored for other sources are dropped before
+they are embedded (table rows only when their text repeats exactly). With a :class:`~.bm25.BM25Index`, every written batch is
+mirrored into it so lexical retrieval sees exactly the rows that were stored.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .bm25 import BM25Index
+from .dedup import NearDuplicateIndex, is_tabular
+from .utils import content_id
+
+logger = logging.getLogger(__name__)
+
+EMBED_ROWS = int(os.getenv("CHROMA_BULK_EMBED_ROWS", "256"))
+MAX_WRITE_ROWS = int(os.getenv("CHROMA_BULK_MAX_WRITE", "5000"))
+
+Record = Tuple[Optional[str], str, Dict[str, Any]]  # (id or None, document text, metadata)
+_Batch = Tuple[List[str], List[str], List[Dict[str, Any]], List[List[float]]]
+
+
+def max_write_batch(collection: Any) -> int:
+    """Largest ``upsert`` the collection's client accepts, capped by ``CHROMA_BULK_MAX_WRITE``."""
+    client = getattr(collection, "_client", None)
+    limit = None
+    getter = getattr(client, "get_max_batch_size", None)
+    if callable(getter):
+        try:
+            limit = int(getter())
+        except Exception:
+            limit = None
+    if limit is None:
+        limit = getattr(client, "max_batch_size", None)
+    if not isinstance(limit, int) or limit <= 0:
+        return MAX_WRITE_ROWS
+    return min(limit, MAX_WRITE_ROWS)
+
+
+_COUNTERS = ("rows", "duplicates", "batches", "writes", "embed_seconds", "write_seconds", "elapsed_seconds")
+
+
+@dataclass
+class BulkWriteStats:
+    rows: int = 0
+    duplicates: int = 0  # exact repeats and near-duplicates dropped before embedding
+    batches: int = 0
+    writes: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+    # Filled when track_ids=True: ids written, and ids of the stored chunks the dropped ones duplicate.
+    ids: List[str] = field(default_factory=list, repr=False)
+    duplicate_of: List[str] = field(default_factory=list, repr=False)
+
+    @property
+    def rows_per_sec(self) -> float:
+        return round(self.rows / self.elapsed_seconds, 1) if self.elapsed_seconds else 0.0
+
+    def merge(self, other: "BulkWriteStats") -> "BulkWriteStats":
+        for name in _COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.ids.extend(other.ids)
+        self.duplicate_of.extend(other.duplicate_of)
+        return self
+
+    def as_dict(self) -> Dict[str, float]:
+        data = {name: getattr(self, name) for name in _COUNTERS}
+        data["rows_per_sec"] = self.rows_per_sec
+        return {key: round(value, 3) if isinstance(value, float) else value for key, value in data.items()}
+
+
+class BulkWriter:
+    def __init__(
+        self,
+        collection: Any,
+        *,
+        embed_rows: int = EMBED_ROWS,
+        max_write: Optional[int] = None,
+        embed_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+        track_ids: bool = False,
+        dedup: Optional[NearDuplicateIndex] = None,
+        lexical: Optional[BM25Index] = None,
+    ):
+        self.collection = collection
+        self.track_ids = track_ids
+        self.dedup = dedup
+        self.lexical = lexical
+        self.embed_rows = max(1, embed_rows)
+        self.max_write = max(1, max_write or max_write_batch(collection))
+        self._embed_fn = embed_fn
+
+    @property
+    def embed_fn(self) -> Callable[[List[str]], List[List[float]]]:
+        # Imported lazily: writers fed precomputed vectors never need the encoder stack.
+        if self._embed_fn is None:
+            from .embeddings import embed_texts
+
+            self._embed_fn = embed_texts
+        return self._embed_fn
+
+    def write(
+        self,
+        records: Iterable[Record],
+        vectors: Optional[Iterable[Sequence[float]]] = None,
+    ) -> BulkWriteStats:
+        """Upsert ``records``; embed them unless ``vectors`` (aligned with records) is given."""
+        stats = BulkWriteStats()
+        started = time.perf_counter()
+        batches = self._batches(records, vectors, stats)
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="bulk-embed") as pool:
+            pending = self._submit(pool, next(batches, None))
+            while pending is not None:
+                batch, embed_seconds = pending.result()
+                stats.embed_seconds += embed_seconds
+                # Read + embed the next batch while this one is written.
+                pending = self._submit(pool, next(batches, None))
+                self._write(batch, stats)
+        stats.elapsed_seconds = time.perf_counter() - started
+        if self.dedup is not None:
+            self.dedup.save()
+        if stats.rows:
+            logger.debug(
+                "Bulk upserted %d rows in %d writes (%.1f rows/s, embed %.1fs, write %.1fs)",
+                stats.rows,
+                stats.writes,
+                stats.rows_per_sec,
+                stats.embed_seconds,
+                stats.write_seconds,
+            )
+        return stats
+
+    def _batches(
+        self,
+        records: Iterable[Record],
+        vectors: Optional[Iterable[Sequence[float]]],
+        stats: BulkWriteStats,
+    ) -> Iterator[Tuple[List[Record], Optional[List[List[float]]]]]:
+        session: Set[str] = set()
+        record_iter = iter(records)
+        vector_iter = iter(vectors) if vectors is not None else None
+        # Precomputed vectors have nothing to overlap with, so fill whole writes.
+        size = self.max_write if vector_iter is not None else self.embed_rows
+        while True:
+            chunk = list(islice(record_iter, size))
+            if not chunk:
+                return
+            unique: List[Record] = []
+            keep: List[bool] = []
+            # id -> hash of the text written under it. Scoped to one chunk so memory stays
+            # bounded; across chunks a repeated id is an upsert of the same row.
+            seen: Dict[str, str] = {}
+            for doc_id, text, meta in chunk:
+                doc_id = doc_id or content_id(str(meta.get("source", "")), text)
+                digest = content_id("", text)
+                previous = seen.get(doc_id)
+                if previous == digest:
+                    # Exact repeat of a row already in this chunk: same id, same content.
+                    keep.append(False)
+                    stats.duplicates += 1
+                    if self.track_ids:
+                        stats.duplicate_of.append(doc_id)
+                    continue
+                if previous is not None:
+                    # Same id, different text: the suffix depends only on the text,
+                    # so a resumed ingest derives the same id again.
+                    doc_id = f"{doc_id}-{digest[:8]}"
+                seen.setdefault(doc_id, digest)
+                keep.append(True)
+                # Chroma rejects None metadata values.
+                unique.append((doc_id, text, {k: v for k, v in meta.items() if v is not None}))
+            chunk_vectors = None
+            if vector_iter is not None:
+                chunk_vectors = [list(map(float, vec)) for vec in islice(vector_iter, len(chunk))]
+                if len(chunk_vectors) != len(chunk):
+                    raise ValueError("Vectors and records must have same length")
+                chunk_vectors = [vec for vec, flag in zip(chunk_vectors, keep) if flag]
+            if not unique:
+                continue
+            if self.dedup is not None:
+                unique, chunk_vectors = self._drop_duplicates(unique, chunk_vectors, session, stats)
+                if not unique:
+                    continue
+            yield unique, chunk_vectors
+
+    def _drop_duplicates(
+        self,
+        chunk: List[Record],
+        chunk_vectors: Optional[List[List[float]]],
+        session: Set[str],
+        stats: BulkWriteStats,
+    ) -> Tuple[List[Record], Optional[List[List[float]]]]:
+        keep, duplicate_of = self.dedup.filter(
+            [(doc_id, text, str(meta.get("source", ""))) for doc_id, text, meta in chunk],
+            session=session,
+            exists=self._existing_ids,
+            tabular=[is_tabular(meta) for _, _, meta in chunk],
+        )
+        if not duplicate_of:
+            return chunk, chunk_vectors
+        stats.duplicates += len(duplicate_of)
+        if self.track_ids:
+            stats.duplicate_of.extend(duplicate_of)
+        kept = [record for record, flag in zip(chunk, keep) if flag]
+        if chunk_vectors is not None:
+            chunk_vectors = [vec for vec, flag in zip(chunk_vectors, keep) if flag]
+        return kept, chunk_vectors
+
+    def _existing_ids(self, ids: List[str]) -> Set[str]:
+        found: Set[str] = set()
+        for offset in range(0, len(ids), self.max_write):
+            found.update(self.collection.get(ids=ids[offset : offset + self.max_write], include=[])["ids"])
+        return found
+
+    def _submit(
+        self,
+        pool: ThreadPoolExecutor,
+        item: Optional[Tuple[List[Record], Optional[List[List[float]]]]],
+    ) -> Optional["Future[Tuple[_Batch, float]]"]:
+        if item is None:
+            return None
+        chunk, chunk_vectors = item
+        if chunk_vectors is not None:
+            done: "Future[Tuple[_Batch, float]]" = Future()
+            done.set_result((self._assemble(chunk, chunk_vectors), 0.0))
+            return done
+
+        def _embed() -> Tuple[_Batch, float]:
+            start = time.perf_counter()
+            embedded = self.embed_fn([text for _, text, _ in chunk])
+            return self._assemble(chunk, embedded), time.perf_counter() - start
+
+        return pool.submit(_embed)
+
+    @staticmethod
+    def _assemble(chunk: List[Record], vectors: List[List[float]]) -> _Batch:
+        return (
+            [doc_id for doc_id, _, _ in chunk],
+            [text for _, text, _ in chunk],
+            [meta for _, _, meta in chunk],
+            list(vectors),
+        )
+
+    def _write(self, batch: _Batch, stats: BulkWriteStats) -> None:
+        ids, documents, metadatas, embeddings = batch
+        start = time.perf_counter()
+        for offset in range(0, len(ids), self.max_write):
+            end = offset + self.max_write
+            self.collection.upsert(
+                ids=ids[offset:end],
+                embeddings=embeddings[offset:end],
+                documents=documents[offset:end],
+                metadatas=metadatas[offset:end],
+            )
+            stats.writes += 1
+        if self.lexical is not None:
+            self.lexical.add(zip(ids, documents, metadatas))
+        stats.write_seconds += time.perf_counter() - start
+        stats.rows += len(ids)
+        if self.track_ids:
+            stats.ids.extend(ids)
+        stats.batches += 1
+
+
+def bulk_upsert(
+    collection: Any,
+    records: Iterable[Record],
+    vectors: Optional[Iterable[Sequence[float]]] = None,
+    **kwargs: Any,
+) -> BulkWriteStats:
+    """One-shot :class:`BulkWriter` call."""
+    return BulkWriter(collection, **kwargs).write(records, vectors)
+
+
+__all__ = ["BulkWriter", "BulkWriteStats", "bulk_upsert", "content_id", "max_write_batch"]
@@ -1,11 +1,27 @@
 """ChromaDB vector store integration for improved RAG with metadata filtering."""
 from __future__ import annotations
 
+import ast
+import json
 import logging
 import os
 import shutil
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from .bm25 import BM25Index, LexicalDoc, drop_bm25_index, get_bm25_index
+from .bulk_writer import BulkWriter, max_write_batch
+from .dedup import NearDuplicateIndex, drop_dedup_index, get_dedup_index
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts fall back to the grace period alone
+    fcntl = None
 
 # Disable noisy telemetry + remote capture by default.
 os.environ.setdefault("CHROMA_TELEMETRY_DISABLED", "true")
@@ -21,6 +37,131 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Metadata that Chroma cannot hold natively (lists, dicts, timestamps, None...)
+# is kept in one JSON field with tagged values; scalars stay as plain fields.
+META_CODEC_VERSION = 1
+META_FIELD = "_meta"
+META_VERSION_FIELD = "_meta_v"
+LEGACY_META_FIELD = "_original_meta"
+_RESERVED_KEYS = {"id", "text", "snippet"}
+# query_namespaces fetches this many candidates per requested hit when several namespaces share its query.
+NAMESPACE_OVERFETCH = int(os.getenv("CHROMA_NAMESPACE_OVERFETCH", "2"))
+
+
+def _encode_meta_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"$tuple": [_encode_meta_value(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        return {"$set": [_encode_meta_value(item) for item in sorted(value, key=repr)]}
+    if isinstance(value, dict):
+        return {str(key): _encode_meta_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_encode_meta_value(item) for item in value]
+    if hasattr(value, "item") and callable(value.item):
+        return value.item()  # numpy / pandas scalars
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return {"$repr": str(value)}
+
+
+def _decode_meta_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return [_decode_meta_value(item) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if len(value) == 1:
+        tag, inner = next(iter(value.items()))
+        if tag == "$dt":
+            return datetime.fromisoformat(inner)
+        if tag == "$date":
+            return date.fromisoformat(inner)
+        if tag == "$tuple":
+            return tuple(_decode_meta_value(item) for item in inner)
+        if tag == "$set":
+            return set(_decode_meta_value(item) for item in inner)
+        if tag == "$repr":
+            return inner
+    return {key: _decode_meta_value(item) for key, item in value.items()}
+
+
+def encode_metadata(meta: Dict[str, Any], text: str = "") -> Dict[str, Any]:
+    """Split ``meta`` into Chroma-native scalars plus one JSON field for the rest."""
+    chroma_meta: Dict[str, Any] = {}
+    extra: Dict[str, Any] = {}
+    for key, value in meta.items():
+        if key in _RESERVED_KEYS:
+            continue
+        if isinstance(value, (str, int, float, bool)):
+            chroma_meta[key] = value
+        else:
+            extra[key] = _encode_meta_value(value)
+    snippet = meta.get("snippet")
+    if snippet is not None and snippet != text:
+        extra["snippet"] = snippet
+    if extra:
+        chroma_meta[META_FIELD] = json.dumps(extra, ensure_ascii=False, separators=(",", ":"))
+    chroma_meta[META_VERSION_FIELD] = META_CODEC_VERSION
+    return chroma_meta
+
+
+def _legacy_metadata(value: str) -> Dict[str, Any]:
+    """Parse a legacy ``_original_meta`` (Python repr) field; {} when it cannot be read."""
+    try:
+        original = ast.literal_eval(value)  # trusted, self-written data
+    except Exception:
+        return {}
+    return original if isinstance(original, dict) else {}
+
+
+def decode_metadata(chroma_meta: Dict[str, Any], fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Inverse of :func:`encode_metadata`; only decodes the JSON field when needed.
+
+    With ``fields`` set, keys outside that list are left out and the JSON
+    payload is not parsed at all if every requested field is a native scalar.
+    Rows written before the codec (``_original_meta``, not yet migrated) are
+    still decoded from their ``str(meta)`` field.
+    """
+    wanted = set(fields) if fields is not None else None
+    result = {
+        key: value
+        for key, value in chroma_meta.items()
+        if key not in (META_FIELD, META_VERSION_FIELD, LEGACY_META_FIELD)
+        and (wanted is None or key in wanted)
+    }
+    legacy = chroma_meta.get(LEGACY_META_FIELD)
+    if legacy and META_VERSION_FIELD not in chroma_meta:
+        original = _legacy_metadata(legacy)
+        result.update(
+            (key, value)
+            for key, value in original.items()
+            if key not in _RESERVED_KEYS and (wanted is None or key in wanted)
+        )
+        return result
+    payload = chroma_meta.get(META_FIELD)
+    if not payload or (wanted is not None and wanted <= result.keys()):
+        return result
+    try:
+        extra = json.loads(payload)
+    except ValueError:
+        logger.debug("Skipping undecodable metadata payload")
+        return result
+    for key, value in extra.items():
+        if wanted is None or key in wanted:
+            result[key] = _decode_meta_value(value)
+    return result
+
+
+def _where_clause(*conditions: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Combine equality filters into a Chroma ``where``; several keys need an explicit ``$and``."""
+    clauses = [{key: value} for condition in conditions if condition for key, value in condition.items()]
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
 
 class ChromaVectorStore:
     """ChromaDB-based vector store with metadata filtering support."""
@@ -56,6 +197,10 @@ class ChromaVectorStore:
         except Exception as exc:
             logger.error("Failed to create ChromaDB collection: %s", exc)
             raise
+        # Lexical (BM25) mirror of the collection for exact-term retrieval.
+        self.lexical = get_bm25_index(self.store_dir / f"bm25_{collection_name}.sqlite")
+        # Write generation shared by every process using this store, see version().
+        self.generation_path = self.store_dir / f"{collection_name}.generation"
     
     @property
     def available(self) -> bool:
@@ -80,47 +225,25 @@ class ChromaVectorStore:
         if len(vector_list) != len(meta_list):
             raise ValueError("Vectors and metadata must have same length")
         
-        # Prepare data for ChromaDB
-        ids = []
-        documents = []
-        metadatas = []
-        embeddings = []
-        
-        for i, (vec, meta) in enumerate(zip(vector_list, meta_list)):
-            # Generate ID if not present
-            doc_id = meta.get("id") or f"doc_{i}"
-            ids.append(str(doc_id))
-            
-            # Extract text/document content
+        records = []
+        for meta in meta_list:
+            # Explicit ids win; otherwise BulkWriter derives a stable id from source + text.
             text = meta.get("text") or meta.get("snippet") or ""
-            documents.append(text)
-            
-            # Prepare metadata (ChromaDB requires string values)
-            chroma_meta = {}
-            for key, value in meta.items():
-                if key not in ["id", "text", "snippet"]:
-                    # Convert to string for ChromaDB
-                    if isinstance(value, (str, int, float, bool)):
-                        chroma_meta[key] = value
-                    else:
-                        chroma_meta[key] = str(value)
-            
-            # Store original metadata in a special field
-            chroma_meta["_original_meta"] = str(meta)
-            metadatas.append(chroma_meta)
-            
-            # Convert vector to list
-            embeddings.append(list(vec))
-        
-        # Add to collection
+            doc_id = meta.get("id")
+            # Scalars stay filterable; everything else goes through the typed codec
+            records.append((str(doc_id) if doc_id else None, text, encode_metadata(meta, text)))
+
         try:
-            self.collection.add(
-                ids=ids,
-                embeddings=embeddings,
-                documents=documents,
-                metadatas=metadatas
+            # The writer mirrors exactly the rows it stored (after dedup) into BM25.
+            writer = BulkWriter(self.collection, lexical=self.lexical)
+            stats = writer.write(records, vector_list)
+            self._bump_version()
+            logger.info(
+                "Upserted %d documents into ChromaDB collection '%s' (%.1f rows/s)",
+                stats.rows,
+                self.collection_name,
+                stats.rows_per_sec,
             )
-            logger.info(f"Added {len(ids)} documents to ChromaDB collection '{self.collection_name}'")
         except Exception as exc:
             logger.error("Failed to add vectors to ChromaDB: %s", exc)
             raise
@@ -131,77 +254,104 @@ class ChromaVectorStore:
         top_k: int = 5,
         namespace: Optional[str] = None,
         filter_dict: Optional[Dict[str, Any]] = None,
-        score_threshold: float = 0.0
+        score_threshold: float = 0.0,
+        fields: Optional[Sequence[str]] = None,
     ) -> List[Dict[str, Any]]:
-        """Query the vector store with optional metadata filtering and namespace support."""
+        """Query the vector store with optional metadata filtering and namespace support.
+
+        ``fields`` limits which metadata keys are decoded into each hit
+        (``id``, ``score``, ``snippet`` and ``text`` are always present).
+        """
         if not self.available:
             return []
-        
-        vec = list(vector)
-        
-        # Build where clause for filtering
-        where = None
-        if filter_dict or namespace:
-            where = {}
-            if filter_dict:
-                for key, value in filter_dict.items():
-                    where[key] = value
-            if namespace:
-                where["namespace"] = namespace
-        
+        where = _where_clause(filter_dict, {"namespace": namespace} if namespace else None)
         try:
-            # Query ChromaDB
-            results = self.collection.query(
-                query_embeddings=[vec],
-                n_results=top_k,
-                where=where,
-                include=["documents", "metadatas", "distances"]
-            )
-            
-            # Convert to our format
-            output = []
-            if results["ids"] and len(results["ids"]) > 0:
-                ids = results["ids"][0]
-                distances = results["distances"][0]
-                documents = results["documents"][0]
-                metadatas = results["metadatas"][0]
-                
-                for i, (doc_id, distance, doc_text, meta) in enumerate(
-                    zip(ids, distances, documents, metadatas)
-                ):
-                    # Convert distance to similarity score (cosine distance -> similarity)
-                    # ChromaDB returns distance (0 = identical, 2 = opposite)
-                    # Convert to similarity score (1 = identical, 0 = opposite)
-                    similarity_score = 1.0 - (distance / 2.0)
-                    similarity_score = max(0.0, min(1.0, similarity_score))  # Clamp to [0, 1]
-                    
-                    # Filter by score threshold
-                    if similarity_score < score_threshold:
-                        continue
-                    
-                    # Reconstruct metadata
-                    result_meta = dict(meta)
-                    result_meta["id"] = doc_id
-                    result_meta["score"] = similarity_score
-                    result_meta["snippet"] = doc_text
-                    result_meta["text"] = doc_text
-                    
-                    # Try to restore original metadata if available
-                    if "_original_meta" in result_meta:
-                        try:
-                            import ast
-                            original = ast.literal_eval(result_meta["_original_meta"])
-                            result_meta.update(original)
-                        except Exception:
-                            pass
-                    
-                    output.append(result_meta)
-            
-            return output
-            
+            hits = self._query_hits(list(vector), top_k, where, score_threshold, fields)
+            return hits
         except Exception as exc:
             logger.error("ChromaDB query failed: %s", exc)
             return []
+
+    def query_namespaces(
+        self,
+        vector: Iterable[float],
+        top_k: Dict[Optional[str], int],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        boosts: Optional[Dict[str, float]] = None,
+        score_threshold: float = 0.0,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Dict[Optional[str], List[Dict[str, Any]]]:
+        """Per-namespace top-k lists from one ``$in`` query over the listed namespaces.
+
+        ``top_k`` maps namespaces to list sizes; the ``None`` key collects the
+        best documents of every namespace *not* listed (a second, ``$nin``
+        query). The listed namespaces share one query sized by their top-k
+        sum and are split client-side; with several of them it fetches
+        ``CHROMA_NAMESPACE_OVERFETCH`` times as many so one namespace cannot
+        crowd out another. ``score_threshold`` applies to the raw similarity,
+        then ``boosts`` multiplies the scores of the given namespaces.
+        """
+        results: Dict[Optional[str], List[Dict[str, Any]]] = {key: [] for key in top_k}
+        if not self.available:
+            return results
+        vec = list(vector)
+        named = [key for key in top_k if key is not None]
+        wanted = [key for key in named if top_k[key] > 0]
+        try:
+            if wanted:
+                n_results = sum(top_k[key] for key in wanted)
+                if len(wanted) > 1:
+                    n_results *= NAMESPACE_OVERFETCH
+                clause = {"namespace": {"$in": wanted}}
+                hits = self._query_hits(vec, n_results, _where_clause(filter_dict, clause), score_threshold, fields)
+                for hit in hits:
+                    key = hit.get("namespace")
+                    if key in results and len(results[key]) < top_k[key]:
+                        results[key].append(hit)
+            if top_k.get(None, 0) > 0:
+                clause = {"namespace": {"$nin": named}} if named else None
+                results[None] = self._query_hits(
+                    vec, top_k[None], _where_clause(filter_dict, clause), score_threshold, fields
+                )
+        except Exception as exc:
+            logger.error("ChromaDB multi-namespace query failed: %s", exc)
+        for key_hits in results.values():
+            for hit in key_hits:
+                hit["score"] *= (boosts or {}).get(hit.get("namespace"), 1.0)
+        return results
+
+    def _query_hits(
+        self,
+        vec: List[float],
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        score_threshold: float,
+        fields: Optional[Sequence[str]],
+    ) -> List[Dict[str, Any]]:
+        """Hits at or above ``score_threshold``, best first."""
+        results = self.collection.query(
+            query_embeddings=[vec],
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "distances"],
+        )
+        output: List[Dict[str, Any]] = []
+        ids = results["ids"][0] if results["ids"] else []
+        if not ids:
+            return output
+        for doc_id, distance, doc_text, meta in zip(
+            ids, results["distances"][0], results["documents"][0], results["metadatas"][0]
+        ):
+            # ChromaDB returns cosine distance (0 = identical, 2 = opposite);
+            # convert to a similarity score (1 = identical, 0 = opposite).
+            similarity_score = max(0.0, min(1.0, 1.0 - (distance / 2.0)))
+            if similarity_score < score_threshold:
+                # Results are ordered by distance: nothing further down qualifies.
+                break
+            result_meta = {"id": doc_id, "score": similarity_score, "snippet": doc_text, "text": doc_text}
+            result_meta.update(decode_metadata(meta or {}, fields))
+            output.append(result_meta)
+        return output
     
     def remove_namespace(self, namespace: str) -> None:
         """Remove all documents with the specified namespace."""
@@ -218,6 +368,9 @@ class ChromaVectorStore:
             if results["ids"] and len(results["ids"]) > 0:
                 # Delete documents by their IDs
                 self.collection.delete(ids=results["ids"])
+                if self.lexical is not None:
+                    self.lexical.remove(results["ids"])
+                self._bump_version()
                 logger.info(f"Removed {len(results['ids'])} documents with namespace '{namespace}'")
         except Exception as exc:
             logger.warning(f"Failed to remove namespace '{namespace}': {exc}")
@@ -247,10 +400,30 @@ class ChromaVectorStore:
         """Delete the collection (for testing/reset)."""
         try:
             self.client.delete_collection(name=self.collection_name)
+            if self.lexical is not None:
+                self.lexical.clear()
+            self._bump_version()
             logger.info(f"Deleted ChromaDB collection '{self.collection_name}'")
         except Exception as exc:
             logger.warning("Failed to delete collection: %s", exc)
     
+    def version(self) -> int:
+        """Write generation of the collection; every add, namespace removal and delete bumps it."""
+        try:
+            return int(self.generation_path.read_text())
+        except (OSError, ValueError):
+            return 0
+
+    def _bump_version(self) -> None:
+        with _flocked(self.generation_path.with_suffix(".lock")):
+            previous = self.version()
+            tmp = self.generation_path.with_suffix(".tmp")
+            tmp.write_text(str(previous + 1))
+            os.replace(tmp, self.generation_path)
+            # The writes above already went to BM25; keep an in-step mirror marked as such.
+            if self.lexical is not None and self.lexical.synced_version() == str(previous):
+                self.lexical.mark_synced(previous + 1)
+
     def count(self) -> int:
         """Get the number of documents in the collection."""
         try:
@@ -258,6 +431,59 @@ class ChromaVectorStore:
         except Exception:
             return 0
 
+    def iter_documents(self, batch_size: int = 1000) -> Iterator[LexicalDoc]:
+        """``(id, text, metadata)`` of every stored document, paged."""
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=batch_size, offset=offset)
+            ids = page.get("ids") or []
+            if not ids:
+                return
+            for doc_id, text, meta in zip(ids, page.get("documents") or [], page.get("metadatas") or []):
+                yield doc_id, text or "", decode_metadata(meta or {})
+            offset += len(ids)
+
+    def migrate_metadata(self, batch_size: int = 500) -> Dict[str, int]:
+        """Rewrite rows that still carry the legacy ``str(meta)`` field to the typed codec."""
+        return migrate_collection_metadata(self.collection, batch_size=batch_size)
+
+
+def migrate_collection_metadata(collection: Collection, batch_size: int = 500) -> Dict[str, int]:
+    """Batch-convert ``_original_meta`` (Python repr) rows of ``collection`` to the JSON codec."""
+    scanned = migrated = failed = 0
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas", "documents"], limit=batch_size, offset=offset)
+        ids = page.get("ids") or []
+        if not ids:
+            break
+        update_ids: List[str] = []
+        update_metas: List[Dict[str, Any]] = []
+        for doc_id, meta, doc_text in zip(ids, page.get("metadatas") or [], page.get("documents") or []):
+            scanned += 1
+            meta = meta or {}
+            legacy = meta.get(LEGACY_META_FIELD)
+            if META_VERSION_FIELD in meta or not legacy:
+                continue
+            original = _legacy_metadata(legacy)
+            if not original:
+                failed += 1
+                continue
+            merged = {key: value for key, value in meta.items() if key != LEGACY_META_FIELD}
+            merged.update(original)
+            new_meta = encode_metadata(merged, doc_text or "")
+            # Chroma merges metadata on update; blank the legacy field so it stops being stored in full.
+            new_meta[LEGACY_META_FIELD] = ""
+            update_ids.append(doc_id)
+            update_metas.append(new_meta)
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metas)
+            migrated += len(update_ids)
+        offset += len(ids)
+    stats = {"scanned": scanned, "migrated": migrated, "failed": failed}
+    logger.info("Chroma metadata migration: %s", stats)
+    return stats
+
 
 # ───────────────────────────────────────────────────────────────
 # Legacy helper functions for backwards compatibility
@@ -267,39 +493,317 @@ DB_ROOT.mkdir(parents=True, exist_ok=True)
 
 COLLECTION_NAME = os.getenv("SANDBOX_RAG_COLLECTION", "sandbox_rag")
 
+# {"name": active collection, "retired": [{"name", "retired_at"}, ...]}; every
+# worker re-reads it when its mtime changes, so a swap reaches all processes.
+ACTIVE_POINTER = DB_ROOT / "active_collection.json"
+# MinHash/LSH near-duplicate index per collection (see dedup.py).
+DEDUP_DIR = DB_ROOT / "dedup"
+# Each process holds a shared flock on leases/<name>.lock for the collection it
+# serves from; a retired collection is dropped only once that lock can be taken
+# exclusively (no worker still bound to it) and the grace period has passed.
+LEASE_DIR = DB_ROOT / "leases"
+# Held exclusively for the whole of a full rebuild; live writes wait on it (see live_writes).
+REBUILD_LOCK = DB_ROOT / "rebuild.lock"
+# Old collections are kept at least this long after a swap so in-flight queries can finish.
+SWAP_DROP_GRACE_SECONDS = float(os.getenv("SANDBOX_RAG_SWAP_GRACE", "30"))
+
 _CLIENT: Optional[chromadb.PersistentClient] = None
 _COLLECTION: Optional[Collection] = None
+_COLLECTION_MTIME: Optional[float] = None
+_LEASE: Optional[Any] = None  # open handle holding the shared lease on _COLLECTION
+_COLLECTION_LOCK = threading.RLock()
+# Rebuild workers point get_collection() at a shadow collection without affecting other threads.
+_WRITE_TARGET: ContextVar[Optional[Collection]] = ContextVar("sandbox_rag_write_target", default=None)
+
+
+def _get_client() -> chromadb.PersistentClient:
+    global _CLIENT
+    if _CLIENT is None:
+        if not CHROMADB_AVAILABLE:
+            raise RuntimeError("ChromaDB not available. Install with: pip install chromadb")
+        _CLIENT = chromadb.PersistentClient(path=str(DB_ROOT))
+    return _CLIENT
+
+
+@contextmanager
+def _flocked(path: Path, exclusive: bool = True, blocking: bool = True) -> Iterator[bool]:
+    """Inter-process lock on ``path``; yields False if a non-blocking attempt is refused."""
+    if fcntl is None:
+        yield True
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a+") as handle:
+        flags = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB)
+        try:
+            fcntl.flock(handle, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def _read_pointer() -> Dict[str, Any]:
+    try:
+        return json.loads(ACTIVE_POINTER.read_text())
+    except Exception:
+        return {}
+
+
+def _write_pointer(pointer: Dict[str, Any]) -> None:
+    tmp = ACTIVE_POINTER.with_suffix(".tmp")
+    tmp.write_text(json.dumps(pointer))
+    os.replace(tmp, ACTIVE_POINTER)
+
+
+def _pointer_mtime() -> Optional[float]:
+    try:
+        return ACTIVE_POINTER.stat().st_mtime
+    except OSError:
+        return None
+
+
+def active_collection_name() -> str:
+    """Name of the collection queries are served from (persisted across restarts)."""
+    return _read_pointer().get("name") or COLLECTION_NAME
+
+
+def _lease_path(name: str) -> Path:
+    return LEASE_DIR / f"{name}.lock"
+
+
+def _bind_locked(collection: Collection) -> None:
+    """Serve from ``collection``: take its lease, then release the previous one."""
+    global _COLLECTION, _LEASE
+    lease = None
+    if fcntl is not None:
+        path = _lease_path(collection.name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lease = path.open("a+")
+        fcntl.flock(lease, fcntl.LOCK_SH)
+    if _LEASE is not None:
+        _LEASE.close()  # closing the handle releases its flock
+    _COLLECTION, _LEASE = collection, lease
+
+
+def dedup_index(collection: Collection) -> Optional[NearDuplicateIndex]:
+    """Near-duplicate index persisted alongside ``collection`` (None when disabled)."""
+    return get_dedup_index(DEDUP_DIR / f"{collection.name}.npz")
+
+
+def _lexical_path(name: str) -> Path:
+    return DB_ROOT / f"bm25_{name}.sqlite"
+
+
+def lexical_index(collection: Collection) -> Optional[BM25Index]:
+    """BM25 mirror of ``collection``, fed by every bulk write (None when disabled)."""
+    return get_bm25_index(_lexical_path(collection.name))
+
+
+def delete_documents(
+    collection: Collection,
+    *,
+    ids: Optional[Sequence[str]] = None,
+    where: Optional[Dict[str, Any]] = None,
+) -> List[str]:
+    """Delete rows by ``ids`` or ``where`` from ``collection`` and its BM25 mirror."""
+    if where is not None:
+        ids = collection.get(where=where, include=[])["ids"]
+    ids = list(ids or [])
+    step = max_write_batch(collection)
+    lexical = lexical_index(collection)
+    for start in range(0, len(ids), step):
+        chunk = ids[start : start + step]
+        collection.delete(ids=chunk)
+        if lexical is not None:
+            lexical.remove(chunk)
+    return ids
 
 
 def reset_collection() -> None:
     """Delete the local Chroma store and clear cached client state."""
-    global _CLIENT, _COLLECTION
-    _CLIENT = None
-    _COLLECTION = None
-    if DB_ROOT.exists():
-        shutil.rmtree(DB_ROOT, ignore_errors=True)
-    DB_ROOT.mkdir(parents=True, exist_ok=True)
+    global _CLIENT, _COLLECTION, _COLLECTION_MTIME, _LEASE
+    with _COLLECTION_LOCK:
+        if _LEASE is not None:
+            _LEASE.close()
+        _CLIENT = None
+        _COLLECTION = None
+        _COLLECTION_MTIME = None
+        _LEASE = None
+        for path in DEDUP_DIR.glob("*.npz"):
+            drop_dedup_index(path)
+        for path in DB_ROOT.glob("bm25_*.sqlite"):
+            drop_bm25_index(path)
+        if DB_ROOT.exists():
+            shutil.rmtree(DB_ROOT, ignore_errors=True)
+        DB_ROOT.mkdir(parents=True, exist_ok=True)
 
 
 def get_collection() -> Collection:
-    """Get or create the default ChromaDB collection (legacy helper)."""
-    global _CLIENT, _COLLECTION
-    if _COLLECTION is None:
-        if not CHROMADB_AVAILABLE:
-            raise RuntimeError("ChromaDB not available. Install with: pip install chromadb")
-        _CLIENT = chromadb.PersistentClient(path=str(DB_ROOT))
-        _COLLECTION = _CLIENT.get_or_create_collection(
-            name=COLLECTION_NAME,
-            metadata={"hnsw:space": "cosine"},
-        )
-    return _COLLECTION
+    """Get or create the active ChromaDB collection (legacy helper).
+
+    The active pointer is re-checked on every call (one ``stat``), so a swap
+    made by another worker is picked up on that worker's next request.
+    """
+    global _COLLECTION_MTIME
+    target = _WRITE_TARGET.get()
+    if target is not None:
+        return target
+    with _COLLECTION_LOCK:
+        mtime = _pointer_mtime()
+        if _COLLECTION is not None and mtime == _COLLECTION_MTIME:
+            return _COLLECTION
+        first_bind = _COLLECTION is None
+        name = active_collection_name()
+        if first_bind or _COLLECTION.name != name:
+            _bind_locked(
+                _get_client().get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+            )
+        _COLLECTION_MTIME = mtime
+        if first_bind and _read_pointer().get("retired"):
+            # A previous process may have exited before dropping what it retired.
+            _drop_retired_later()
+        return _COLLECTION
+
+
+def create_shadow_collection() -> Collection:
+    """Fresh, empty collection to rebuild into while the active one keeps serving."""
+    client = _get_client()
+    name = f"{COLLECTION_NAME}_{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}"
+    try:
+        client.delete_collection(name=name)
+    except Exception:
+        pass
+    return client.create_collection(name=name, metadata={"hnsw:space": "cosine"})
+
+
+@contextmanager
+def writing_to(collection: Collection) -> Iterator[Collection]:
+    """Route ``get_collection()`` in the current thread/context to ``collection``."""
+    token = _WRITE_TARGET.set(collection)
+    try:
+        yield collection
+    finally:
+        _WRITE_TARGET.reset(token)
+
+
+@contextmanager
+def rebuilding() -> Iterator[None]:
+    """Held by a full rebuild from before the shadow is created until after the swap."""
+    with _flocked(REBUILD_LOCK):
+        yield
+
+
+@contextmanager
+def live_writes() -> Iterator[None]:
+    """Wrap writes to the active collection: they wait while a full rebuild runs.
+
+    Otherwise they would land in the collection the rebuild is about to
+    retire. Code already writing into a shadow (inside :func:`writing_to`) is
+    the rebuild itself and passes straight through.
+    """
+    if _WRITE_TARGET.get() is not None:
+        yield
+        return
+    with _flocked(REBUILD_LOCK, exclusive=False):
+        yield
+
+
+def _drop_retired() -> bool:
+    """Drop retired collections no worker is bound to any more; True when none are left."""
+    remaining = []
+    with _flocked(ACTIVE_POINTER.with_suffix(".lock")):
+        pointer = _read_pointer()
+        retired = pointer.get("retired") or []
+        for entry in retired:
+            name = entry.get("name")
+            if not name or name == pointer.get("name"):
+                continue
+            if time.time() - float(entry.get("retired_at", 0)) < SWAP_DROP_GRACE_SECONDS:
+                remaining.append(entry)
+                continue
+            with _flocked(_lease_path(name), blocking=False) as free:
+                if not free:
+                    remaining.append(entry)  # some worker has not rebound yet
+                    continue
+                try:
+                    _get_client().delete_collection(name=name)
+                    logger.info("Dropped retired collection %s", name)
+                except Exception as exc:
+                    logger.warning("Failed to drop retired collection %s: %s", name, exc)
+                drop_dedup_index(DEDUP_DIR / f"{name}.npz")
+                drop_bm25_index(_lexical_path(name))
+            _lease_path(name).unlink(missing_ok=True)
+        if len(remaining) != len(retired):
+            pointer["retired"] = remaining
+            _write_pointer(pointer)
+    return not remaining
+
+
+def _drop_retired_later() -> None:
+    def _drop() -> None:
+        try:
+            if _drop_retired():
+                return
+        except Exception as exc:
+            logger.warning("Dropping retired collections failed: %s", exc)
+        _drop_retired_later()  # a worker still holds a lease; try again later
+
+    timer = threading.Timer(max(SWAP_DROP_GRACE_SECONDS, 1.0), _drop)
+    timer.daemon = True
+    timer.start()
+
+
+def swap_collection(collection: Collection) -> None:
+    """Atomically make ``collection`` the active one and retire the previous collection.
+
+    Other workers rebind on their next :func:`get_collection` call; the old
+    collection is dropped once none of them holds its lease any more.
+    """
+    global _COLLECTION_MTIME
+    with _COLLECTION_LOCK, _flocked(ACTIVE_POINTER.with_suffix(".lock")):
+        pointer = _read_pointer()
+        previous = pointer.get("name") or (_COLLECTION.name if _COLLECTION is not None else COLLECTION_NAME)
+        retired = [entry for entry in pointer.get("retired") or [] if entry.get("name") != collection.name]
+        if previous != collection.name:
+            retired.append({"name": previous, "retired_at": time.time()})
+        _write_pointer({"name": collection.name, "swapped_at": time.time(), "retired": retired})
+        _bind_locked(collection)
+        _COLLECTION_MTIME = _pointer_mtime()
+    logger.info("Swapped active RAG collection %s -> %s", previous, collection.name)
+    if retired:
+        _drop_retired_later()
+
+
+def drop_collection(collection: Collection) -> None:
+    try:
+        _get_client().delete_collection(name=collection.name)
+        drop_dedup_index(DEDUP_DIR / f"{collection.name}.npz")
+        drop_bm25_index(_lexical_path(collection.name))
+    except Exception as exc:
+        logger.warning("Failed to drop collection %s: %s", collection.name, exc)
 
 
 __all__ = [
     "ChromaVectorStore",
     "CHROMADB_AVAILABLE",
+    "encode_metadata",
+    "decode_metadata",
+    "migrate_collection_metadata",
     "get_collection",
     "reset_collection",
+    "active_collection_name",
+    "create_shadow_collection",
+    "writing_to",
+    "rebuilding",
+    "live_writes",
+    "swap_collection",
+    "drop_collection",
+    "dedup_index",
+    "lexical_index",
+    "delete_documents",
     "DB_ROOT",
     "COLLECTION_NAME",
 ]
@@ -0,0 +1,172 @@
+"""Chunked CSV reading with a resumable per-file row checkpoint.
+
+Ingest paths read CSVs ``RAG_CSV_CHUNK_ROWS`` rows at a time instead of
+loading the whole file, so memory stays bounded regardless of file size.
+After each chunk is stored the caller commits the row offset; if ingestion is
+interrupted, the next run of the same (unchanged) file resumes from there.
+Chunk ids committed alongside the offset are appended to a per-file sidecar,
+so a resumed run can report every id the file produced, not just its own.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = int(os.getenv("RAG_CSV_CHUNK_ROWS", "5000"))
+CHECKPOINT_PATH = Path(
+    os.getenv("RAG_CSV_CHECKPOINT_PATH", str(Path(__file__).resolve().parents[1] / ".csv_ingest_checkpoint.json"))
+)
+
+
+def file_signature(path: Path) -> Tuple[int, float]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime
+
+
+def iter_csv_chunks(
+    source: Union[Path, Any],
+    *,
+    chunk_rows: int = CHUNK_ROWS,
+    start_row: int = 0,
+    max_rows: int = 0,
+) -> Iterator[Tuple[int, pd.DataFrame]]:
+    """Yield ``(row offset, chunk)`` pairs, skipping the first ``start_row`` data rows.
+
+    ``max_rows`` (0 = unlimited) caps the total number of rows read from the
+    start of the file, including skipped ones.
+    """
+    chunk_rows = max(1, chunk_rows)
+    skip = range(1, start_row + 1) if start_row else None  # keep the header line
+    reader = pd.read_csv(source, chunksize=chunk_rows, skiprows=skip)
+    offset = start_row
+    with reader:
+        for chunk in reader:
+            if max_rows:
+                remaining = max_rows - offset
+                if remaining <= 0:
+                    break
+                chunk = chunk.head(remaining)
+            if chunk.empty:
+                continue
+            chunk.index = range(offset, offset + len(chunk))
+            yield offset, chunk
+            offset += len(chunk)
+
+
+class CsvCheckpoint:
+    """JSON file of ``{"<store>:<path>": {size, mtime, rows, complete}}`` ingest offsets.
+
+    ``store`` separates targets (e.g. the chatbot Chroma collection and the
+    local vector store) that ingest the same CSV independently.
+    """
+
+    def __init__(self, path: Path = CHECKPOINT_PATH):
+        self.path = Path(path)
+        self.ids_dir = self.path.parent / f"{self.path.stem}.ids"
+        self._lock = threading.Lock()
+        self._state: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                self._state = json.loads(self.path.read_text())
+            except Exception as exc:
+                logger.warning("Ignoring unreadable CSV checkpoint %s: %s", self.path, exc)
+
+    @staticmethod
+    def _key(store: str, csv_path: Path) -> str:
+        return f"{store}:{Path(csv_path).resolve()}"
+
+    def _ids_path(self, key: str) -> Path:
+        return self.ids_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]}.jsonl"
+
+    def resume_offset(self, store: str, csv_path: Path) -> int:
+        """Rows already stored for an unchanged, partially ingested file (else 0)."""
+        with self._lock:
+            entry = self._state.get(self._key(store, csv_path))
+        if not entry or entry.get("complete"):
+            return 0
+        size, mtime = file_signature(Path(csv_path))
+        if entry.get("size") != size or entry.get("mtime") != mtime:
+            return 0
+        return int(entry.get("rows", 0))
+
+    def resumed_ids(self, store: str, csv_path: Path) -> Tuple[List[str], List[str]]:
+        """``(ids, duplicate_of)`` committed by the interrupted run that ``resume_offset`` continues."""
+        ids: List[str] = []
+        duplicate_of: List[str] = []
+        with self._lock:
+            path = self._ids_path(self._key(store, csv_path))
+            if not path.exists():
+                return ids, duplicate_of
+            with path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    if line.strip():
+                        entry = json.loads(line)
+                        ids.extend(entry.get("ids") or [])
+                        duplicate_of.extend(entry.get("duplicate_of") or [])
+        return ids, duplicate_of
+
+    def commit(
+        self,
+        store: str,
+        csv_path: Path,
+        rows: int,
+        *,
+        complete: bool = False,
+        ids: Sequence[str] = (),
+        duplicate_of: Sequence[str] = (),
+    ) -> None:
+        """Record ``rows`` stored so far; ``ids`` / ``duplicate_of`` are those of the chunk just written."""
+        size, mtime = file_signature(Path(csv_path))
+        key = self._key(store, csv_path)
+        with self._lock:
+            previous = self._state.get(key)
+            ids_path = self._ids_path(key)
+            continuing = (
+                previous is not None
+                and not previous.get("complete")
+                and previous.get("size") == size
+                and previous.get("mtime") == mtime
+            )
+            if complete or not continuing:
+                ids_path.unlink(missing_ok=True)
+            if not complete and (ids or duplicate_of):
+                self.ids_dir.mkdir(parents=True, exist_ok=True)
+                with ids_path.open("a", encoding="utf-8") as handle:
+                    handle.write(json.dumps({"ids": list(ids), "duplicate_of": list(duplicate_of)}) + "\n")
+            self._state[key] = {
+                "size": size,
+                "mtime": mtime,
+                "rows": rows,
+                "complete": complete,
+            }
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self._state, indent=2))
+        os.replace(tmp, self.path)
+
+
+_CHECKPOINT: Optional[CsvCheckpoint] = None
+_CHECKPOINT_LOCK = threading.Lock()
+
+
+def get_checkpoint() -> CsvCheckpoint:
+    global _CHECKPOINT
+    with _CHECKPOINT_LOCK:
+        if _CHECKPOINT is None:
+            _CHECKPOINT = CsvCheckpoint()
+        return _CHECKPOINT
+
+
+__all__ = ["CHUNK_ROWS", "CsvCheckpoint", "file_signature", "get_checkpoint", "iter_csv_chunks"]
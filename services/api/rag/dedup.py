@@ -0,0 +1,404 @@
+"""Near-duplicate chunk elimination with MinHash signatures and an LSH index.
+
+Every chunk headed for the encoder gets a MinHash signature over its word
+shingles. Chunks whose estimated Jaccard similarity to an already indexed
+chunk from *another* source reaches ``RAG_DEDUP_THRESHOLD`` are dropped before
+embedding (re-runs of the same agent, ``.bak`` copies of UI pages, ...).
+
+Rendered table rows are handled differently: two CSV records can share every
+feature column and differ only in an id or decision column, which MinHash
+scores as near-identical. Items flagged ``tabular`` therefore never enter the
+LSH buckets and are only dropped as exact repeats of their full text.
+
+One index is kept per vector collection and persisted next to it as an
+``.npz`` file. Entries are only trusted after the matched id is confirmed to
+still exist in the collection, so chunks deleted by other code paths never
+suppress new content. Removed entries leave their LSH buckets at once and
+their slots are reclaimed when the index is saved. Saving takes an ``flock``
+next to the file and merges entries other processes saved in the meantime.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts fall back to in-process locking
+    fcntl = None
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEDUP_ENABLED = os.getenv("RAG_DEDUP_ENABLED", "true").lower() in {"true", "1", "yes"}
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.9"))
+NUM_PERM = int(os.getenv("RAG_DEDUP_NUM_PERM", "64"))
+SHINGLE_WORDS = int(os.getenv("RAG_DEDUP_SHINGLE", "3"))
+_SEED = 1
+_FORMAT = 2  # bumped when the saved arrays change; older files are rebuilt
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64((1 << 32) - 1)
+_TOKEN_RE = re.compile(r"\w+")
+_FP_WEIGHT = 0.2
+
+DedupItem = Tuple[str, str, str]  # (doc id, text, source)
+ExistsFn = Callable[[List[str]], Set[str]]
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b((text or "").encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) minimising the weighted false positive + false negative area around ``threshold``.
+
+    Candidates are verified against the full signature, so a false positive
+    only costs a comparison while a false negative lets a duplicate through.
+    """
+    grid = np.linspace(0.0, 1.0, 201)
+    below = grid < threshold
+    best, best_error = (1, num_perm), float("inf")
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            candidate = 1.0 - (1.0 - grid**rows) ** bands
+            error = float(np.where(below, _FP_WEIGHT * candidate, (1.0 - _FP_WEIGHT) * (1.0 - candidate)).sum())
+            if error < best_error:
+                best, best_error = (bands, rows), error
+    return best
+
+
+class NearDuplicateIndex:
+    """MinHash + banded LSH over ``(id, source)`` entries, saved to ``path``."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        threshold: float = DEDUP_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        shingle_words: int = SHINGLE_WORDS,
+    ):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_words = max(1, shingle_words)
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        rng = np.random.default_rng(_SEED)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._ids: List[Optional[str]] = []  # None = removed slot
+        self._sources: List[str] = []
+        self._signatures: List[Optional[np.ndarray]] = []
+        self._digests: List[int] = []
+        self._tabular: List[bool] = []
+        self._removed = 0
+        self._slot_by_id: Dict[str, int] = {}
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        self._slots_by_digest: Dict[int, List[int]] = {}
+        self._discarded: Set[str] = set()  # removed since the last save; not merged back from disk
+        self._dirty = False
+        self.skipped = 0
+        self._load()
+
+    # ── signatures ───────────────────────────────────────────────
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        tokens = _TOKEN_RE.findall((text or "").lower())
+        if not tokens:
+            return None
+        k = self.shingle_words
+        shingles = {" ".join(tokens[i : i + k]) for i in range(max(1, len(tokens) - k + 1))}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        # Universal hashing (a*x + b) mod p; a, x < 2**32 keeps the product inside uint64.
+        permuted = ((hashes[:, None] * self._a + self._b) % _PRIME) & _MASK
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows : (band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    # ── index maintenance ────────────────────────────────────────
+    def _insert(self, doc_id: str, source: str, signature: np.ndarray, digest: int, tabular: bool) -> None:
+        previous = self._slot_by_id.get(doc_id)
+        if previous is not None:
+            self._remove_slot(previous)
+        slot = len(self._ids)
+        self._ids.append(doc_id)
+        self._sources.append(source)
+        self._signatures.append(signature)
+        self._digests.append(digest)
+        self._tabular.append(tabular)
+        self._slot_by_id[doc_id] = slot
+        self._discarded.discard(doc_id)
+        self._slots_by_digest.setdefault(digest, []).append(slot)
+        if not tabular:
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(slot)
+        self._dirty = True
+
+    def _remove_slot(self, slot: int) -> None:
+        """Unlink ``slot`` from its buckets and free its signature (the slot number stays reserved)."""
+        same_text = self._slots_by_digest.get(self._digests[slot])
+        if same_text is not None:
+            if slot in same_text:
+                same_text.remove(slot)
+            if not same_text:
+                del self._slots_by_digest[self._digests[slot]]
+        signature = self._signatures[slot]
+        if signature is not None and not self._tabular[slot]:
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is None:
+                    continue
+                try:
+                    bucket.remove(slot)
+                except ValueError:
+                    pass
+                if not bucket:
+                    del self._buckets[band][key]
+        self._ids[slot] = None
+        self._sources[slot] = ""
+        self._signatures[slot] = None
+        self._removed += 1
+        self._dirty = True
+
+    def _compact_locked(self) -> None:
+        """Renumber live slots once removed ones dominate, so the lists stop growing."""
+        if self._removed <= max(1024, len(self._slot_by_id)):
+            return
+        live = [
+            (
+                self._ids[slot],
+                self._sources[slot],
+                self._signatures[slot],
+                self._digests[slot],
+                self._tabular[slot],
+            )
+            for slot in sorted(self._slot_by_id.values())
+        ]
+        self._ids, self._sources, self._signatures, self._digests, self._tabular = [], [], [], [], []
+        self._slot_by_id = {}
+        self._buckets = [{} for _ in range(self.bands)]
+        self._slots_by_digest = {}
+        self._removed = 0
+        for entry in live:
+            self._insert(*entry)
+
+    def discard(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                slot = self._slot_by_id.pop(doc_id, None)
+                if slot is not None:
+                    self._remove_slot(slot)
+                    self._discarded.add(doc_id)
+
+    def _matches(self, signature: np.ndarray, digest: int, tabular: bool) -> List[int]:
+        if tabular:
+            # Table rows only match on identical text: similar rows are distinct records.
+            return [slot for slot in self._slots_by_digest.get(digest, ()) if self._ids[slot] is not None]
+        candidates: Set[int] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        return [
+            slot
+            for slot in candidates
+            if self._ids[slot] is not None
+            and float(np.mean(self._signatures[slot] == signature)) >= self.threshold
+        ]
+
+    # ── filtering ────────────────────────────────────────────────
+    def filter(
+        self,
+        items: Sequence[DedupItem],
+        *,
+        session: Set[str],
+        exists: Optional[ExistsFn] = None,
+        tabular: Optional[Sequence[bool]] = None,
+    ) -> Tuple[List[bool], List[str]]:
+        """Return a keep-mask for ``items`` and the ids of the chunks the dropped ones duplicate.
+
+        ``session`` holds ids indexed earlier by the same writer; those are
+        trusted without an existence check and may also deduplicate chunks of
+        their own source. Older entries from the same source never count, so a
+        source can be re-ingested while its previous chunks are still present.
+        ``exists`` (ids -> ids still stored) prunes entries whose row is gone.
+        ``tabular`` (aligned with ``items``) marks rendered table rows, which
+        are only dropped as exact repeats of an indexed text.
+        """
+        flags = list(tabular) if tabular is not None else [False] * len(items)
+        signatures = [self.signature(text) for _, text, _ in items]
+        digests = [_digest(text) for _, text, _ in items]
+        with self._lock:
+            matches = [
+                self._matches(sig, digest, flag) if sig is not None else []
+                for sig, digest, flag in zip(signatures, digests, flags)
+            ]
+            to_verify = sorted(
+                {
+                    self._ids[slot]
+                    for (doc_id, _, source), slots in zip(items, matches)
+                    for slot in slots
+                    if self._ids[slot] not in session
+                    and self._ids[slot] != doc_id
+                    and self._sources[slot] != source
+                }
+            )
+        alive = set(to_verify)
+        if exists is not None and to_verify:
+            try:
+                alive = set(exists(to_verify))
+                self.discard(doc_id for doc_id in to_verify if doc_id not in alive)
+            except Exception as exc:
+                # Without verification stale entries are indistinguishable: keep everything.
+                logger.debug("Dedup existence check failed: %s", exc)
+                alive = set()
+
+        keep: List[bool] = []
+        duplicate_of: List[str] = []
+        with self._lock:
+            batch_start = len(self._ids)
+            for (doc_id, _, source), sig, digest, flag, slots in zip(items, signatures, digests, flags, matches):
+                if sig is None:
+                    keep.append(True)
+                    continue
+                if len(self._ids) > batch_start:
+                    # Chunks kept earlier in this batch are session entries too.
+                    slots = slots + [slot for slot in self._matches(sig, digest, flag) if slot >= batch_start]
+                original = next(
+                    (
+                        self._ids[slot]
+                        for slot in slots
+                        if self._ids[slot] is not None
+                        and self._ids[slot] != doc_id
+                        and (self._ids[slot] in session or (self._sources[slot] != source and self._ids[slot] in alive))
+                    ),
+                    None,
+                )
+                if original is not None:
+                    keep.append(False)
+                    duplicate_of.append(original)
+                    self.skipped += 1
+                    continue
+                self._insert(doc_id, source, sig, digest, flag)
+                session.add(doc_id)
+                keep.append(True)
+        return keep, duplicate_of
+
+    # ── persistence ──────────────────────────────────────────────
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Inter-process ``flock`` next to the index file, held while it is merged and rewritten."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a+") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            yield
+
+    def _read(self) -> Iterator[Tuple[str, str, np.ndarray, int, bool]]:
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                params = tuple(int(value) for value in data["params"])
+                if params != (self.num_perm, _SEED, self.shingle_words, _FORMAT):
+                    logger.info("Dedup index %s was built with other MinHash params; starting fresh", self.path)
+                    return
+                entries = zip(data["ids"], data["sources"], data["signatures"], data["digests"], data["tabular"])
+                for doc_id, source, signature, digest, tabular in entries:
+                    yield str(doc_id), str(source), signature.astype(np.uint32), int(digest), bool(tabular)
+        except Exception as exc:
+            logger.warning("Ignoring unreadable dedup index %s: %s", self.path, exc)
+
+    def _load(self) -> None:
+        for entry in self._read():
+            self._insert(*entry)
+        self._dirty = False
+
+    def save(self) -> None:
+        """Merge entries saved by other processes since our load, then rewrite the file."""
+        with self._lock:
+            if not self._dirty:
+                return
+        with self._locked():
+            on_disk = list(self._read())
+            with self._lock:
+                for entry in on_disk:
+                    if entry[0] not in self._slot_by_id and entry[0] not in self._discarded:
+                        self._insert(*entry)
+                self._compact_locked()
+                live = [slot for slot, doc_id in enumerate(self._ids) if doc_id is not None]
+                ids = np.array([self._ids[slot] for slot in live], dtype=str)
+                sources = np.array([self._sources[slot] for slot in live], dtype=str)
+                signatures = (
+                    np.stack([self._signatures[slot] for slot in live])
+                    if live
+                    else np.empty((0, self.num_perm), dtype=np.uint32)
+                )
+                digests = np.array([self._digests[slot] for slot in live], dtype=np.uint64)
+                tabular = np.array([self._tabular[slot] for slot in live], dtype=bool)
+                self._discarded.clear()
+                self._dirty = False
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("wb") as handle:
+                np.savez(
+                    handle,
+                    params=np.array([self.num_perm, _SEED, self.shingle_words, _FORMAT]),
+                    ids=ids,
+                    sources=sources,
+                    signatures=signatures,
+                    digests=digests,
+                    tabular=tabular,
+                )
+            os.replace(tmp, self.path)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            live = len(self._slot_by_id)
+        return {
+            "entries": live,
+            "skipped": self.skipped,
+            "threshold": self.threshold,
+            "bands": self.bands,
+            "rows_per_band": self.rows,
+        }
+
+
+_INDEXES: Dict[Path, NearDuplicateIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def get_dedup_index(path: Path) -> Optional[NearDuplicateIndex]:
+    """Shared index persisted at ``path`` (None when ``RAG_DEDUP_ENABLED`` is off)."""
+    if not DEDUP_ENABLED:
+        return None
+    path = Path(path).resolve()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(path)
+        if index is None:
+            index = _INDEXES[path] = NearDuplicateIndex(path)
+        return index
+
+
+def drop_dedup_index(path: Path) -> None:
+    path = Path(path).resolve()
+    with _INDEXES_LOCK:
+        _INDEXES.pop(path, None)
+    path.unlink(missing_ok=True)
+
+
+def is_tabular(meta: Dict[str, object]) -> bool:
+    """Whether ``meta`` belongs to a rendered table row (every CSV ingest path records ``row_index``)."""
+    return meta.get("row_index") is not None
+
+
+__all__ = ["DEDUP_THRESHOLD", "NearDuplicateIndex", "drop_dedup_index", "get_dedup_index", "is_tabular"]
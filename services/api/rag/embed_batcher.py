@@ -0,0 +1,117 @@
+"""Micro-batching front end for single-query embeddings.
+
+Chat endpoints embed one question per request. Under concurrent load those
+one-row ``encode`` calls are coalesced here: a worker thread collects requests
+for up to ``EMBED_BATCH_WAIT_MS`` (or ``EMBED_BATCH_MAX`` texts), runs them
+through :func:`embed_texts` as one batch and hands each caller its own row.
+Query vectors bypass the persistent embedding cache.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from .embeddings import embed_texts
+
+logger = logging.getLogger(__name__)
+
+BATCHING_ENABLED = os.getenv("EMBED_BATCHING", "true").lower() in {"true", "1", "yes"}
+MAX_BATCH = int(os.getenv("EMBED_BATCH_MAX", "32"))
+MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_WAIT_MS", "5"))
+
+_Request = Tuple[str, Optional[str], Future]
+
+
+class EmbeddingBatcher:
+    def __init__(self, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, text: str, model: Optional[str] = None) -> Future:
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, model, future))
+        return future
+
+    def embed(self, text: str, model: Optional[str] = None, timeout: Optional[float] = None) -> List[float]:
+        return self.submit(text, model).result(timeout=timeout)
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            by_model: Dict[Optional[str], List[_Request]] = {}
+            for request in batch:
+                by_model.setdefault(request[1], []).append(request)
+            for model, requests in by_model.items():
+                live = [req for req in requests if req[2].set_running_or_notify_cancel()]
+                if not live:
+                    continue
+                try:
+                    vectors = embed_texts([req[0] for req in live], model=model, use_cache=False)
+                except Exception as exc:
+                    for req in live:
+                        req[2].set_exception(exc)
+                    continue
+                for req, vector in zip(live, vectors):
+                    req[2].set_result(vector)
+            self.batches += 1
+            self.requests += len(batch)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "enabled": BATCHING_ENABLED,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": self._queue.qsize(),
+        }
+
+
+_BATCHER = EmbeddingBatcher()
+
+
+def embed_query(text: str, model: Optional[str] = None) -> List[float]:
+    """Embed one query string, coalescing with concurrent callers when enabled."""
+    if not BATCHING_ENABLED:
+        return embed_texts([text], model=model, use_cache=False)[0]
+    return _BATCHER.embed(text, model)
+
+
+def batcher_stats() -> Dict[str, float]:
+    return _BATCHER.stats()
+
+
+__all__ = ["EmbeddingBatcher", "embed_query", "batcher_stats"]
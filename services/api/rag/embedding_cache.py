@@ -0,0 +1,180 @@
+"""Persistent content-hash cache for sentence embeddings.
+
+Vectors are stored in SQLite keyed by ``(model name, sha256(text))`` so a RAG
+rebuild only sends new or changed text to the encoder. Only document/ingest
+embeddings are cached; query embeddings never touch the disk. The table is
+bounded by ``EMBED_CACHE_MAX_ROWS``; the least recently used rows are evicted
+first. Lookups only read: ``last_used`` bumps are buffered and written with the
+next insert batch (or every ``_TOUCH_BATCH`` hits), and the row count is
+re-read from the table before trimming, so several workers sharing the file
+agree on its size.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() in {"true", "1", "yes"}
+CACHE_PATH = Path(
+    os.getenv("EMBED_CACHE_PATH", str(Path(__file__).resolve().parents[1] / ".embedding_cache.sqlite"))
+)
+CACHE_MAX_ROWS = int(os.getenv("EMBED_CACHE_MAX_ROWS", "500000"))
+_SQL_BATCH = 500  # stay well below SQLite's bound-parameter limit
+_TOUCH_BATCH = 4096  # buffered last_used bumps before they are flushed without an insert
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Size-bounded SQLite store of float32 embedding vectors."""
+
+    def __init__(self, path: Path = CACHE_PATH, max_rows: int = CACHE_MAX_ROWS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched: Dict[tuple, float] = {}
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, digest)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._conn.commit()
+        self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return cached vectors aligned with ``texts`` (None for misses)."""
+        digests = [text_digest(text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            unique = list(dict.fromkeys(digests))
+            for start in range(0, len(unique), _SQL_BATCH):
+                chunk = unique[start : start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE model = ? AND digest IN ({placeholders})",
+                    [model, *chunk],
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+            for digest in found:
+                self._touched[(model, digest)] = now
+            if len(self._touched) >= _TOUCH_BATCH:
+                self._flush_touched_locked()
+                self._conn.commit()
+            result = [found.get(digest) for digest in digests]
+            hit_count = sum(vec is not None for vec in result)
+            self.hits += hit_count
+            self.misses += len(result) - hit_count
+        return result
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        now = time.time()
+        records = [
+            (model, text_digest(text), np.asarray(vec, dtype=np.float32).tobytes(), now)
+            for text, vec in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._flush_touched_locked()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, digest, vector, last_used) VALUES (?, ?, ?, ?)",
+                records,
+            )
+            # Other workers insert into the same file, so count the table rather than our own writes.
+            self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if self.max_rows and self._rows > self.max_rows:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _flush_touched_locked(self) -> None:
+        if not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE embeddings SET last_used = MAX(last_used, ?) WHERE model = ? AND digest = ?",
+            [(used, model, digest) for (model, digest), used in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def _evict_locked(self) -> None:
+        # Trim to 90% of the bound so eviction does not run on every insert.
+        target = int(self.max_rows * 0.9)
+        excess = self._rows - target
+        cursor = self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE (model, digest) IN (
+                SELECT model, digest FROM embeddings ORDER BY last_used ASC LIMIT ?
+            )
+            """,
+            (excess,),
+        )
+        removed = max(cursor.rowcount, 0)
+        self._rows -= removed
+        self.evictions += removed
+        logger.info("Evicted %d embeddings from cache %s", removed, self.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._touched.clear()
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._rows = 0
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "rows": self._rows,
+            "max_rows": self.max_rows,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+_CACHE: Optional[EmbeddingCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache, or None when disabled or the file cannot be opened."""
+    global _CACHE, CACHE_ENABLED
+    if not CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            try:
+                _CACHE = EmbeddingCache()
+            except Exception as exc:
+                logger.warning("Embedding cache unavailable, encoding without it: %s", exc)
+                CACHE_ENABLED = False
+                return None
+    return _CACHE
+
+
+__all__ = ["EmbeddingCache", "get_embedding_cache", "text_digest"]
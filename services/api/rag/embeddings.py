@@ -2,10 +2,13 @@
 from __future__ import annotations
 
 import os
-from typing import Iterable, List
+from typing import Dict, Iterable, List
 
 from sentence_transformers import SentenceTransformer
 
+from .embedding_cache import get_embedding_cache
+from .encoder_registry import default_backend, get_encoder
+
 # Try to import select_device, fallback to "cpu" if not available
 try:
     from .utils import select_device
@@ -14,22 +17,18 @@ except ImportError:
     _DEVICE = "cpu"
 
 DEFAULT_MODEL = os.getenv("SENTENCE_TRANSFORMER_MODEL", "all-MiniLM-L6-v2")
-_MODEL: SentenceTransformer | None = None
 
 
-def _load_model(device: str | None = None) -> SentenceTransformer:
-    global _MODEL, _DEVICE
+def _load_model(device: str | None = None, model: str | None = None) -> SentenceTransformer:
+    global _DEVICE
     target = device or _DEVICE
     _DEVICE = target
-    _MODEL = SentenceTransformer(DEFAULT_MODEL, device=target)
-    return _MODEL
+    return get_encoder(model or DEFAULT_MODEL, device=target)
 
 
-def _get_model() -> SentenceTransformer:
-    global _MODEL
-    if _MODEL is None:
-        return _load_model(_DEVICE)
-    return _MODEL
+def _get_model(model: str | None = None) -> SentenceTransformer:
+    # Models are shared process-wide through the encoder registry.
+    return get_encoder(model or DEFAULT_MODEL, device=_DEVICE)
 
 
 def embeddings_available() -> bool:
@@ -40,20 +39,45 @@ def embeddings_available() -> bool:
         return False
 
 
-def embed_texts(texts: Iterable[str], model: str | None = None) -> List[List[float]]:
-    payload = list(texts)
-    if not payload:
-        return []
-    encoder = _get_model()
-    if model and model != DEFAULT_MODEL:
-        encoder = SentenceTransformer(model, device=_DEVICE)
+def _encode(payload: List[str], model: str | None = None) -> List[List[float]]:
+    encoder = _get_model(model)
     try:
         vectors = encoder.encode(payload, show_progress_bar=False)
     except Exception:
         if _DEVICE != "cpu":
             # Fallback to CPU if GPU execution fails.
-            encoder = _load_model("cpu")
+            encoder = _load_model("cpu", model)
             vectors = encoder.encode(payload, show_progress_bar=False)
         else:
             raise
     return [vec.tolist() for vec in vectors]
+
+
+def embed_texts(texts: Iterable[str], model: str | None = None, use_cache: bool = True) -> List[List[float]]:
+    """Encode ``texts``; ``use_cache=False`` (query embeddings) bypasses the persistent cache."""
+    payload = list(texts)
+    if not payload:
+        return []
+    cache = get_embedding_cache() if use_cache else None
+    if cache is None:
+        return _encode(payload, model)
+
+    model_name = model or DEFAULT_MODEL
+    backend = default_backend("bi")
+    if backend != "torch":
+        # ONNX / int8 vectors differ slightly from torch ones; keep them apart.
+        model_name = f"{model_name}@{backend}"
+    cached = cache.get_many(model_name, payload)
+    # Only cache misses reach the encoder, each distinct text once.
+    missing = list(dict.fromkeys(payload[idx] for idx, vec in enumerate(cached) if vec is None))
+    encoded = {}
+    if missing:
+        vectors = _encode(missing, model)
+        cache.put_many(model_name, missing, vectors)
+        encoded = dict(zip(missing, vectors))
+    return [vec.tolist() if vec is not None else encoded[text] for text, vec in zip(payload, cached)]
+
+
+def embedding_cache_stats() -> Dict[str, float]:
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {}
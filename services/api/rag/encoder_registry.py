@@ -0,0 +1,377 @@
+"""Process-wide registry of sentence-transformer encoders and cross-encoders.
+
+Every embedding / reranking call site asks the registry for a model instead of
+constructing ``SentenceTransformer(...)`` itself, so each model is loaded once
+per process. Resident models are bounded by ``ENCODER_MAX_MODELS`` (least
+recently used is dropped first) and models idle for longer than
+``ENCODER_IDLE_SECONDS`` are unloaded by a background reaper.
+
+``ENCODER_BACKEND`` / ``RERANKER_BACKEND`` pick the runtime:
+
+* ``torch`` (default) - PyTorch sentence-transformers.
+* ``torch-int8`` - PyTorch with dynamic int8 quantization of Linear layers.
+* ``onnx`` - ONNX Runtime export of the same weights.
+* ``onnx-int8`` - dynamically int8-quantized ONNX model, exported once into
+  ``ENCODER_ONNX_DIR`` and reused afterwards.
+
+Quantized backends always run on CPU. The ONNX backends need
+sentence-transformers >= 3.2 (>= 4.1 for cross-encoders) plus ``onnxruntime``
+and ``optimum``; with the pinned 2.x release they are rejected up front
+instead of failing inside the first encode. A configured default that does
+not validate is logged on first use and replaced by ``torch``; an explicit
+``backend=`` argument still raises.
+"""
+from __future__ import annotations
+
+import gc
+import importlib.util
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .utils import select_device
+
+logger = logging.getLogger(__name__)
+
+MAX_MODELS = int(os.getenv("ENCODER_MAX_MODELS", "3"))
+IDLE_SECONDS = int(os.getenv("ENCODER_IDLE_SECONDS", "1800"))  # 0 = never unload
+_REAP_INTERVAL = 60
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+DEFAULT_BACKENDS = {
+    "bi": os.getenv("ENCODER_BACKEND", "torch").lower(),
+    "cross": os.getenv("RERANKER_BACKEND", os.getenv("ENCODER_BACKEND", "torch")).lower(),
+}
+ONNX_EXPORT_DIR = Path(
+    os.getenv("ENCODER_ONNX_DIR", str(Path(__file__).resolve().parents[1] / ".onnx_models"))
+)
+ONNX_QUANT_CONFIG = os.getenv("ENCODER_ONNX_QCONFIG", "avx2")  # arm64 | avx2 | avx512 | avx512_vnni
+
+ONNX_MIN_VERSIONS = {"bi": (3, 2), "cross": (4, 1)}  # sentence-transformers releases with backend="onnx"
+
+ModelKey = Tuple[str, str, str, str]  # (kind, model name, device, backend)
+
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    parts = []
+    for part in version.split(".")[:3]:
+        digits = "".join(ch for ch in part if ch.isdigit())
+        if not digits:
+            break
+        parts.append(int(digits))
+    return tuple(parts)
+
+
+def check_backend(kind: str, backend: str) -> str:
+    """Validate ``backend`` for ``kind`` against the installed packages; returns it lower-cased."""
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    if not backend.startswith("onnx"):
+        return backend
+    try:
+        installed = metadata.version("sentence-transformers")
+    except metadata.PackageNotFoundError:
+        installed = "none"
+    required = ONNX_MIN_VERSIONS[kind]
+    missing = [pkg for pkg in ("onnxruntime", "optimum") if importlib.util.find_spec(pkg) is None]
+    if _version_tuple(installed) < required or missing:
+        needs = [f"sentence-transformers>={'.'.join(map(str, required))} (found {installed})"] + missing
+        raise ValueError(
+            f"Encoder backend '{backend}' for {kind}-encoders needs {', '.join(needs)}; "
+            "use 'torch' or 'torch-int8' with the pinned requirements"
+        )
+    return backend
+
+
+def _tensor_bytes(value: Any, seen: set) -> int:
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(item, seen) for item in value)
+    if not hasattr(value, "element_size"):
+        return 0
+    ptr = value.data_ptr()
+    if ptr in seen:  # tied weights, or a parameter that is also in the state dict
+        return 0
+    seen.add(ptr)
+    return value.numel() * value.element_size()
+
+
+def _model_bytes(model: Any) -> int:
+    """Parameter + buffer bytes of a torch-backed model (0 if unknown).
+
+    Dynamically quantized Linear layers keep their int8 weights in packed
+    params that only show up in ``state_dict()``, so that is counted too.
+    """
+    target = getattr(model, "model", model)  # CrossEncoder wraps the torch module
+    try:
+        seen: set = set()
+        total = sum(_tensor_bytes(p, seen) for p in target.parameters())
+        total += sum(_tensor_bytes(b, seen) for b in target.buffers())
+        total += sum(_tensor_bytes(v, seen) for v in target.state_dict().values())
+        return int(total)
+    except Exception:
+        return 0
+
+
+def _quantize_torch(model: Any) -> Any:
+    import torch
+
+    target = getattr(model, "model", None) if not isinstance(model, torch.nn.Module) else model
+    quantized = torch.quantization.quantize_dynamic(target, {torch.nn.Linear}, dtype=torch.qint8)
+    if target is not model:
+        model.model = quantized  # CrossEncoder keeps the HF module on .model
+        return model
+    return quantized
+
+
+def _onnx_int8_path(kind: str, name: str) -> Path:
+    return ONNX_EXPORT_DIR / kind / name.replace("/", "__")
+
+
+def _load_onnx_int8(cls: Any, kind: str, name: str) -> Any:
+    """Load (exporting on first use) a dynamically int8-quantized ONNX model."""
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = _onnx_int8_path(kind, name)
+    file_name = f"onnx/model_qint8_{ONNX_QUANT_CONFIG}.onnx"
+    if not (export_dir / file_name).exists():
+        logger.info("Exporting int8 ONNX %s encoder %s to %s", kind, name, export_dir)
+        base = cls(name, device="cpu", backend="onnx")
+        base.save_pretrained(str(export_dir))
+        export_dynamic_quantized_onnx_model(
+            base, ONNX_QUANT_CONFIG, str(export_dir), file_suffix=f"qint8_{ONNX_QUANT_CONFIG}"
+        )
+    return cls(str(export_dir), device="cpu", backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def _load_with_backend(cls: Any, kind: str, name: str, device: str, backend: str) -> Any:
+    if backend == "torch":
+        return cls(name, device=device)
+    if backend == "torch-int8":
+        return _quantize_torch(cls(name, device="cpu"))
+    if backend == "onnx":
+        return cls(name, device=device, backend="onnx")
+    if backend == "onnx-int8":
+        return _load_onnx_int8(cls, kind, name)
+    raise ValueError(f"Unknown encoder backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+
+
+_RESOLVED_BACKENDS: Dict[str, str] = {}
+_RESOLVED_LOCK = threading.Lock()
+
+
+def default_backend(kind: str) -> str:
+    """Configured backend for ``kind``, validated on first use (falls back to ``torch``)."""
+    with _RESOLVED_LOCK:
+        backend = _RESOLVED_BACKENDS.get(kind)
+        if backend is None:
+            try:
+                backend = check_backend(kind, DEFAULT_BACKENDS[kind])
+            except ValueError as exc:
+                logger.warning("%s; falling back to the 'torch' backend", exc)
+                backend = "torch"
+            _RESOLVED_BACKENDS[kind] = backend
+        return backend
+
+
+def _load_bi_encoder(name: str, device: str, backend: str) -> Any:
+    from sentence_transformers import SentenceTransformer
+
+    return _load_with_backend(SentenceTransformer, "bi", name, device, backend)
+
+
+def _load_cross_encoder(name: str, device: str, backend: str) -> Any:
+    from sentence_transformers import CrossEncoder
+
+    return _load_with_backend(CrossEncoder, "cross", name, device, backend)
+
+
+@dataclass
+class _Entry:
+    model: Any
+    bytes: int
+    loaded_at: float
+    last_used: float
+    uses: int = 0
+    load_seconds: float = 0.0
+
+
+@dataclass
+class EncoderRegistry:
+    max_models: int = MAX_MODELS
+    idle_seconds: int = IDLE_SECONDS
+    loaders: Dict[str, Callable[[str, str, str], Any]] = field(
+        default_factory=lambda: {"bi": _load_bi_encoder, "cross": _load_cross_encoder}
+    )
+
+    def __post_init__(self) -> None:
+        self._entries: "OrderedDict[ModelKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[ModelKey, threading.Lock] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self.loads = 0
+        self.evictions = 0
+
+    def _key(self, name: str, kind: str, device: Optional[str], backend: Optional[str]) -> ModelKey:
+        backend = default_backend(kind) if backend is None else check_backend(kind, backend)
+        device = "cpu" if backend.endswith("-int8") else (device or select_device())
+        return (kind, name, device, backend)
+
+    def get(
+        self,
+        name: str,
+        *,
+        kind: str = "bi",
+        device: Optional[str] = None,
+        backend: Optional[str] = None,
+    ) -> Any:
+        """Return a resident model, loading it (once, even under concurrency) on a miss."""
+        key = self._key(name, kind, device, backend)
+        entry = self._touch(key)
+        if entry is not None:
+            return entry.model
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            entry = self._touch(key)
+            if entry is not None:
+                return entry.model
+            started = time.time()
+            model = self.loaders[kind](key[1], key[2], key[3])
+            now = time.time()
+            entry = _Entry(
+                model=model,
+                bytes=_model_bytes(model),
+                loaded_at=now,
+                last_used=now,
+                uses=1,
+                load_seconds=round(now - started, 3),
+            )
+            logger.info(
+                "Loaded %s encoder %s on %s (%s) in %.1fs", kind, name, key[2], key[3], entry.load_seconds
+            )
+            with self._lock:
+                self._entries[key] = entry
+                self.loads += 1
+                while len(self._entries) > max(self.max_models, 1):
+                    self._drop_locked(next(iter(self._entries)))
+            self._ensure_reaper()
+            return model
+
+    def _touch(self, key: ModelKey) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.last_used = time.time()
+                entry.uses += 1
+            return entry
+
+    def _drop_locked(self, key: ModelKey) -> None:
+        self._entries.pop(key, None)
+        self._load_locks.pop(key, None)
+        self.evictions += 1
+        logger.info("Unloaded %s encoder %s (%s, %s)", *key)
+        gc.collect()
+        if key[2].startswith("cuda"):
+            try:
+                import torch
+
+                torch.cuda.empty_cache()
+            except Exception:
+                pass
+
+    def unload(
+        self,
+        name: str,
+        *,
+        kind: str = "bi",
+        device: Optional[str] = None,
+        backend: Optional[str] = None,
+    ) -> bool:
+        key = self._key(name, kind, device, backend)
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._drop_locked(key)
+            return True
+
+    def unload_idle(self) -> int:
+        if self.idle_seconds <= 0:
+            return 0
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.last_used < cutoff]
+            for key in stale:
+                self._drop_locked(key)
+        return len(stale)
+
+    def _ensure_reaper(self) -> None:
+        if self.idle_seconds <= 0 or (self._reaper is not None and self._reaper.is_alive()):
+            return
+
+        def _reap() -> None:
+            while True:
+                time.sleep(min(_REAP_INTERVAL, self.idle_seconds))
+                try:
+                    self.unload_idle()
+                except Exception as exc:  # pragma: no cover - defensive
+                    logger.debug("Encoder reaper failed: %s", exc)
+
+        self._reaper = threading.Thread(target=_reap, name="encoder-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            models: List[Dict[str, Any]] = [
+                {
+                    "kind": kind,
+                    "model": name,
+                    "device": device,
+                    "backend": backend,
+                    "bytes": entry.bytes,
+                    "megabytes": round(entry.bytes / 1_048_576, 1),
+                    "uses": entry.uses,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "load_seconds": entry.load_seconds,
+                }
+                for (kind, name, device, backend), entry in self._entries.items()
+            ]
+        return {
+            "max_models": self.max_models,
+            "idle_seconds": self.idle_seconds,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "resident_bytes": sum(item["bytes"] for item in models),
+            "models": models,
+        }
+
+
+_REGISTRY = EncoderRegistry()
+
+
+def get_registry() -> EncoderRegistry:
+    return _REGISTRY
+
+
+def get_encoder(name: str, device: Optional[str] = None, backend: Optional[str] = None) -> Any:
+    """Shared ``SentenceTransformer`` for ``name``."""
+    return _REGISTRY.get(name, kind="bi", device=device, backend=backend)
+
+
+def get_cross_encoder(name: str, device: Optional[str] = None, backend: Optional[str] = None) -> Any:
+    """Shared ``CrossEncoder`` for ``name``."""
+    return _REGISTRY.get(name, kind="cross", device=device, backend=backend)
+
+
+def registry_stats() -> Dict[str, Any]:
+    return _REGISTRY.stats()
+
+
+__all__ = ["BACKENDS", "EncoderRegistry", "check_backend", "default_backend", "get_registry", "get_encoder", "get_cross_encoder", "registry_stats"]
@@ -3,13 +3,17 @@ from __future__ import annotations
 
 import json
 import os
+import threading
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple, Any
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple, Any
 
 import pandas as pd
 
 from .embeddings import embed_texts, embeddings_available
-from .local_store import LocalVectorStore
+from .csv_stream import get_checkpoint, iter_csv_chunks
+from .dedup import get_dedup_index, is_tabular
+from .local_store import get_local_store
+from .row_text import render_row_texts
 
 # Try to import ChromaDB (optional)
 try:
@@ -19,7 +23,7 @@ except ImportError:
     CHROMADB_AVAILABLE = False
     ChromaVectorStore = None
 
-DEFAULT_MAX_ROWS = int(os.getenv("RAG_INGEST_MAX_ROWS", "500"))
+DEFAULT_MAX_ROWS = int(os.getenv("RAG_INGEST_MAX_ROWS", "0"))  # 0 = index the whole file
 
 
 def discover_csv_files(paths: Iterable[Path]) -> List[Path]:
@@ -34,15 +38,6 @@ def discover_csv_files(paths: Iterable[Path]) -> List[Path]:
     return out
 
 
-def row_to_text(row: pd.Series) -> str:
-    kv = []
-    for col, value in row.items():
-        if pd.isna(value):
-            continue
-        kv.append(f"{col}={value}")
-    return "; ".join(kv)
-
-
 def chunked(seq: Sequence, size: int):
     for start in range(0, len(seq), size):
         yield seq[start : start + size]
@@ -63,11 +58,42 @@ class LocalIngestor:
                 self._using_chromadb = True
             except Exception as exc:
                 print(f"Warning: ChromaDB initialization failed, using LocalVectorStore: {exc}")
-                self._store = LocalVectorStore(store_path)
+                self._store = get_local_store(store_path)
                 self._using_chromadb = False
         else:
-            self._store = LocalVectorStore(store_path)
+            self._store = get_local_store(store_path)
             self._using_chromadb = False
+        self.duplicates_skipped = 0
+        self._dedup = get_dedup_index(self._dedup_path())
+
+    def _dedup_path(self) -> Path:
+        store_dir = Path(self._store.store_dir)
+        if self._using_chromadb:
+            return store_dir / "dedup" / f"{self._store.collection_name}.npz"
+        return store_dir / "dedup.npz"
+
+    def _existing_ids(self, ids: List[str]) -> Set[str]:
+        if not self._using_chromadb:
+            return self._store.existing_ids(ids)
+        return set(self._store.collection.get(ids=ids, include=[])["ids"])
+
+    def _drop_duplicates(
+        self, texts: List[str], metadata: List[Dict[str, Any]]
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """Skip near-duplicates of already stored chunks before they are embedded."""
+        if self._dedup is None or not texts:
+            return texts, metadata
+        keep, duplicate_of = self._dedup.filter(
+            [(str(meta.get("id")), text, str(meta.get("source", ""))) for text, meta in zip(texts, metadata)],
+            session=set(),
+            exists=self._existing_ids,
+            tabular=[is_tabular(meta) for meta in metadata],
+        )
+        if not duplicate_of:
+            return texts, metadata
+        self.duplicates_skipped += len(duplicate_of)
+        kept = [index for index, flag in enumerate(keep) if flag]
+        return [texts[index] for index in kept], [metadata[index] for index in kept]
 
     def ingest_text_chunks(self, chunks: Sequence[Dict[str, Any]], *, dry_run: bool = False) -> int:
         if not chunks:
@@ -90,9 +116,14 @@ class LocalIngestor:
                 print(f"[dry-run] prepared text chunk {chunk_id} (len={len(text)})")
         if dry_run:
             return len(texts)
+        texts, metadata = self._drop_duplicates(texts, metadata)
+        if not texts:
+            return 0
         vectors = embed_texts(texts)
         self._store.add_vectors(vectors, metadata)
         self._store.save()
+        if self._dedup is not None:
+            self._dedup.save()
         return len(texts)
 
     def ingest_files(
@@ -104,40 +135,74 @@ class LocalIngestor:
     ) -> Tuple[int, int]:
         total_vectors = 0
         files_processed = 0
+        checkpoint = get_checkpoint()
+        store_key = f"ingestor:{getattr(self._store, 'store_dir', '')}"
         for path in paths:
+            start = 0 if dry_run else checkpoint.resume_offset(store_key, path)
+            rows_read = start
+            file_vectors = 0
             try:
-                df = pd.read_csv(path)
+                for offset, chunk in iter_csv_chunks(path, start_row=start, max_rows=max_rows):
+                    rows_read = offset + len(chunk)
+                    if dry_run:
+                        file_vectors += len(chunk)
+                        continue
+                    file_vectors += self._ingest_chunk(path, offset, chunk)
+                    checkpoint.commit(store_key, path, rows_read)
             except Exception as exc:
                 print(f"[skip] {path}: {exc}")
                 continue
-            if df.empty:
-                continue
-            if max_rows:
-                df = df.head(max_rows)
-            texts = [row_to_text(row) for _, row in df.iterrows()]
-            metadata = [
-                {"source": str(path), "row_index": idx, "title": path.stem, "text": text}
-                for idx, text in enumerate(texts)
-            ]
-            ids = [f"{path.stem}-{idx}" for idx in range(len(texts))]
             if dry_run:
-                print(f"[dry-run] {path} → {len(texts)} rows prepared")
+                print(f"[dry-run] {path} → {file_vectors} rows prepared")
                 files_processed += 1
                 continue
-            vectors = embed_texts(texts)
-            stored_meta = []
-            for vid, meta, snippet in zip(ids, metadata, texts):
-                meta = dict(meta)
-                meta.setdefault("id", vid)
-                meta.setdefault("snippet", snippet[:600])
-                stored_meta.append(meta)
-            self._store.add_vectors(vectors, stored_meta)
-            self._store.save()
-            total_vectors += len(vectors)
+            checkpoint.commit(store_key, path, rows_read, complete=True)
+            if not file_vectors and not start:
+                continue
+            total_vectors += file_vectors
             files_processed += 1
-            print(f"[ingested] {path} → {len(texts)} rows")
+            resumed = f" (resumed at row {start})" if start else ""
+            print(f"[ingested] {path} → {file_vectors} rows{resumed}")
         return files_processed, total_vectors
 
+    def _ingest_chunk(self, path: Path, offset: int, chunk: pd.DataFrame) -> int:
+        texts = render_row_texts(chunk)
+        stored_meta = []
+        for idx, text in zip(range(offset, offset + len(texts)), texts):
+            stored_meta.append(
+                {
+                    "source": str(path),
+                    "row_index": idx,
+                    "title": path.stem,
+                    "text": text,
+                    "id": f"{path.stem}-{idx}",
+                    "snippet": text[:600],
+                }
+            )
+        texts, stored_meta = self._drop_duplicates(texts, stored_meta)
+        if not texts:
+            return 0
+        vectors = embed_texts(texts)
+        self._store.add_vectors(vectors, stored_meta)
+        self._store.save()
+        if self._dedup is not None:
+            self._dedup.save()
+        return len(vectors)
+
+
+_INGESTORS: Dict[Tuple[Optional[Path], bool], LocalIngestor] = {}
+_INGESTORS_LOCK = threading.Lock()
+
+
+def get_ingestor(store_path: Path | None = None, use_chromadb: bool = True) -> LocalIngestor:
+    """Process-wide ingestor per store, so API routes, the watcher and agent runs share one writer."""
+    key = (Path(store_path).resolve() if store_path else None, use_chromadb)
+    with _INGESTORS_LOCK:
+        ingestor = _INGESTORS.get(key)
+        if ingestor is None:
+            ingestor = _INGESTORS[key] = LocalIngestor(store_path, use_chromadb=use_chromadb)
+        return ingestor
+
 
 def load_state(state_file: Path) -> Dict[str, float]:
     if not state_file.exists():
@@ -153,4 +218,4 @@ def save_state(state_file: Path, state: Dict[str, float]) -> None:
     state_file.parent.mkdir(parents=True, exist_ok=True)
     state_file.write_text(json.dumps(state, indent=2))
 
-__all__ = ["LocalIngestor", "discover_csv_files", "load_state", "save_state", "DEFAULT_MAX_ROWS"]
+__all__ = ["LocalIngestor", "discover_csv_files", "get_ingestor", "load_state", "save_state", "DEFAULT_MAX_ROWS"]
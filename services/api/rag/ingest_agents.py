@@ -4,11 +4,11 @@ from __future__ import annotations
 import logging
 import os
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List
 
 from ..utils.chatbot_events import log_chatbot_event
-from .chroma_store import get_collection
-from .embeddings import embed_texts
+from .bulk_writer import BulkWriteStats, Record, bulk_upsert
+from .chroma_store import dedup_index, delete_documents, get_collection, lexical_index
 from .utils import chunk_text
 
 logger = logging.getLogger(__name__)
@@ -29,16 +29,9 @@ def discover_agent_files() -> List[Path]:
     return sorted(files)
 
 
-def ingest_agent_pages() -> Dict[str, int]:
-    files = discover_agent_files()
-    if not files:
-        return {"files_processed": 0, "rows_indexed": 0}
-
-    log_chatbot_event("ingest.agent_pages.start", files=len(files))
-    collection = get_collection()
-    processed = 0
-    chunks_indexed = 0
-
+def _page_records(
+    files: List[Path], collection: Any, counts: Dict[str, int], replace_existing: bool = True
+) -> Iterator[Record]:
     for path in files:
         try:
             text = path.read_text(encoding="utf-8")
@@ -51,23 +44,66 @@ def ingest_agent_pages() -> Dict[str, int]:
         if not chunks:
             continue
 
-        embeddings = embed_texts(chunks)
-        ids = [f"{agent_id}_src_{idx}" for idx in range(len(chunks))]
-        metadatas = [
-            {
+        # Content-derived ids: drop the page's previous chunks before re-adding.
+        if replace_existing:
+            try:
+                delete_documents(collection, where={"source": str(path)})
+            except Exception:
+                pass
+        counts["files"] += 1
+        for idx, chunk in enumerate(chunks):
+            yield None, chunk, {
                 "source": str(path),
                 "kind": "agent_ui",
                 "agent": agent_id,
                 "chunk_index": idx,
             }
-            for idx in range(len(chunks))
-        ]
-        collection.upsert(ids=ids, embeddings=embeddings, documents=chunks, metadatas=metadatas)
-        processed += 1
-        chunks_indexed += len(chunks)
 
-    log_chatbot_event("ingest.agent_pages.finish", files=processed, chunks=chunks_indexed)
-    return {"files_processed": processed, "rows_indexed": chunks_indexed}
+
+def ingest_agent_page(path: Path, *, replace_existing: bool = True) -> BulkWriteStats:
+    """(Re)index one UI page; ``stats.ids`` lists the chunk ids written.
+
+    With ``replace_existing=False`` the page's previous chunks are left in place
+    and the caller removes the stale ones afterwards.
+    """
+    collection = get_collection()
+    records = _page_records([path], collection, {"files": 0}, replace_existing)
+    return bulk_upsert(
+        collection,
+        records,
+        track_ids=True,
+        dedup=dedup_index(collection),
+        lexical=lexical_index(collection),
+    )
+
+
+def ingest_agent_pages() -> Dict[str, int]:
+    files = discover_agent_files()
+    if not files:
+        return {"files_processed": 0, "rows_indexed": 0}
+
+    log_chatbot_event("ingest.agent_pages.start", files=len(files))
+    collection = get_collection()
+    counts = {"files": 0}
+    written = bulk_upsert(
+        collection,
+        _page_records(files, collection, counts),
+        dedup=dedup_index(collection),
+        lexical=lexical_index(collection),
+    )
+
+    log_chatbot_event(
+        "ingest.agent_pages.finish",
+        files=counts["files"],
+        chunks=written.rows,
+        rows_per_sec=written.rows_per_sec,
+    )
+    return {
+        "files_processed": counts["files"],
+        "rows_indexed": written.rows,
+        "duplicates_skipped": written.duplicates,
+        "rows_per_sec": written.rows_per_sec,
+    }
 
 
-__all__ = ["ingest_agent_pages", "discover_agent_files"]
+__all__ = ["ingest_agent_pages", "ingest_agent_page", "discover_agent_files"]
@@ -5,19 +5,28 @@ import io
 import logging
 import os
 from pathlib import Path
-from typing import Dict, Iterable, List, Sequence, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import pandas as pd
 
 from ..utils.chatbot_events import log_chatbot_event
-from .chroma_store import get_collection, reset_collection
-from .embeddings import embed_texts
+from .bulk_writer import BulkWriteStats, Record, bulk_upsert
+from .chroma_store import (
+    dedup_index,
+    delete_documents,
+    get_collection,
+    lexical_index,
+    live_writes,
+    reset_collection,
+)
+from .csv_stream import get_checkpoint, iter_csv_chunks
+from .row_text import render_row_texts
 from .utils import chunk_text
 
 logger = logging.getLogger(__name__)
 
 PROJECT_ROOT = Path(__file__).resolve().parents[3]
-MAX_ROWS = int(os.getenv("CHATBOT_RAG_MAX_ROWS", "750"))
+MAX_ROWS = int(os.getenv("CHATBOT_RAG_MAX_ROWS", "0"))  # 0 = index the whole file
 MAX_FILES_PER_SOURCE = int(os.getenv("CHATBOT_RAG_MAX_FILES_PER_SOURCE", "5"))
 
 DEFAULT_CSV_DIRS: Tuple[Path, ...] = (
@@ -36,19 +45,6 @@ def _agent_output_dirs() -> Iterable[Path]:
             yield csv_path
 
 
-def _hash_id(source: str, row_idx: int) -> str:
-    return f"{source}-{row_idx}"
-
-
-def _row_to_text(row: pd.Series) -> str:
-    parts = []
-    for col, value in row.items():
-        if pd.isna(value):
-            continue
-        parts.append(f"{col}={value}")
-    return "; ".join(parts)
-
-
 def _latest_csvs(root: Path, limit: int) -> List[Path]:
     if not root.exists():
         return []
@@ -99,65 +95,145 @@ def infer_agent_from_path(path: Path) -> str | None:
     return None
 
 
-def _ingest_dataframe(df: pd.DataFrame, *, source: str, agent_id: str | None = None) -> int:
-    if df.empty:
-        return 0
-    working = df.head(MAX_ROWS)
-    documents = []
-    metadatas = []
-    ids = []
-    for idx, (_, row) in enumerate(working.iterrows()):
-        text = _row_to_text(row)
-        if not text:
-            continue
-        doc_id = _hash_id(source, idx)
-        documents.append(text)
-        meta = {
-            "source": source,
-            "row_index": idx,
-            "snippet": text[:500],
-        }
-        if agent_id:
-            meta["agent"] = agent_id
-        metadatas.append(meta)
-        ids.append(doc_id)
-    if not documents:
-        return 0
-    embeddings = embed_texts(documents)
-    collection = get_collection()
+CHECKPOINT_STORE = "chatbot"
+
+
+def _delete_source(source: str) -> None:
     try:
-        collection.delete(where={"source": source})
+        delete_documents(get_collection(), where={"source": source})
     except Exception:
         pass
+
+
+def _bulk_upsert(records: Sequence[Record]) -> BulkWriteStats:
+    collection = get_collection()
+    return bulk_upsert(
+        collection,
+        records,
+        track_ids=True,
+        dedup=dedup_index(collection),
+        lexical=lexical_index(collection),
+    )
+
+
+def _upsert(records: Sequence[Record]) -> BulkWriteStats:
     try:
-        collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        return _bulk_upsert(records)
     except Exception as exc:
         # Local Chroma stores occasionally corrupt segments; reset and retry once.
         if "StopIteration" in str(exc):
             reset_collection()
-            collection = get_collection()
-            collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
-        else:
-            raise
-    return len(documents)
+            return _bulk_upsert(records)
+        raise
+
+
+def _replace_source(source: str, records: Sequence[Record]) -> BulkWriteStats:
+    """Drop existing rows of ``source`` and bulk-upsert ``records`` in their place."""
+    _delete_source(source)
+    return _upsert(records)
+
+
+def _chunk_records(chunk: pd.DataFrame, *, source: str, agent_id: str | None) -> List[Record]:
+    records: List[Record] = []
+    for idx, text in zip(chunk.index, render_row_texts(chunk)):
+        if not text:
+            continue
+        meta: Dict[str, Any] = {
+            "source": source,
+            "row_index": int(idx),
+            "snippet": text[:500],
+        }
+        if agent_id:
+            meta["agent"] = agent_id
+        records.append((None, text, meta))
+    return records
+
+
+def _ingest_chunks(
+    chunks: Iterator[Tuple[int, pd.DataFrame]],
+    *,
+    source: str,
+    agent_id: str | None = None,
+    resumed: bool = False,
+    on_chunk: Optional[Callable[[int, BulkWriteStats], None]] = None,
+) -> Tuple[BulkWriteStats, int]:
+    """Render, embed and upsert ``chunks`` one at a time; returns (write stats, rows read)."""
+    if not resumed:
+        _delete_source(source)
+    total = BulkWriteStats()
+    rows_read = 0
+    for offset, chunk in chunks:
+        records = _chunk_records(chunk, source=source, agent_id=agent_id)
+        chunk_stats = _upsert(records) if records else BulkWriteStats()
+        total.merge(chunk_stats)
+        rows_read = offset + len(chunk)
+        if on_chunk is not None:
+            on_chunk(rows_read, chunk_stats)
+    return total, rows_read
+
+
+def _ingest_csv_file(
+    csv_path: Path, *, agent_id: str | None = None, replace_existing: bool = True
+) -> BulkWriteStats:
+    """Stream one CSV into the collection, resuming from its checkpoint if interrupted earlier."""
+    checkpoint = get_checkpoint()
+    # Keyed by collection so a rebuild into a fresh (shadow) collection never resumes mid-file.
+    store = f"{CHECKPOINT_STORE}:{getattr(get_collection(), 'name', '')}"
+    start = checkpoint.resume_offset(store, csv_path)
+    written = BulkWriteStats()
+    if start:
+        logger.info("Resuming %s from row %d", csv_path, start)
+        # Rows stored before the interruption still belong to this file (refresh manifests).
+        written.ids, written.duplicate_of = checkpoint.resumed_ids(store, csv_path)
+    fresh, rows_read = _ingest_chunks(
+        iter_csv_chunks(csv_path, start_row=start, max_rows=MAX_ROWS),
+        source=str(csv_path),
+        agent_id=agent_id,
+        resumed=bool(start) or not replace_existing,
+        on_chunk=lambda rows, chunk: checkpoint.commit(
+            store, csv_path, rows, ids=chunk.ids, duplicate_of=chunk.duplicate_of
+        ),
+    )
+    checkpoint.commit(store, csv_path, max(rows_read, start), complete=True)
+    return written.merge(fresh)
+
+
+def ingest_csv_file(csv_path: Path, *, replace_existing: bool = True) -> BulkWriteStats:
+    """(Re)index one CSV file; ``stats.ids`` lists the chunk ids written.
+
+    With ``replace_existing=False`` the file's previous rows are left in place
+    and the caller removes the stale ones afterwards.
+    """
+    return _ingest_csv_file(
+        csv_path, agent_id=infer_agent_from_path(csv_path), replace_existing=replace_existing
+    )
 
 
 def _ingest_paths(files: Sequence[Path]) -> Dict[str, int]:
     processed = 0
     rows = 0
+    duplicates = 0
+    elapsed = 0.0
     log_chatbot_event("ingest.csv.start", files=len(files))
     for csv_path in files:
+        agent_name = infer_agent_from_path(csv_path)
         try:
-            df = pd.read_csv(csv_path)
+            with live_writes():
+                written = _ingest_csv_file(csv_path, agent_id=agent_name)
         except Exception as exc:
             logger.warning("Failed to ingest %s: %s", csv_path, exc)
             continue
-        agent_name = infer_agent_from_path(csv_path)
-        ingested = _ingest_dataframe(df, source=str(csv_path), agent_id=agent_name)
-        if ingested:
+        if written.rows:
             processed += 1
-            rows += ingested
-    stats = {"files_processed": processed, "rows_indexed": rows}
+            rows += written.rows
+            elapsed += written.elapsed_seconds
+        duplicates += written.duplicates
+    stats = {
+        "files_processed": processed,
+        "rows_indexed": rows,
+        "duplicates_skipped": duplicates,
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
     log_chatbot_event("ingest.csv.finish", **stats)
     return stats
 
@@ -179,46 +255,70 @@ def ingest_text_blob(
     chunk_size: int | None = None,
     chunk_overlap: int | None = None,
 ) -> Dict[str, int]:
+    with live_writes():
+        written = ingest_text_source(
+            text, source=source, agent_id=agent_id, chunk_size=chunk_size, chunk_overlap=chunk_overlap
+        )
+    if not written.rows:
+        return {"files_processed": 0, "rows_indexed": 0}
+    stats = {"files_processed": 1, "rows_indexed": written.rows, "rows_per_sec": written.rows_per_sec}
+    log_chatbot_event("ingest.upload.text", agent_id=agent_id, **stats)
+    return stats
+
+
+def ingest_text_source(
+    text: str,
+    *,
+    source: str,
+    agent_id: str | None = None,
+    chunk_size: int | None = None,
+    chunk_overlap: int | None = None,
+    replace_existing: bool = True,
+) -> BulkWriteStats:
+    """Replace the chunks of ``source`` with a fresh chunking of ``text``."""
     text = (text or "").strip()
     if not text:
-        return {"files_processed": 0, "rows_indexed": 0}
+        if replace_existing:
+            _delete_source(source)
+        return BulkWriteStats()
 
     chunks = chunk_text(
         text,
         chunk_size or int(os.getenv("CHATBOT_RAG_TEXT_CHUNK", "1200")),
         chunk_overlap or int(os.getenv("CHATBOT_RAG_TEXT_OVERLAP", "200")),
     )
-    embeddings = embed_texts(chunks)
-    collection = get_collection()
-    try:
-        collection.delete(where={"source": source})
-    except Exception:
-        pass
-    metadatas = [
-        {
-            "source": source,
-            "kind": "upload",
-            "agent": agent_id,
-            "chunk_index": idx,
-            "snippet": chunk[:500],
-        }
+    records: List[Record] = [
+        (
+            None,
+            chunk,
+            {
+                "source": source,
+                "kind": "upload",
+                "agent": agent_id,
+                "chunk_index": idx,
+                "snippet": chunk[:500],
+            },
+        )
         for idx, chunk in enumerate(chunks)
     ]
-    ids = [f"{source}-{idx}" for idx in range(len(chunks))]
-    collection.upsert(ids=ids, embeddings=embeddings, documents=chunks, metadatas=metadatas)
-    stats = {"files_processed": 1, "rows_indexed": len(chunks)}
-    log_chatbot_event("ingest.upload.text", agent_id=agent_id, **stats)
-    return stats
+    return _replace_source(source, records) if replace_existing else _upsert(records)
 
 
 def ingest_uploaded_csv_bytes(payload: bytes, filename: str, agent_id: str | None = None) -> Dict[str, int]:
     try:
-        df = pd.read_csv(io.BytesIO(payload))
-    except Exception as exc:
+        with live_writes():
+            written, _ = _ingest_chunks(
+                iter_csv_chunks(io.BytesIO(payload), max_rows=MAX_ROWS),
+                source=f"upload:{filename}",
+                agent_id=agent_id,
+            )
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as exc:
         raise ValueError(f"Could not parse CSV '{filename}': {exc}") from exc
-    rows = _ingest_dataframe(df, source=f"upload:{filename}", agent_id=agent_id)
-    stats = {"files_processed": int(rows > 0), "rows_indexed": rows}
-    log_chatbot_event("ingest.upload.csv", agent_id=agent_id, filename=filename, rows=rows)
+    rows = written.rows
+    stats = {"files_processed": int(rows > 0), "rows_indexed": rows, "rows_per_sec": written.rows_per_sec}
+    log_chatbot_event(
+        "ingest.upload.csv", agent_id=agent_id, filename=filename, rows=rows, rows_per_sec=written.rows_per_sec
+    )
     return stats
 
 
@@ -228,5 +328,7 @@ __all__ = [
     "ingest_text_blob",
     "discover_csv_files",
     "ingest_paths",
+    "ingest_csv_file",
+    "ingest_text_source",
     "infer_agent_from_path",
 ]
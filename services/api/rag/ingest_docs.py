@@ -1,13 +1,12 @@
 """Ingest documentation (*.md, *.txt) for the chatbot RAG store."""
 from __future__ import annotations
 
-import hashlib
 import logging
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Any, Dict, Iterable, Iterator, List
 
-from .chroma_store import get_collection
-from .embeddings import embed_texts
+from .bulk_writer import BulkWriteStats, Record, bulk_upsert
+from .chroma_store import dedup_index, delete_documents, get_collection, lexical_index
 from .ingest_csv import infer_agent_from_path
 from .utils import chunk_text
 from ..utils.chatbot_events import log_chatbot_event
@@ -24,11 +23,6 @@ CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 150
 
 
-def _hash_path(path: Path) -> str:
-    digest = hashlib.md5(str(path).encode("utf-8"), usedforsecurity=False).hexdigest()
-    return digest[:10]
-
-
 def discover_docs(extra_roots: Iterable[Path] | None = None) -> List[Path]:
     paths: List[Path] = []
     for root in list(DOC_ROOTS) + list(extra_roots or []):
@@ -40,15 +34,9 @@ def discover_docs(extra_roots: Iterable[Path] | None = None) -> List[Path]:
     return sorted(paths)
 
 
-def ingest_docs() -> Dict[str, int]:
-    files = discover_docs()
-    if not files:
-        return {"files_processed": 0, "rows_indexed": 0}
-
-    collection = get_collection()
-    processed = 0
-    chunks_total = 0
-
+def _doc_records(
+    files: List[Path], collection: Any, counts: Dict[str, int], replace_existing: bool = True
+) -> Iterator[Record]:
     for doc_path in files:
         try:
             text = doc_path.read_text(encoding="utf-8")
@@ -60,26 +48,64 @@ def ingest_docs() -> Dict[str, int]:
         if not chunks:
             continue
 
+        # Content-derived ids: drop the file's previous chunks before re-adding.
+        if replace_existing:
+            try:
+                delete_documents(collection, where={"source": str(doc_path)})
+            except Exception:
+                pass
         agent = infer_agent_from_path(doc_path) or "global"
-        embeddings = embed_texts(chunks)
-        doc_key = f"doc_{_hash_path(doc_path)}"
-        metadatas = [
-            {
+        counts["files"] += 1
+        for idx, chunk in enumerate(chunks):
+            yield None, chunk, {
                 "source": str(doc_path),
                 "kind": "doc",
                 "agent": agent,
                 "chunk_index": idx,
                 "snippet": chunk[:400],
             }
-            for idx, chunk in enumerate(chunks)
-        ]
-        ids = [f"{doc_key}_{idx}" for idx in range(len(chunks))]
-        collection.upsert(ids=ids, embeddings=embeddings, documents=chunks, metadatas=metadatas)
-        processed += 1
-        chunks_total += len(chunks)
 
-    log_chatbot_event("ingest.docs", files=processed, chunks=chunks_total)
-    return {"files_processed": processed, "rows_indexed": chunks_total}
 
+def ingest_doc_file(doc_path: Path, *, replace_existing: bool = True) -> BulkWriteStats:
+    """(Re)index one doc; ``stats.ids`` lists the chunk ids written.
 
-__all__ = ["ingest_docs", "discover_docs"]
+    With ``replace_existing=False`` the doc's previous chunks are left in place
+    and the caller removes the stale ones afterwards.
+    """
+    collection = get_collection()
+    records = _doc_records([doc_path], collection, {"files": 0}, replace_existing)
+    return bulk_upsert(
+        collection,
+        records,
+        track_ids=True,
+        dedup=dedup_index(collection),
+        lexical=lexical_index(collection),
+    )
+
+
+def ingest_docs() -> Dict[str, int]:
+    files = discover_docs()
+    if not files:
+        return {"files_processed": 0, "rows_indexed": 0}
+
+    collection = get_collection()
+    counts = {"files": 0}
+    written = bulk_upsert(
+        collection,
+        _doc_records(files, collection, counts),
+        dedup=dedup_index(collection),
+        lexical=lexical_index(collection),
+    )
+
+    log_chatbot_event(
+        "ingest.docs", files=counts["files"], chunks=written.rows, rows_per_sec=written.rows_per_sec
+    )
+    return {
+        "files_processed": counts["files"],
+        "rows_indexed": written.rows,
+        "duplicates_skipped": written.duplicates,
+        "rows_per_sec": written.rows_per_sec,
+    }
+
+
+__all__ = ["ingest_docs", "ingest_doc_file", "discover_docs"]
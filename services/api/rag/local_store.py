@@ -1,37 +1,812 @@
-"""Simple local vector store using numpy for similarity search."""
+"""Simple local vector store using numpy for similarity search.
+
+Rows live in immutable, append-only segments (LSM style)::
+
+    .rag_store/
+        manifest.json              # segment list + counters, rewritten atomically
+        segments/seg-000001.npy    # unit-normalized float32 rows
+        segments/seg-000001.jsonl  # one metadata dict per row
+        segments/seg-000001.del.npy  # tombstoned row ids (optional)
+        bm25.sqlite                # lexical (BM25) mirror of the live rows
+
+``add_vectors`` buffers a new in-memory segment, ``save`` writes only the
+segments and tombstones that changed, and ``compact`` merges segments and
+drops tombstoned rows in a background thread.
+
+Several processes (uvicorn workers, the watcher, ingest scripts) may write the
+same directory. Segment allocation, manifest writes, deletes and compaction
+run under an exclusive ``flock`` on ``.lock`` and first re-read the manifest,
+so every writer appends to the latest segment list instead of overwriting it;
+loads take the lock shared. Within a process, ``get_local_store`` hands out
+one instance per directory.
+
+With ``LOCAL_RAG_IVF`` enabled the store also keeps an IVF index: k-means
+centroids in ``ivf_centroids.npy`` and a per-segment ``seg-*.ivf.npy`` list
+assignment, so a query only scores rows in the ``nprobe`` closest lists.
+
+With ``LOCAL_RAG_QUANTIZE=int8`` each segment also stores per-dimension int8
+codes (``seg-*.q8.npy`` + ``seg-*.q8p.npy``). Queries score the codes with
+asymmetric distance (float query vs int8 rows) and re-score a shortlist
+against the float rows, which then stay on disk behind a read-only mmap.
+"""
 from __future__ import annotations
 
 import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts fall back to in-process locking
+    fcntl = None
 
 import numpy as np
 
+from .bm25 import LexicalDoc, get_bm25_index
+from .utils import content_id
+
+logger = logging.getLogger(__name__)
+
+# Store rows unit-normalized and open them read-only with mmap so several
+# uvicorn workers share one copy of the matrix through the OS page cache.
+USE_MMAP = os.getenv("LOCAL_RAG_MMAP", "false").lower() in {"true", "1", "yes"}
+STORE_FORMAT = 2
+# Metadata keys (besides namespace) that get a value -> row-id inverted index.
+INDEX_KEYS = tuple(
+    key.strip() for key in os.getenv("LOCAL_RAG_INDEX_KEYS", "agent,source").split(",") if key.strip()
+)
+AUTO_COMPACT = os.getenv("LOCAL_RAG_AUTO_COMPACT", "true").lower() in {"true", "1", "yes"}
+# Size-tiered compaction: a run of at least COMPACT_MIN_MERGE neighbouring segments
+# is merged once each older one holds at most COMPACT_SIZE_RATIO times the rows of
+# the newer ones already in the run. COMPACT_MAX_SEGMENTS caps the count regardless.
+COMPACT_MAX_SEGMENTS = int(os.getenv("LOCAL_RAG_COMPACT_SEGMENTS", "8"))
+COMPACT_MIN_MERGE = max(2, int(os.getenv("LOCAL_RAG_COMPACT_MIN_MERGE", "4")))
+COMPACT_SIZE_RATIO = float(os.getenv("LOCAL_RAG_COMPACT_SIZE_RATIO", "2.0"))
+COMPACT_DEAD_RATIO = float(os.getenv("LOCAL_RAG_COMPACT_DEAD_RATIO", "0.3"))
+# Approximate search: IVF kicks in once the store has IVF_MIN_ROWS live rows.
+USE_IVF = os.getenv("LOCAL_RAG_IVF", "false").lower() in {"true", "1", "yes"}
+IVF_NLIST = int(os.getenv("LOCAL_RAG_IVF_NLIST", "0"))  # 0 = ~4*sqrt(rows)
+IVF_NPROBE = int(os.getenv("LOCAL_RAG_IVF_NPROBE", "8"))
+IVF_MIN_ROWS = int(os.getenv("LOCAL_RAG_IVF_MIN_ROWS", "20000"))
+IVF_MAX_IMBALANCE = float(os.getenv("LOCAL_RAG_IVF_MAX_IMBALANCE", "6.0"))
+IVF_TRAIN_SAMPLE = int(os.getenv("LOCAL_RAG_IVF_TRAIN_SAMPLE", "100000"))
+_ASSIGN_BLOCK = 8192
+# Quantized storage: "int8" keeps 1 byte/dim resident instead of 4.
+QUANTIZE = os.getenv("LOCAL_RAG_QUANTIZE", "none").lower()
+RESCORE_FACTOR = int(os.getenv("LOCAL_RAG_RESCORE_FACTOR", "4"))  # 0 = no float re-scoring
+_SCORE_BLOCK = 16384
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+DEFAULT_STORE_DIR = Path(__file__).resolve().parents[1] / ".rag_store"
+
+
+def _normalize_rows(arr: np.ndarray) -> np.ndarray:
+    """Return float32 rows scaled to unit length (zero rows stay zero)."""
+    arr = np.asarray(arr, dtype=np.float32)
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (arr / norms).astype(np.float32, copy=False)
+
+
+def _atomic_save_npy(path: Path, arr: np.ndarray) -> None:
+    # Write to a sibling file and rename so readers holding an mmap of the old
+    # file keep a valid view until they reload.
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        np.save(handle, arr)
+    os.replace(tmp_path, path)
+
+
+def _atomic_write_text(path: Path, text: str) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def _assign_lists(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest-centroid list id per row, computed in blocks to bound memory."""
+    out = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], _ASSIGN_BLOCK):
+        block = np.asarray(matrix[start : start + _ASSIGN_BLOCK])
+        out[start : start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _train_kmeans(sample: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit rows; returns unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = _assign_lists(sample, centroids)
+        counts = np.bincount(assign, minlength=nlist)
+        order = np.argsort(assign, kind="stable")
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            # Re-seed dead lists from random rows so every list stays usable.
+            sums[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids
+
+
+def _quantize_int8(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Per-dimension min/max scalar quantization to int8.
+
+    Returns ``(codes, params)`` where ``params[0]`` is the per-dim minimum and
+    ``params[1]`` the step, so ``x ~= params[0] + params[1] * (code + 128)``.
+    """
+    lo = np.empty(matrix.shape[1], dtype=np.float32)
+    hi = np.empty(matrix.shape[1], dtype=np.float32)
+    lo.fill(np.inf)
+    hi.fill(-np.inf)
+    for start in range(0, matrix.shape[0], _SCORE_BLOCK):
+        block = np.asarray(matrix[start : start + _SCORE_BLOCK])
+        lo = np.minimum(lo, block.min(axis=0))
+        hi = np.maximum(hi, block.max(axis=0))
+    step = np.maximum(hi - lo, 1e-12) / 255.0
+    codes = np.empty(matrix.shape, dtype=np.int8)
+    for start in range(0, matrix.shape[0], _SCORE_BLOCK):
+        block = np.asarray(matrix[start : start + _SCORE_BLOCK])
+        scaled = np.rint((block - lo) / step) - 128.0
+        codes[start : start + block.shape[0]] = np.clip(scaled, -128, 127).astype(np.int8)
+    return codes, np.stack([lo, step]).astype(np.float32)
+
+
+def _adc_scores(codes: np.ndarray, params: np.ndarray, vec: np.ndarray) -> np.ndarray:
+    """Asymmetric dot products of a float query against int8 codes."""
+    weights = vec * params[1]
+    bias = float(vec @ params[0] + 128.0 * weights.sum())
+    out = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], _SCORE_BLOCK):
+        block = codes[start : start + _SCORE_BLOCK]
+        out[start : start + block.shape[0]] = block.astype(np.float32) @ weights
+    return out + bias
+
+
+@dataclass
+class _IVFIndex:
+    """Coarse quantizer shared by all segments."""
+
+    centroids: np.ndarray
+    version: int
+    trained_rows: int
+
+    @property
+    def nlist(self) -> int:
+        return int(self.centroids.shape[0])
+
+
+@dataclass
+class _Segment:
+    """One immutable block of rows plus its tombstones and postings."""
+
+    name: Optional[str]  # None until the segment has been written to disk
+    matrix: np.ndarray
+    metadata: List[Dict[str, Any]]
+    alive: np.ndarray
+    index: Dict[str, Dict[Any, np.ndarray]] = field(default_factory=dict)
+    tombstones_dirty: bool = False
+    # IVF inverted lists in CSR form: rows of list l are order[offsets[l]:offsets[l+1]].
+    assign: Optional[np.ndarray] = None
+    ivf_version: int = 0
+    ivf_order: Optional[np.ndarray] = None
+    ivf_offsets: Optional[np.ndarray] = None
+    codes: Optional[np.ndarray] = None
+    q_params: Optional[np.ndarray] = None
+    id_rows: Optional[Dict[str, int]] = None  # metadata id -> row, built on first lookup
+
+    def row_of(self, doc_id: str) -> Optional[int]:
+        if self.id_rows is None:
+            self.id_rows = {str(meta["id"]): row for row, meta in enumerate(self.metadata) if meta.get("id")}
+        return self.id_rows.get(doc_id)
+
+    def set_assignment(self, assign: np.ndarray, version: int, nlist: int) -> None:
+        self.assign = assign
+        self.ivf_version = version
+        self.ivf_order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.ivf_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+
+    def probe_rows(self, lists: np.ndarray) -> np.ndarray:
+        offsets = self.ivf_offsets
+        parts = [self.ivf_order[offsets[probe_list] : offsets[probe_list + 1]] for probe_list in lists]
+        return np.sort(np.concatenate(parts)) if parts else _EMPTY_ROWS
+
+    @property
+    def rows(self) -> int:
+        return len(self.metadata)
+
+    @property
+    def live_rows(self) -> int:
+        return int(self.alive.sum())
+
 
 class LocalVectorStore:
-    def __init__(self, store_dir: Path | None = None):
+    def __init__(
+        self,
+        store_dir: Path | None = None,
+        mmap: bool | None = None,
+        index_keys: Iterable[str] | None = None,
+        auto_compact: bool | None = None,
+        use_ivf: bool | None = None,
+        nprobe: int | None = None,
+        quantize: str | None = None,
+        rescore_factor: int | None = None,
+    ):
         if store_dir is None:
-            store_dir = Path(__file__).resolve().parents[1] / ".rag_store"
+            store_dir = DEFAULT_STORE_DIR
         self.store_dir = Path(store_dir)
         self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.segments_dir = self.store_dir / "segments"
+        self.manifest_path = self.store_dir / "manifest.json"
+        self.lock_path = self.store_dir / ".lock"
+        # Single-file layout written by older versions; migrated on first load.
         self.embeddings_path = self.store_dir / "embeddings.npy"
         self.metadata_path = self.store_dir / "metadata.json"
-        self._embeddings: np.ndarray | None = None
-        self._metadata: List[Dict[str, Any]] = []
+        self.mmap = USE_MMAP if mmap is None else bool(mmap)
+        self.auto_compact = AUTO_COMPACT if auto_compact is None else bool(auto_compact)
+        self.use_ivf = USE_IVF if use_ivf is None else bool(use_ivf)
+        self.nprobe = IVF_NPROBE if nprobe is None else int(nprobe)
+        self.centroids_path = self.store_dir / "ivf_centroids.npy"
+        self.quantize = (QUANTIZE if quantize is None else quantize).lower()
+        if self.quantize not in {"none", "int8"}:
+            raise ValueError(f"Unsupported quantization '{self.quantize}' (expected 'none' or 'int8')")
+        self.rescore_factor = RESCORE_FACTOR if rescore_factor is None else int(rescore_factor)
+        keys = INDEX_KEYS if index_keys is None else tuple(index_keys)
+        self.index_keys = ("namespace",) + tuple(key for key in keys if key != "namespace")
+        self._segments: List[_Segment] = []
+        self._next_segment = 1
+        self._generation = 0  # bumped by every manifest write, see version()
+        self._dim: Optional[int] = None
+        self._ivf: Optional[_IVFIndex] = None
+        self._loaded_mtime: float = 0.0
+        self._lock = threading.RLock()
+        self._flock_depth = 0
+        self._compact_lock = threading.Lock()
+        self._compact_thread: Optional[threading.Thread] = None
+        self.lexical = get_bm25_index(self.store_dir / "bm25.sqlite")
         self._load()
 
-    def _load(self) -> None:
-        if self.embeddings_path.exists() and self.metadata_path.exists():
-            self._embeddings = np.load(self.embeddings_path)
-            with self.metadata_path.open("r", encoding="utf-8") as f:
-                self._metadata = json.load(f)
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    @contextmanager
+    def _locked(self, exclusive: bool = True) -> Iterator[None]:
+        """Thread lock plus an inter-process ``flock`` on the store directory (re-entrant)."""
+        with self._lock:
+            if fcntl is None or self._flock_depth:
+                self._flock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._flock_depth -= 1
+                return
+            with self.lock_path.open("a+") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                self._flock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._flock_depth -= 1
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _segment_paths(self, name: str) -> Dict[str, Path]:
+        return {
+            "vectors": self.segments_dir / f"{name}.npy",
+            "metadata": self.segments_dir / f"{name}.jsonl",
+            "tombstones": self.segments_dir / f"{name}.del.npy",
+            "ivf": self.segments_dir / f"{name}.ivf.npy",
+            "codes": self.segments_dir / f"{name}.q8.npy",
+            "q_params": self.segments_dir / f"{name}.q8p.npy",
+        }
+
+    @property
+    def _float_mmap_mode(self) -> Optional[str]:
+        # Quantized stores only touch float rows for re-scoring, so keep them on disk.
+        return "r" if self.mmap or self.quantize != "none" else None
+
+    def _open_segment(self, entry: Dict[str, Any], cached: Optional[_Segment] = None) -> _Segment:
+        name = entry["name"]
+        paths = self._segment_paths(name)
+        if cached is not None:
+            # Rows and metadata are immutable; only tombstones can change.
+            matrix, metadata, index = cached.matrix, cached.metadata, cached.index
         else:
-            self._embeddings = None
-            self._metadata = []
+            matrix = np.load(paths["vectors"], mmap_mode=self._float_mmap_mode)
+            with paths["metadata"].open("r", encoding="utf-8") as handle:
+                metadata = [json.loads(line) for line in handle if line.strip()]
+            index = self._build_index(metadata)
+        alive = np.ones(len(metadata), dtype=bool)
+        if paths["tombstones"].exists():
+            alive[np.load(paths["tombstones"])] = False
+        segment = _Segment(name=name, matrix=matrix, metadata=metadata, alive=alive, index=index)
+        if cached is not None:
+            segment.id_rows = cached.id_rows
+        if self.quantize == "int8":
+            if cached is not None and cached.codes is not None:
+                segment.codes, segment.q_params = cached.codes, cached.q_params
+            elif paths["codes"].exists() and paths["q_params"].exists():
+                segment.codes = np.load(paths["codes"], mmap_mode="r" if self.mmap else None)
+                segment.q_params = np.load(paths["q_params"])
+            else:
+                self._ensure_codes(segment)
+        if self._ivf is not None:
+            version = int(entry.get("ivf_version", 0))
+            if cached is not None and cached.ivf_version == self._ivf.version:
+                segment.set_assignment(cached.assign, cached.ivf_version, self._ivf.nlist)
+            elif version == self._ivf.version and paths["ivf"].exists():
+                segment.set_assignment(np.load(paths["ivf"]), version, self._ivf.nlist)
+            else:
+                self._ensure_assignment(segment)
+        return segment
+
+    def _write_segment(self, segment: _Segment, name: str) -> None:
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        paths = self._segment_paths(name)
+        _atomic_save_npy(paths["vectors"], np.ascontiguousarray(segment.matrix, dtype=np.float32))
+        lines = "\n".join(json.dumps(meta, ensure_ascii=False, separators=(",", ":")) for meta in segment.metadata)
+        _atomic_write_text(paths["metadata"], lines + "\n")
+        segment.name = name
+        segment.tombstones_dirty = not segment.alive.all()
+        if segment.assign is not None:
+            _atomic_save_npy(paths["ivf"], segment.assign)
+        if segment.codes is not None:
+            _atomic_save_npy(paths["codes"], segment.codes)
+            _atomic_save_npy(paths["q_params"], segment.q_params)
+        if self._float_mmap_mode:
+            # Swap the private in-memory copy for a shared read-only mapping.
+            segment.matrix = np.load(paths["vectors"], mmap_mode="r")
+
+    def _write_tombstones(self, segment: _Segment) -> None:
+        path = self._segment_paths(segment.name)["tombstones"]
+        dead = np.flatnonzero(~segment.alive).astype(np.int64)
+        if dead.size:
+            _atomic_save_npy(path, dead)
+        elif path.exists():
+            path.unlink()
+        segment.tombstones_dirty = False
+
+    def _write_manifest(self, carry_lexical: bool = True, bump: bool = True) -> None:
+        # Callers hold the store lock and have just re-read the manifest, so
+        # the generation only ever grows across processes. ``bump=False`` is
+        # for writes that change no rows (reserving a segment name).
+        previous = self._generation
+        if bump:
+            self._generation += 1
+        manifest = {
+            "format": STORE_FORMAT,
+            "normalized": True,
+            "dtype": "float32",
+            "dim": self._dim,
+            "generation": self._generation,
+            "next_segment": self._next_segment,
+            "segments": [
+                {"name": seg.name, "rows": seg.rows, "live_rows": seg.live_rows, "ivf_version": seg.ivf_version}
+                for seg in self._segments
+                if seg.name
+            ],
+        }
+        if self._ivf is not None:
+            manifest["ivf"] = {
+                "version": self._ivf.version,
+                "nlist": self._ivf.nlist,
+                "trained_rows": self._ivf.trained_rows,
+            }
+        _atomic_write_text(self.manifest_path, json.dumps(manifest, indent=2))
+        self._loaded_mtime = self.manifest_path.stat().st_mtime
+        # A write that changes no lexical rows (deletes are mirrored first,
+        # compaction and IVF training only move rows) keeps a mirror that was
+        # in step with the previous generation in step with this one.
+        if bump and carry_lexical and self.lexical is not None and self.lexical.synced_version() == str(previous):
+            self.lexical.mark_synced(self._generation)
+
+    def _new_segment_name(self) -> str:
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return name
+
+    def _load(self) -> None:
+        if not self.manifest_path.exists() and self.embeddings_path.exists() and self.metadata_path.exists():
+            with self._locked():
+                if not self.manifest_path.exists():
+                    self._segments = []
+                    self._migrate_legacy()
+                    return
+        with self._locked(exclusive=False):
+            self._load_locked()
+
+    def _load_locked(self) -> None:
+        """Re-read the manifest; unsaved in-memory segments are kept after the persisted ones."""
+        unsaved = [seg for seg in self._segments if seg.name is None]
+        if not self.manifest_path.exists():
+            self._segments = unsaved
+            return
+        manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        ivf_info = manifest.get("ivf")
+        if not ivf_info or not self.centroids_path.exists():
+            self._ivf = None
+        elif self._ivf is None or self._ivf.version != ivf_info["version"]:
+            self._ivf = _IVFIndex(
+                centroids=np.load(self.centroids_path),
+                version=int(ivf_info["version"]),
+                trained_rows=int(ivf_info.get("trained_rows", 0)),
+            )
+        cached = {seg.name: seg for seg in self._segments if seg.name}
+        persisted = [
+            self._open_segment(entry, cached.get(entry["name"]))
+            for entry in manifest.get("segments", [])
+        ]
+        self._segments = persisted + unsaved
+        self._next_segment = max(
+            self._next_segment, int(manifest.get("next_segment", len(persisted) + 1))
+        )
+        self._dim = manifest.get("dim") or self._dim
+        self._generation = int(manifest.get("generation", 0))
+        self._loaded_mtime = self.manifest_path.stat().st_mtime
+
+    def _migrate_legacy(self) -> None:
+        """Convert the old embeddings.npy + metadata.json pair into segment 1."""
+        matrix = _normalize_rows(np.load(self.embeddings_path))
+        with self.metadata_path.open("r", encoding="utf-8") as handle:
+            metadata = json.load(handle)
+        if matrix.ndim != 2 or matrix.shape[0] != len(metadata):
+            logger.warning("Ignoring inconsistent legacy store in %s", self.store_dir)
+            return
+        self._dim = int(matrix.shape[1])
+        self._segments = [self._memory_segment(matrix, metadata)]
+        self.save()
+        logger.info("Migrated legacy local store %s into segment format", self.store_dir)
 
+    def refresh(self) -> bool:
+        """Pick up segments saved by another process (reusing ones already open)."""
+        if not self.manifest_path.exists():
+            return False
+        try:
+            mtime = self.manifest_path.stat().st_mtime
+        except OSError:
+            return False
+        if mtime == self._loaded_mtime:
+            return False
+        self._load()
+        return True
+
+    def save(self) -> None:
+        with self._locked():
+            # Append to whatever other writers saved since our last load.
+            self._load_locked()
+            written: List[_Segment] = []
+            for segment in self._segments:
+                if segment.name is None:
+                    self._ensure_assignment(segment)
+                    self._write_segment(segment, self._new_segment_name())
+                    written.append(segment)
+                if segment.tombstones_dirty:
+                    self._write_tombstones(segment)
+            if self._segments or self.manifest_path.exists():
+                synced = self.lexical is not None and self.lexical.synced_version() == str(self._generation)
+                self._write_manifest(carry_lexical=not written)
+                if written and self.lexical is not None:
+                    # Mirror new rows only once their segment and the manifest are durable;
+                    # a crash before the sync mark leaves BM25 to be rebuilt from the store.
+                    self.lexical.add(
+                        self._lexical_docs(
+                            seg.metadata[row] for seg in written for row in np.flatnonzero(seg.alive)
+                        )
+                    )
+                    if synced:
+                        self.lexical.mark_synced(self._generation)
+        if (self.auto_compact and self._needs_compaction()) or self._needs_ivf_training():
+            self.compact_async()
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+    def _needs_compaction(self) -> bool:
+        return bool(self._compaction_run([seg for seg in self._segments if seg.name]))
+
+    @staticmethod
+    def _compaction_run(persisted: List[_Segment]) -> List[_Segment]:
+        """Neighbouring saved segments worth merging next (empty when none are).
+
+        Runs grow from the newest segment backwards, so small recent segments
+        merge with each other while large old ones are only rewritten once
+        comparable data has accumulated next to them. Without a full run, a
+        segment with too many tombstones is rewritten on its own.
+        """
+        sizes = [max(seg.live_rows, 1) for seg in persisted]
+        for end in range(len(persisted), 0, -1):
+            start, total = end - 1, sizes[end - 1]
+            while start > 0 and sizes[start - 1] <= COMPACT_SIZE_RATIO * total:
+                start -= 1
+                total += sizes[start]
+            if end - start >= COMPACT_MIN_MERGE:
+                return persisted[start:end]
+        dirty = [seg for seg in persisted if seg.rows and 1 - seg.live_rows / seg.rows >= COMPACT_DEAD_RATIO]
+        if dirty:
+            return [max(dirty, key=lambda seg: seg.rows - seg.live_rows)]
+        if len(persisted) > COMPACT_MAX_SEGMENTS:
+            # No tier has filled up: merge the smallest window of neighbours to cap the count.
+            width = min(COMPACT_MIN_MERGE, len(persisted))
+            start = min(range(len(persisted) - width + 1), key=lambda idx: sum(sizes[idx : idx + width]))
+            return persisted[start : start + width]
+        return []
+
+    def compact_async(self) -> Optional[threading.Thread]:
+        """Run compaction and IVF (re)training on a daemon thread unless one is already running."""
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return self._compact_thread
+        thread = threading.Thread(target=self._compact_safely, name="local-store-compact", daemon=True)
+        self._compact_thread = thread
+        thread.start()
+        return thread
+
+    def _compact_safely(self) -> None:
+        try:
+            if self._needs_compaction():
+                self.compact()
+            if self._needs_ivf_training():
+                self.train_ivf()
+        except Exception as exc:
+            logger.warning("Local store compaction failed: %s", exc)
+
+    def compact(self, full: bool = False) -> bool:
+        """Merge the next run of similar-sized segments (every segment with ``full``) and drop tombstoned rows.
+
+        Merging reads immutable files outside the store lock, so queries and
+        ingest keep running; only the final segment-list swap is locked. The
+        merged segment's name is reserved in the manifest up front, and the
+        swap is abandoned if another process compacted the same segments.
+        """
+        if not self._compact_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._locked():
+                self._load_locked()
+                persisted = [seg for seg in self._segments if seg.name]
+                snapshot = persisted if full else self._compaction_run(persisted)
+                alive_snapshot = [seg.alive.copy() for seg in snapshot]
+                if not snapshot or (len(snapshot) == 1 and alive_snapshot[0].all()):
+                    return False
+                name = self._new_segment_name()
+                # Persist next_segment so no other writer takes the name; no rows change yet.
+                self._write_manifest(bump=False)
+
+            parts = [np.asarray(seg.matrix[mask]) for seg, mask in zip(snapshot, alive_snapshot)]
+            metadata = [
+                meta for seg, mask in zip(snapshot, alive_snapshot) for meta, keep in zip(seg.metadata, mask) if keep
+            ]
+            merged_names = {seg.name for seg in snapshot}
+            if metadata:
+                merged = self._memory_segment(np.concatenate(parts), metadata)
+                self._ensure_codes(merged)
+                self._ensure_assignment(merged)
+                self._write_segment(merged, name)
+            else:
+                merged = None
+
+            with self._locked():
+                self._load_locked()
+                current = {seg.name: seg for seg in self._segments if seg.name in merged_names}
+                if len(current) != len(merged_names):
+                    logger.info("Skipping compaction of %s: segments changed by another writer", self.store_dir)
+                    for path in self._segment_paths(name).values():
+                        path.unlink(missing_ok=True)
+                    return False
+                if merged is not None:
+                    # Carry over deletes (from any process) that landed while the merge was running.
+                    merged.alive = np.concatenate(
+                        [current[seg.name].alive[mask] for seg, mask in zip(snapshot, alive_snapshot)]
+                    )
+                    if not merged.alive.all():
+                        self._write_tombstones(merged)
+                # The merged run is contiguous; its output takes the run's place in the order.
+                position = next(idx for idx, seg in enumerate(self._segments) if seg.name in merged_names)
+                remaining = [seg for seg in self._segments if seg.name not in merged_names]
+                merged_list = [merged] if merged is not None else []
+                self._segments = remaining[:position] + merged_list + remaining[position:]
+                self._write_manifest()
+                # Readers open segments under the shared lock, so nobody can be
+                # between reading the old manifest and opening these files.
+                for old_name in merged_names:
+                    for path in self._segment_paths(old_name).values():
+                        path.unlink(missing_ok=True)
+            logger.info(
+                "Compacted %d segments into %s (%d rows)", len(snapshot), name, len(metadata)
+            )
+            return True
+        finally:
+            self._compact_lock.release()
+
+    # ------------------------------------------------------------------
+    # Quantization
+    # ------------------------------------------------------------------
+    def _ensure_codes(self, segment: _Segment) -> None:
+        if self.quantize == "int8" and segment.codes is None:
+            segment.codes, segment.q_params = _quantize_int8(segment.matrix)
+
+    def _score_rows(self, segment: _Segment, rows: Optional[np.ndarray], vec: np.ndarray) -> np.ndarray:
+        if segment.codes is not None:
+            codes = segment.codes if rows is None else segment.codes[rows]
+            return _adc_scores(codes, segment.q_params, vec)
+        return segment.matrix @ vec if rows is None else segment.matrix[rows] @ vec
+
+    def memory_stats(self) -> Dict[str, Any]:
+        """Bytes needed for the scoring representation vs plain float32 rows."""
+        rows = sum(seg.rows for seg in self._segments)
+        dim = self._dim or 0
+        float_bytes = rows * dim * 4
+        code_bytes = sum(seg.codes.nbytes + seg.q_params.nbytes for seg in self._segments if seg.codes is not None)
+        return {
+            "rows": rows,
+            "live_rows": self.count(),
+            "segments": len(self._segments),
+            "quantize": self.quantize,
+            "float32_bytes": float_bytes,
+            "scoring_bytes": code_bytes if self.quantize != "none" else float_bytes,
+        }
+
+    # ------------------------------------------------------------------
+    # IVF index
+    # ------------------------------------------------------------------
+    def _ensure_assignment(self, segment: _Segment) -> None:
+        ivf = self._ivf
+        if ivf is None or segment.ivf_version == ivf.version:
+            return
+        segment.set_assignment(_assign_lists(segment.matrix, ivf.centroids), ivf.version, ivf.nlist)
+
+    def list_sizes(self) -> np.ndarray:
+        """Live rows per IVF list (empty array when no index is trained)."""
+        ivf = self._ivf
+        if ivf is None:
+            return np.zeros(0, dtype=np.int64)
+        sizes = np.zeros(ivf.nlist, dtype=np.int64)
+        for segment in self._segments:
+            if segment.assign is not None and segment.ivf_version == ivf.version:
+                sizes += np.bincount(segment.assign[segment.alive], minlength=ivf.nlist)
+        return sizes
+
+    def _needs_ivf_training(self) -> bool:
+        if not self.use_ivf:
+            return False
+        live = self.count()
+        if live < IVF_MIN_ROWS:
+            return False
+        if self._ivf is None or live > 4 * max(self._ivf.trained_rows, 1):
+            return True
+        sizes = self.list_sizes()
+        mean = sizes.mean() if sizes.size else 0.0
+        # Lists drift out of balance as new rows are assigned to old centroids.
+        return mean > 0 and sizes.max() / mean > IVF_MAX_IMBALANCE
+
+    def train_ivf(self, nlist: int | None = None, iterations: int = 20) -> bool:
+        """(Re)train centroids on a sample of live rows and reassign every segment."""
+        with self._locked():
+            self._load_locked()
+            snapshot = list(self._segments)
+            version = (self._ivf.version if self._ivf else 0) + 1
+        live = [(seg, np.flatnonzero(seg.alive)) for seg in snapshot]
+        total = sum(rows.size for _, rows in live)
+        if total == 0:
+            return False
+        nlist = nlist or IVF_NLIST or int(4 * np.sqrt(total))
+        nlist = max(1, min(nlist, total))
+        rng = np.random.default_rng(version)
+        take = min(total, max(IVF_TRAIN_SAMPLE, nlist))
+        picks = np.sort(rng.choice(total, take, replace=False))
+        offsets = np.cumsum([0] + [rows.size for _, rows in live])
+        sample_parts = []
+        for idx, (seg, rows) in enumerate(live):
+            local = picks[(picks >= offsets[idx]) & (picks < offsets[idx + 1])] - offsets[idx]
+            if local.size:
+                sample_parts.append(np.asarray(seg.matrix[rows[local]]))
+        centroids = _train_kmeans(np.concatenate(sample_parts), nlist, iterations=iterations, seed=version)
+        ivf = _IVFIndex(centroids=centroids, version=version, trained_rows=total)
+        assignments = {seg.name or id(seg): _assign_lists(seg.matrix, centroids) for seg in snapshot}
+
+        with self._locked():
+            self._load_locked()
+            if self._ivf is not None and self._ivf.version >= version:
+                return False  # another process trained meanwhile
+            self._ivf = ivf
+            for segment in self._segments:
+                assign = assignments.get(segment.name or id(segment))
+                if assign is None:
+                    # Segment added while training ran: assign it now.
+                    self._ensure_assignment(segment)
+                else:
+                    segment.set_assignment(assign, version, ivf.nlist)
+                if segment.name:
+                    _atomic_save_npy(self._segment_paths(segment.name)["ivf"], segment.assign)
+            _atomic_save_npy(self.centroids_path, centroids)
+            self._write_manifest()
+        logger.info("Trained IVF index: %d lists over %d rows", nlist, total)
+        return True
+
+    def _probe_lists(self, vec: np.ndarray, nprobe: int) -> np.ndarray:
+        centroid_scores = self._ivf.centroids @ vec
+        if nprobe >= centroid_scores.shape[0]:
+            return np.arange(centroid_scores.shape[0])
+        return np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+
+    # ------------------------------------------------------------------
+    # Postings
+    # ------------------------------------------------------------------
+    def _build_index(self, metas: Iterable[Dict[str, Any]]) -> Dict[str, Dict[Any, np.ndarray]]:
+        collected: Dict[str, Dict[Any, List[int]]] = {key: {} for key in self.index_keys}
+        for row, meta in enumerate(metas):
+            for key in self.index_keys:
+                value = meta.get(key)
+                if value is None or not isinstance(value, (str, int, float, bool)):
+                    continue
+                collected[key].setdefault(value, []).append(row)
+        return {
+            key: {value: np.asarray(rows, dtype=np.int64) for value, rows in values.items()}
+            for key, values in collected.items()
+        }
+
+    def _memory_segment(self, matrix: np.ndarray, metadata: List[Dict[str, Any]]) -> _Segment:
+        return _Segment(
+            name=None,
+            matrix=matrix,
+            metadata=metadata,
+            alive=np.ones(len(metadata), dtype=bool),
+            index=self._build_index(metadata),
+        )
+
+    @staticmethod
+    def _candidate_rows(
+        segment: _Segment,
+        namespace: Optional[str],
+        filter_dict: Optional[Dict[str, Any]],
+    ) -> Optional[np.ndarray]:
+        """Return sorted live row ids matching the filters, or None for "all rows"."""
+        conditions: Dict[str, Any] = dict(filter_dict or {})
+        if namespace:
+            conditions["namespace"] = namespace
+        rows: Optional[np.ndarray] = None
+        unindexed: Dict[str, Any] = {}
+        for key, value in conditions.items():
+            if key not in segment.index:
+                unindexed[key] = value
+                continue
+            postings = segment.index[key].get(value, _EMPTY_ROWS)
+            rows = postings if rows is None else np.intersect1d(rows, postings, assume_unique=True)
+            if rows.size == 0:
+                return _EMPTY_ROWS
+        if unindexed:
+            # Keys without an index are checked only on the already-narrowed rows.
+            pool = range(segment.rows) if rows is None else rows.tolist()
+            matched = [
+                idx for idx in pool
+                if all(segment.metadata[idx].get(key) == value for key, value in unindexed.items())
+            ]
+            rows = np.asarray(matched, dtype=np.int64)
+        if segment.alive.all():
+            return rows
+        if rows is None:
+            return np.flatnonzero(segment.alive)
+        return rows[segment.alive[rows]]
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
     @property
     def available(self) -> bool:
-        return self._embeddings is not None and self._embeddings.shape[0] > 0
+        return any(seg.live_rows for seg in self._segments)
+
+    def count(self) -> int:
+        return sum(seg.live_rows for seg in self._segments)
+
+    def version(self) -> int:
+        """Write generation of the saved store; every save, delete, compaction and IVF retrain bumps it."""
+        self.refresh()
+        return self._generation
 
     def add_vectors(self, vectors: Iterable[Iterable[float]], metadata: Iterable[Dict[str, Any]]) -> None:
         vector_list = list(vectors)
@@ -43,67 +818,224 @@ class LocalVectorStore:
         arr = np.array(vector_list, dtype=np.float32)
         if arr.ndim != 2:
             raise ValueError("Vectors must have shape (n, dim)")
-
-        if self._embeddings is None:
-            self._embeddings = arr
-        else:
-            if arr.shape[1] != self._embeddings.shape[1]:
+        with self._lock:
+            if self._dim is not None and arr.shape[1] != self._dim:
                 raise ValueError("Embedding dimension mismatch with existing store")
-            self._embeddings = np.vstack([self._embeddings, arr])
+            self._dim = int(arr.shape[1])
+            # New rows become their own segment: cost scales with the batch, not the store.
+            segment = self._memory_segment(_normalize_rows(arr), meta_list)
+            self._ensure_codes(segment)
+            # Incremental IVF assignment against the current centroids.
+            self._ensure_assignment(segment)
+            self._segments = self._segments + [segment]
 
-        self._metadata.extend(meta_list)
+    @staticmethod
+    def _lexical_docs(metadata: Iterable[Dict[str, Any]]) -> Iterator[LexicalDoc]:
+        for meta in metadata:
+            text = meta.get("text") or meta.get("snippet") or ""
+            doc_id = meta.get("id") or content_id(str(meta.get("source", "")), text)
+            yield str(doc_id), text, meta
 
-    def save(self) -> None:
-        if self._embeddings is None:
-            return
-        np.save(self.embeddings_path, self._embeddings)
-        with self.metadata_path.open("w", encoding="utf-8") as f:
-            json.dump(self._metadata, f, ensure_ascii=False, indent=2)
+    def iter_documents(self) -> Iterator[LexicalDoc]:
+        """``(id, text, metadata)`` of every live row."""
+        for segment in list(self._segments):
+            yield from self._lexical_docs(
+                segment.metadata[row] for row in np.flatnonzero(segment.alive)
+            )
 
-    def query(self, vector: Iterable[float], top_k: int = 3, namespace: Optional[str] = None) -> List[Dict[str, Any]]:
-        if not self.available:
+    def query(
+        self,
+        vector: Iterable[float],
+        top_k: int = 3,
+        namespace: Optional[str] = None,
+        filter_dict: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """Top-k cosine matches.
+
+        Uses the IVF index unless ``exact`` is set. On quantized stores the
+        best ``top_k * rescore_factor`` code scores per segment are re-scored
+        against the float rows before the final cut.
+        """
+        vec = self._prepare_query(vector) if top_k > 0 else None
+        if vec is None:
             return []
+        probe = self._probe_for(vec, nprobe, exact)
+        hits = []
+        for segment in self._segments:
+            candidates = self._candidate_rows(segment, namespace, filter_dict)
+            rows, scores = self._score_segment(segment, candidates, vec, probe)
+            if rows.size:
+                hits.extend(self._segment_top(segment, rows, scores, top_k, vec))
+        return self._hit_metadata(hits, top_k)
+
+    def query_namespaces(
+        self,
+        vector: Iterable[float],
+        top_k: Dict[Optional[str], int],
+        filter_dict: Optional[Dict[str, Any]] = None,
+        boosts: Optional[Dict[str, float]] = None,
+        score_threshold: float = 0.0,
+        nprobe: Optional[int] = None,
+        exact: bool = False,
+    ) -> Dict[Optional[str], List[Dict[str, Any]]]:
+        """Per-namespace top-k lists from a single scoring pass.
+
+        ``top_k`` maps namespaces to list sizes; the ``None`` key collects the
+        best rows of every namespace *not* listed. ``score_threshold`` applies
+        to the raw cosine score, then ``boosts`` multiplies the scores of the
+        given namespaces so the lists can be merged directly.
+        """
+        results: Dict[Optional[str], List[Dict[str, Any]]] = {key: [] for key in top_k}
+        vec = self._prepare_query(vector) if any(k > 0 for k in top_k.values()) else None
+        if vec is None:
+            return results
+        named = [key for key in top_k if key is not None]
+        probe = self._probe_for(vec, nprobe, exact)
+        hits: Dict[Optional[str], list] = {key: [] for key in top_k}
+        for segment in self._segments:
+            candidates = self._candidate_rows(segment, None, filter_dict)
+            rows, scores = self._score_segment(segment, candidates, vec, probe)
+            if not rows.size:
+                continue
+            rest = np.ones(rows.size, dtype=bool)
+            postings = segment.index.get("namespace", {})
+            for key in named:
+                mask = np.isin(rows, postings.get(key, _EMPTY_ROWS), assume_unique=True)
+                rest &= ~mask
+                if mask.any() and top_k[key] > 0:
+                    hits[key].extend(self._segment_top(segment, rows[mask], scores[mask], top_k[key], vec))
+            if None in top_k and top_k[None] > 0 and rest.any():
+                hits[None].extend(self._segment_top(segment, rows[rest], scores[rest], top_k[None], vec))
+        boosts = boosts or {}
+        for key, key_hits in hits.items():
+            for meta in self._hit_metadata(key_hits, top_k[key]):
+                if meta["score"] < score_threshold:
+                    continue
+                meta["score"] *= boosts.get(meta.get("namespace"), 1.0)
+                results[key].append(meta)
+        return results
+
+    # ------------------------------------------------------------------
+    # Query helpers
+    # ------------------------------------------------------------------
+    def _prepare_query(self, vector: Iterable[float]) -> Optional[np.ndarray]:
+        if self.mmap:
+            self.refresh()
+        if not self.available:
+            return None
         vec = np.array(vector, dtype=np.float32)
         if vec.ndim == 2:
             vec = vec[0]
         vec_norm = np.linalg.norm(vec)
-        if vec_norm == 0 or self._embeddings is None:
-            return []
+        if vec_norm == 0:
+            return None
+        # Rows are stored unit-length, so cosine similarity is one mat-vec.
+        return vec / vec_norm
 
-        indices = list(range(len(self._metadata)))
-        if namespace:
-            indices = [idx for idx in indices if self._metadata[idx].get("namespace") == namespace]
-        if not indices:
-            return []
+    def _probe_for(self, vec: np.ndarray, nprobe: Optional[int], exact: bool) -> Optional[np.ndarray]:
+        if not self.use_ivf or exact or self._ivf is None:
+            return None
+        return self._probe_lists(vec, nprobe or self.nprobe)
 
-        matrix = self._embeddings[indices]
-        matrix_norms = np.linalg.norm(matrix, axis=1)
-        denom = (matrix_norms * vec_norm) + 1e-10
-        scores = (matrix @ vec) / denom
-        ordering = np.argsort(scores)[::-1][:top_k]
+    def _score_segment(
+        self,
+        segment: _Segment,
+        rows: Optional[np.ndarray],
+        vec: np.ndarray,
+        probe: Optional[np.ndarray],
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Score the candidate ``rows`` (None = all) of one segment, narrowed by the IVF probe."""
+        if rows is not None and rows.size == 0:
+            return _EMPTY_ROWS, np.empty(0, dtype=np.float32)
+        if probe is not None and self._ivf is not None and segment.ivf_version == self._ivf.version:
+            probed = segment.probe_rows(probe)
+            if rows is None:
+                rows = probed[segment.alive[probed]]
+            elif rows.size > probed.size:
+                # Selective filters are cheaper to score exactly than to probe.
+                rows = np.intersect1d(rows, probed, assume_unique=True)
+            if rows.size == 0:
+                return _EMPTY_ROWS, np.empty(0, dtype=np.float32)
+        scores = self._score_rows(segment, rows, vec)
+        if rows is None:
+            rows = np.arange(segment.rows)
+        return rows, scores
 
+    def _segment_top(
+        self, segment: _Segment, rows: np.ndarray, scores: np.ndarray, top_k: int, vec: np.ndarray
+    ) -> List[tuple]:
+        """Best ``top_k`` rows of a segment; quantized stores re-score a shortlist against float rows."""
+        limit = top_k * max(self.rescore_factor, 1) if segment.codes is not None else top_k
+        if scores.shape[0] > limit:
+            keep = np.argpartition(scores, -limit)[-limit:]
+            rows, scores = rows[keep], scores[keep]
+        if segment.codes is not None and self.rescore_factor > 0:
+            # Only the shortlist touches (and pages in) float rows.
+            order = np.argsort(rows)
+            rows = rows[order]
+            scores = np.asarray(segment.matrix[rows]) @ vec
+        return [(float(score), segment, int(row)) for score, row in zip(scores, rows)]
+
+    @staticmethod
+    def _hit_metadata(hits: List[tuple], top_k: int) -> List[Dict[str, Any]]:
+        hits.sort(key=lambda item: item[0], reverse=True)
         results = []
-        for rank in ordering:
-            if scores[rank] <= 0:
+        for score, segment, row in hits[:top_k]:
+            if score <= 0:
                 continue
-            meta_index = indices[rank]
-            meta = dict(self._metadata[meta_index])
-            meta["score"] = float(scores[rank])
+            meta = dict(segment.metadata[row])
+            meta["score"] = score
             results.append(meta)
         return results
 
     def remove_namespace(self, namespace: str) -> None:
-        if self._embeddings is None or not self._metadata:
-            return
-        keep_indices = [idx for idx, meta in enumerate(self._metadata) if meta.get("namespace") != namespace]
-        if len(keep_indices) == len(self._metadata):
-            return
-        if keep_indices:
-            self._embeddings = self._embeddings[keep_indices]
-            self._metadata = [self._metadata[idx] for idx in keep_indices]
-        else:
-            self._embeddings = None
-            self._metadata = []
+        """Tombstone every row of ``namespace``; deletes of saved rows are persisted at once."""
+        with self._locked():
+            self._load_locked()
+            changed = False
+            for segment in self._segments:
+                rows = segment.index.get("namespace", {}).get(namespace)
+                if rows is None or not segment.alive[rows].any():
+                    continue
+                # Tombstone instead of rewriting: compaction reclaims the space.
+                segment.alive[rows] = False
+                if segment.name is not None:
+                    self._write_tombstones(segment)
+                    changed = True
+            if self.lexical is not None:
+                self.lexical.remove_namespace(namespace)
+            if changed:
+                self._write_manifest()
+
+    def existing_ids(self, ids: Iterable[str]) -> Set[str]:
+        """The subset of ``ids`` stored in a live row."""
+        found: Set[str] = set()
+        for segment in list(self._segments):
+            for doc_id in ids:
+                row = segment.row_of(doc_id)
+                if row is not None and segment.alive[row]:
+                    found.add(doc_id)
+        return found
 
     def namespace_present(self, namespace: str) -> bool:
-        return any(meta.get("namespace") == namespace for meta in self._metadata)
+        for segment in self._segments:
+            rows = segment.index.get("namespace", {}).get(namespace)
+            if rows is not None and segment.alive[rows].any():
+                return True
+        return False
+
+
+_STORES: Dict[Path, LocalVectorStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_local_store(store_dir: Path | None = None) -> LocalVectorStore:
+    """Process-wide store for ``store_dir`` so every reader and writer shares one segment list."""
+    path = Path(store_dir or DEFAULT_STORE_DIR).resolve()
+    with _STORES_LOCK:
+        store = _STORES.get(path)
+        if store is None:
+            store = _STORES[path] = LocalVectorStore(path)
+        return store
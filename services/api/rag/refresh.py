@@ -0,0 +1,487 @@
+"""Incremental refresh of the chatbot RAG collection.
+
+A manifest records, for every ingested source file, its size, mtime, content
+hash and the chunk ids written for it. A refresh only re-embeds sources whose
+content changed, and deletes the chunks of sources that disappeared, so its
+cost follows the amount of change rather than the corpus size.
+``full=True`` rebuilds everything into a shadow collection which is swapped in
+atomically once complete, so queries keep hitting a complete index meanwhile.
+
+Refreshes run as background jobs on a single worker (see :func:`submit_refresh`).
+Job state lives in a JSON file next to the manifest, so any API worker can
+answer ``GET /chatbot/refresh/{job_id}``, and runs are serialized across
+workers by a file lock.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts: single-worker deployments only
+    fcntl = None
+
+from ..utils.chatbot_events import log_chatbot_event
+from ..utils.response_cache import response_cache
+from .bulk_writer import BulkWriteStats
+from .chroma_store import (
+    create_shadow_collection,
+    delete_documents,
+    drop_collection,
+    get_collection,
+    rebuilding,
+    swap_collection,
+    writing_to,
+)
+from .ingest_agents import discover_agent_files, ingest_agent_page
+from .ingest_csv import discover_csv_files, ingest_csv_file, ingest_text_source
+from .ingest_docs import discover_docs, ingest_doc_file
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = Path(
+    os.getenv("CHATBOT_RAG_MANIFEST", str(Path(__file__).resolve().parents[1] / ".rag_manifest.json"))
+)
+MANIFEST_VERSION = 1
+JOBS_PATH = MANIFEST_PATH.with_name(f"{MANIFEST_PATH.stem}.jobs.json")
+_HASH_BLOCK = 1 << 20
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as handle:
+        for block in iter(lambda: handle.read(_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class Source:
+    """One ingestible file; ``key`` is the value of its chunks' ``source`` metadata."""
+
+    key: str
+    path: Path
+    kind: str
+    ingest: Callable[[bool], BulkWriteStats]  # arg: replace_existing
+
+
+class RefreshManifest:
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text())
+                if data.get("version") == MANIFEST_VERSION:
+                    self.sources = data.get("sources", {})
+            except Exception as exc:
+                logger.warning("Ignoring unreadable RAG manifest %s: %s", self.path, exc)
+
+    def changed(self, source: Source) -> Optional[Dict[str, Any]]:
+        """Return the new fingerprint if ``source`` differs from the manifest, else None."""
+        stat = source.path.stat()
+        entry = self.sources.get(source.key)
+        if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime:
+            return None
+        digest = file_digest(source.path)
+        fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+        if entry and entry.get("sha256") == digest:
+            # Touched but identical: remember the new mtime so we skip hashing next time.
+            entry.update(fingerprint)
+            return None
+        return fingerprint
+
+    def record(
+        self,
+        source: Source,
+        fingerprint: Dict[str, Any],
+        chunk_ids: List[str],
+        duplicate_of: Sequence[str] = (),
+    ) -> None:
+        with self._lock:
+            self.sources[source.key] = {
+                "kind": source.kind,
+                "path": str(source.path),
+                **fingerprint,
+                "chunk_ids": chunk_ids,
+                # Chunks of other sources standing in for near-duplicates skipped here.
+                "duplicate_of": sorted(set(duplicate_of)),
+                "indexed_at": time.time(),
+            }
+
+    def pop(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self.sources.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.sources = {}
+
+    def save(self) -> None:
+        with self._lock:
+            payload = json.dumps({"version": MANIFEST_VERSION, "sources": self.sources})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(payload)
+        os.replace(tmp, self.path)
+
+
+def _read_text_source(path: Path, key: str, agent_id: str) -> Callable[[bool], BulkWriteStats]:
+    def _ingest(replace_existing: bool) -> BulkWriteStats:
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        return ingest_text_source(text, source=key, agent_id=agent_id, replace_existing=replace_existing)
+
+    return _ingest
+
+
+def discover_sources(text_dirs: Sequence[tuple] = ()) -> List[Source]:
+    """CSV outputs, agent UI pages and docs, plus ``(directory, namespace)`` text trees."""
+    sources: List[Source] = []
+    for kind, paths, ingest in (
+        ("csv", discover_csv_files(), ingest_csv_file),
+        ("agent_ui", discover_agent_files(), ingest_agent_page),
+        ("doc", discover_docs(), ingest_doc_file),
+    ):
+        for path in paths:
+            sources.append(
+                Source(str(path), path, kind, lambda replace, path=path, ingest=ingest: ingest(path, replace_existing=replace))
+            )
+    for directory, namespace in text_dirs:
+        base = Path(directory)
+        if not base.exists():
+            continue
+        for path in sorted(p for p in base.rglob("*") if p.is_file()):
+            key = f"{namespace}:{path}"
+            sources.append(Source(key, path, "text", _read_text_source(path, key, namespace)))
+    return sources
+
+
+def _delete_ids(collection: Any, ids: List[str]) -> int:
+    return len(delete_documents(collection, ids=ids))
+
+
+def _delete_source(collection: Any, key: str, entry: Dict[str, Any]) -> int:
+    deleted = _delete_ids(collection, list(entry.get("chunk_ids") or []))
+    try:
+        # Sweep rows the manifest never saw (e.g. written before it existed).
+        delete_documents(collection, where={"source": key})
+    except Exception:
+        pass
+    return deleted
+
+
+def _empty_kind_stats() -> Dict[str, Any]:
+    return {
+        "files_processed": 0,
+        "rows_indexed": 0,
+        "duplicates_skipped": 0,
+        "unchanged": 0,
+        "removed": 0,
+        "chunks_deleted": 0,
+    }
+
+
+def _sync_source(
+    source: Source,
+    fingerprint: Dict[str, Any],
+    manifest: RefreshManifest,
+    collection: Any,
+    kind_stats: Dict[str, Any],
+) -> Set[str]:
+    """Re-ingest one source; returns the chunk ids deleted as stale."""
+    previous = manifest.sources.get(source.key)
+    # Write the new chunks first, then drop only the stale ones, so the
+    # source never disappears from search mid-refresh.
+    written = source.ingest(previous is None)
+    stale: Set[str] = set()
+    if previous:
+        stale = set(previous.get("chunk_ids") or []) - set(written.ids)
+        kind_stats["chunks_deleted"] += _delete_ids(collection, sorted(stale))
+    manifest.record(source, fingerprint, written.ids, written.duplicate_of)
+    kind_stats["files_processed"] += 1
+    kind_stats["rows_indexed"] += written.rows
+    kind_stats["duplicates_skipped"] += written.duplicates
+    return stale
+
+
+def _sync_sources(
+    sources: List[Source],
+    manifest: RefreshManifest,
+    collection: Any,
+    progress: Optional[Callable[[int, int], None]],
+) -> Dict[str, Any]:
+    stats: Dict[str, Dict[str, Any]] = {}
+    seen = set()
+    deleted: Set[str] = set()
+    for position, source in enumerate(sources, start=1):
+        kind_stats = stats.setdefault(source.kind, _empty_kind_stats())
+        seen.add(source.key)
+        try:
+            fingerprint = manifest.changed(source)
+            if fingerprint is None:
+                kind_stats["unchanged"] += 1
+                continue
+            deleted |= _sync_source(source, fingerprint, manifest, collection, kind_stats)
+        except Exception as exc:
+            logger.warning("Failed to refresh %s: %s", source.path, exc)
+        finally:
+            if progress is not None:
+                progress(position, len(sources))
+    kinds = {source.kind for source in sources}
+    for key in [key for key, entry in manifest.sources.items() if key not in seen and entry.get("kind") in kinds]:
+        entry = manifest.pop(key) or {}
+        kind_stats = stats.setdefault(entry.get("kind", "unknown"), _empty_kind_stats())
+        kind_stats["removed"] += 1
+        kind_stats["chunks_deleted"] += _delete_source(collection, key, entry)
+        deleted.update(entry.get("chunk_ids") or [])
+    _restore_duplicates(sources, manifest, collection, stats, deleted)
+    return stats
+
+
+def _restore_duplicates(
+    sources: List[Source],
+    manifest: RefreshManifest,
+    collection: Any,
+    stats: Dict[str, Dict[str, Any]],
+    deleted: Set[str],
+) -> None:
+    """Re-ingest sources whose near-duplicate chunks were skipped in favour of chunks now deleted."""
+    redone: Set[str] = set()
+    while deleted:
+        dependents = [
+            source
+            for source in sources
+            if source.key not in redone
+            and deleted.intersection(manifest.sources.get(source.key, {}).get("duplicate_of") or ())
+        ]
+        deleted = set()
+        for source in dependents:
+            redone.add(source.key)
+            try:
+                fingerprint = {
+                    key: manifest.sources[source.key][key] for key in ("size", "mtime", "sha256")
+                }
+                deleted |= _sync_source(source, fingerprint, manifest, collection, stats[source.kind])
+            except Exception as exc:
+                logger.warning("Failed to restore duplicates of %s: %s", source.path, exc)
+
+
+def refresh_sources(
+    sources: Iterable[Source],
+    *,
+    full: bool = False,
+    manifest: Optional[RefreshManifest] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    """Bring the collection in line with ``sources``; returns per-kind stats."""
+    manifest = manifest or RefreshManifest()
+    sources = list(sources)
+    started = time.perf_counter()
+    if full:
+        # Live writes (uploads) wait until the swap instead of landing in the retiring collection.
+        with rebuilding():
+            shadow = create_shadow_collection()
+            fresh = RefreshManifest(manifest.path)
+            fresh.clear()
+            try:
+                with writing_to(shadow):
+                    stats = _sync_sources(sources, fresh, shadow, progress)
+            except BaseException:
+                drop_collection(shadow)
+                raise
+            swap_collection(shadow)
+            fresh.save()
+    else:
+        stats = _sync_sources(sources, manifest, get_collection(), progress)
+        manifest.save()
+    return {"mode": "full" if full else "incremental", "seconds": round(time.perf_counter() - started, 2), **stats}
+
+
+def refresh_rag_store(
+    *,
+    full: bool = False,
+    text_dirs: Sequence[tuple] = (),
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict[str, Any]:
+    return refresh_sources(discover_sources(text_dirs), full=full, progress=progress)
+
+
+@dataclass
+class RefreshJob:
+    job_id: str
+    mode: str
+    state: str = "queued"  # queued | running | succeeded | failed
+    done: int = 0
+    total: int = 0
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    pid: int = field(default_factory=os.getpid)  # worker process that runs the job
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["progress"] = round(self.done / self.total, 3) if self.total else 0.0
+        return data
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class RefreshJobStore:
+    """Refresh jobs in a JSON file shared by every API worker (newest last)."""
+
+    def __init__(self, path: Path = JOBS_PATH, max_jobs: int = 50):
+        self.path = Path(path)
+        self.lock_path = self.path.with_suffix(".lock")
+        self.max_jobs = max_jobs
+
+    @contextmanager
+    def _locked(self, exclusive: bool = True) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock_path.open("a+") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _read(self) -> List[RefreshJob]:
+        try:
+            rows = json.loads(self.path.read_text()).get("jobs", [])
+        except (OSError, ValueError):
+            return []
+        jobs = []
+        for row in rows:
+            job = RefreshJob(**row)
+            if job.state in ("queued", "running") and not _process_alive(job.pid):
+                job.state, job.error = "failed", "worker process exited before the job finished"
+            jobs.append(job)
+        return jobs
+
+    def _write(self, jobs: List[RefreshJob]) -> None:
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps({"jobs": [asdict(job) for job in jobs[-self.max_jobs :]]}))
+        os.replace(tmp, self.path)
+
+    def save(self, job: RefreshJob) -> None:
+        with self._locked():
+            jobs = [other for other in self._read() if other.job_id != job.job_id]
+            jobs.append(job)
+            jobs.sort(key=lambda item: item.submitted_at)
+            self._write(jobs)
+
+    def submit(self, mode: str) -> tuple:
+        """``(job, created)``: an identical queued job is reused rather than queued twice."""
+        with self._locked():
+            jobs = self._read()
+            for job in jobs:
+                if job.mode == mode and job.state == "queued":
+                    return job, False
+            job = RefreshJob(job_id=uuid.uuid4().hex[:12], mode=mode)
+            jobs.append(job)
+            self._write(jobs)
+            return job, True
+
+    def get(self, job_id: str) -> Optional[RefreshJob]:
+        with self._locked(exclusive=False):
+            return next((job for job in self._read() if job.job_id == job_id), None)
+
+    def list(self) -> List[RefreshJob]:
+        with self._locked(exclusive=False):
+            return list(reversed(self._read()))
+
+
+_PROGRESS_WRITE_SECONDS = 1.0
+_JOB_STORE = RefreshJobStore()
+_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-refresh")
+# One refresh at a time across all workers (they share the manifest and collection).
+_RUN_LOCK = MANIFEST_PATH.with_name(f"{MANIFEST_PATH.stem}.refresh.lock")
+
+
+def _run_job(job: RefreshJob, full: bool) -> None:
+    with _RUN_LOCK.open("a+") as run_lock:
+        if fcntl is not None:
+            fcntl.flock(run_lock, fcntl.LOCK_EX)
+        job.state = "running"
+        job.started_at = time.time()
+        _JOB_STORE.save(job)
+        last_write = [0.0]
+
+        def _progress(done: int, total: int) -> None:
+            job.done, job.total = done, total
+            now = time.time()
+            if done == total or now - last_write[0] >= _PROGRESS_WRITE_SECONDS:
+                last_write[0] = now
+                _JOB_STORE.save(job)
+
+        try:
+            job.result = refresh_rag_store(full=full, progress=_progress)
+            job.state = "succeeded"
+            # Cached /chatbot/chat answers may quote chunks that changed.
+            response_cache("chatbot").clear()
+        except Exception as exc:
+            logger.exception("RAG refresh job %s failed", job.job_id)
+            job.error = str(exc)
+            job.state = "failed"
+        finally:
+            job.finished_at = time.time()
+            _JOB_STORE.save(job)
+            log_chatbot_event(
+                "rag.refresh.finish",
+                job_id=job.job_id,
+                mode=job.mode,
+                state=job.state,
+                seconds=round(job.finished_at - job.started_at, 2),
+            )
+
+
+def submit_refresh(full: bool = False) -> RefreshJob:
+    """Queue a refresh on the background worker; an identical queued job is reused."""
+    job, created = _JOB_STORE.submit("full" if full else "incremental")
+    if created:
+        _EXECUTOR.submit(_run_job, job, full)
+    return job
+
+
+def get_refresh_job(job_id: str) -> Optional[RefreshJob]:
+    return _JOB_STORE.get(job_id)
+
+
+def list_refresh_jobs() -> List[RefreshJob]:
+    return _JOB_STORE.list()
+
+
+__all__ = [
+    "RefreshJob",
+    "RefreshJobStore",
+    "RefreshManifest",
+    "Source",
+    "discover_sources",
+    "file_digest",
+    "get_refresh_job",
+    "list_refresh_jobs",
+    "refresh_rag_store",
+    "refresh_sources",
+    "submit_refresh",
+]
@@ -1,70 +1,154 @@
 """Reranking utilities for improving RAG retrieval quality."""
 from __future__ import annotations
 
+import copy
+import hashlib
 import logging
-from typing import Any, Dict, List, Optional
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
-    from sentence_transformers import CrossEncoder
+    from sentence_transformers import CrossEncoder  # noqa: F401
     RERANKER_AVAILABLE = True
 except ImportError:
     RERANKER_AVAILABLE = False
 
+from .encoder_registry import get_cross_encoder
+
 logger = logging.getLogger(__name__)
 
 # Default reranker model (lightweight, CPU-friendly)
 # Try mini first (faster), fallback to base (better quality)
 DEFAULT_RERANKER_MODEL = "BAAI/bge-reranker-v2-m3"  # Mini model for CPU efficiency
-_reranker_model: Optional[Any] = None
+FALLBACK_RERANKER_MODEL = "BAAI/bge-reranker-base"
+_failed_models: set[str] = set()  # don't retry a model that already failed to load
+
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "1500"))  # 0 = no budget
+RERANK_MARGIN = float(os.getenv("RERANK_MARGIN", "0.2"))  # dense top1-top2 gap that skips reranking
+RERANK_BATCH_SIZE = max(1, int(os.getenv("RERANK_BATCH_SIZE", "8")))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "384"))  # tokens per (query, doc) pair
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+_MAX_CHARS = RERANK_MAX_LENGTH * 6  # don't tokenize text that truncation would discard anyway
+
+# LRU of cross-encoder scores keyed by (sha1(query), doc id)
+_score_cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0, "skipped": 0, "budget_exhausted": 0}
+# Registry model -> shallow copy with RERANK_MAX_LENGTH; the registry instance itself is never mutated.
+_truncated_views: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
 
 
 def _get_reranker_model(model_name: Optional[str] = None) -> Optional[Any]:
-    """Get or initialize the reranker model."""
-    global _reranker_model
-    
+    """Get the shared reranker model from the encoder registry."""
     if not RERANKER_AVAILABLE:
         logger.warning("Reranker not available. Install with: pip install sentence-transformers")
         return None
-    
-    if _reranker_model is None:
+
+    model_to_use = model_name or DEFAULT_RERANKER_MODEL
+    if model_to_use not in _failed_models:
         try:
-            model_to_use = model_name or DEFAULT_RERANKER_MODEL
-            logger.info(f"Loading reranker model: {model_to_use}")
-            # Try mini model first, fallback to base if mini fails
-            try:
-                _reranker_model = CrossEncoder(model_to_use)
-            except Exception:
-                # Fallback to base model if mini not available
-                logger.warning(f"Mini model {model_to_use} not available, trying base model")
-                _reranker_model = CrossEncoder("BAAI/bge-reranker-base")
-            logger.info("Reranker model loaded successfully")
-        except Exception as exc:
-            logger.error(f"Failed to load reranker model: {exc}")
-            return None
-    
-    return _reranker_model
+            return get_cross_encoder(model_to_use)
+        except Exception:
+            # Fallback to base model if mini not available
+            logger.warning(f"Mini model {model_to_use} not available, trying base model")
+            _failed_models.add(model_to_use)
+    if FALLBACK_RERANKER_MODEL in _failed_models:
+        return None
+    try:
+        return get_cross_encoder(FALLBACK_RERANKER_MODEL)
+    except Exception as exc:
+        logger.error(f"Failed to load reranker model: {exc}")
+        _failed_models.add(FALLBACK_RERANKER_MODEL)
+        return None
+
+
+def _doc_key(doc: Dict[str, Any], text: str) -> str:
+    # Include the text digest so re-ingested (changed) chunks don't reuse stale scores.
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+    return f"{doc.get('id') or ''}:{digest}"
+
+
+def _cached_score(key: Tuple[str, str]) -> Optional[float]:
+    with _cache_lock:
+        score = _score_cache.get(key)
+        if score is not None:
+            _score_cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+        else:
+            _cache_stats["misses"] += 1
+        return score
+
+
+def _store_scores(items: List[Tuple[Tuple[str, str], float]]) -> None:
+    with _cache_lock:
+        for key, score in items:
+            _score_cache[key] = score
+            _score_cache.move_to_end(key)
+        while len(_score_cache) > RERANK_CACHE_SIZE:
+            _score_cache.popitem(last=False)
+
+
+def _with_max_length(reranker: Any) -> Any:
+    """The shared cross-encoder truncating at ``RERANK_MAX_LENGTH`` (weights and tokenizer shared)."""
+    if getattr(reranker, "max_length", None) == RERANK_MAX_LENGTH or "max_length" not in vars(reranker):
+        return reranker
+    with _cache_lock:
+        try:
+            view = _truncated_views.get(reranker)
+            if view is None:
+                view = copy.copy(reranker)
+                view.max_length = RERANK_MAX_LENGTH
+                _truncated_views[reranker] = view
+            return view
+        except TypeError:  # not weak-referenceable: score with the model's own limit
+            return reranker
 
 
 def rerank_documents(
     query: str,
     documents: List[Dict[str, Any]],
     top_k: Optional[int] = None,
-    model_name: Optional[str] = None
+    model_name: Optional[str] = None,
+    budget_ms: Optional[float] = None,
 ) -> List[Dict[str, Any]]:
     """
     Rerank retrieved documents using a cross-encoder model.
+
+    Scoring stops early when the dense top hit already beats the runner-up by
+    ``RERANK_MARGIN``, cached (query, doc) scores are reused, and uncached
+    pairs are scored in ``RERANK_BATCH_SIZE`` batches until ``budget_ms`` runs
+    out. Documents left unscored keep their dense order after the scored ones.
     
     Args:
         query: The user's query/question
         documents: List of document dictionaries with 'snippet' or 'text' field
         top_k: Number of top documents to return (None = return all)
         model_name: Optional reranker model name
+        budget_ms: Latency budget for cross-encoder calls (default RERANK_BUDGET_MS, 0 = unlimited)
     
     Returns:
         Reranked list of documents sorted by relevance score
     """
     if not documents:
         return []
+
+    # Lexical-only hits carry no dense ``score``; they sort after the dense ones.
+    ordered = sorted(
+        documents,
+        key=lambda doc: (doc.get("score") is not None, float(doc.get("score") or 0.0)),
+        reverse=True,
+    )
+    if len(ordered) > 1 and RERANK_MARGIN > 0 and all(doc.get("score") is not None for doc in ordered[:2]):
+        margin = float(ordered[0]["score"]) - float(ordered[1]["score"])
+        if margin >= RERANK_MARGIN:
+            # Dense retrieval is decisive; skip the cross-encoder entirely.
+            with _cache_lock:
+                _cache_stats["skipped"] += 1
+            return ordered[:top_k] if top_k is not None else ordered
     
     reranker = _get_reranker_model(model_name)
     if not reranker:
@@ -73,29 +157,56 @@ def rerank_documents(
         return documents
     
     try:
-        # Prepare query-document pairs
-        pairs = []
-        for doc in documents:
-            text = doc.get("snippet") or doc.get("text") or ""
-            if text:
-                pairs.append([query, text])
+        reranker = _with_max_length(reranker)
+        budget = RERANK_BUDGET_MS if budget_ms is None else budget_ms
+        started = time.perf_counter()
+        query_hash = hashlib.sha1(query.encode("utf-8")).hexdigest()
+
+        scores: Dict[int, float] = {}
+        pending: List[Tuple[int, Tuple[str, str], str]] = []
+        for position, doc in enumerate(ordered):
+            text = (doc.get("snippet") or doc.get("text") or "")[:_MAX_CHARS]
+            if not text:
+                continue  # nothing to score; stays in dense order after the scored docs
+            key = (query_hash, _doc_key(doc, text))
+            cached = _cached_score(key)
+            if cached is not None:
+                scores[position] = cached
             else:
-                pairs.append([query, ""])
-        
-        if not pairs:
+                pending.append((position, key, text))
+        if not scores and not pending:
             return documents
-        
-        # Get reranking scores
-        scores = reranker.predict(pairs)
+
+        # Score the best dense candidates first so a tight budget keeps the important ones.
+        for start in range(0, len(pending), RERANK_BATCH_SIZE):
+            # The first batch always runs; later ones only while budget remains.
+            if start and budget and (time.perf_counter() - started) * 1000 >= budget:
+                with _cache_lock:
+                    _cache_stats["budget_exhausted"] += 1
+                break
+            batch = pending[start : start + RERANK_BATCH_SIZE]
+            batch_scores = reranker.predict([[query, text] for _, _, text in batch], batch_size=len(batch))
+            fresh = [(key, float(score)) for (_, key, _), score in zip(batch, batch_scores)]
+            _store_scores(fresh)
+            for (position, _, _), (_, score) in zip(batch, fresh):
+                scores[position] = score
         
         # Combine scores with documents
         scored_docs = []
-        for doc, score in zip(documents, scores):
+        unscored_docs = []
+        for position, doc in enumerate(ordered):
+            if position not in scores:
+                unscored_docs.append(doc)
+                continue
+            score = scores[position]
             # Update score with reranking score (weighted combination)
-            original_score = doc.get("score", 0.0)
+            original_score = doc.get("score")
             # Combine original similarity score with reranking score
             # Weight: 30% original, 70% reranking (reranking is more accurate)
-            combined_score = (original_score * 0.3) + (float(score) * 0.7)
+            if original_score is None:
+                combined_score = float(score)
+            else:
+                combined_score = (float(original_score) * 0.3) + (float(score) * 0.7)
             
             updated_doc = dict(doc)
             updated_doc["score"] = combined_score
@@ -104,6 +215,7 @@ def rerank_documents(
         
         # Sort by combined score (descending)
         scored_docs.sort(key=lambda x: x["score"], reverse=True)
+        scored_docs.extend(unscored_docs)
         
         # Return top_k if specified
         if top_k is not None:
@@ -117,6 +229,11 @@ def rerank_documents(
         return documents
 
 
+def rerank_cache_stats() -> Dict[str, int]:
+    with _cache_lock:
+        return {**_cache_stats, "size": len(_score_cache), "max_size": RERANK_CACHE_SIZE}
+
+
 def reranker_available() -> bool:
     """Check if reranker is available."""
     return RERANKER_AVAILABLE and _get_reranker_model() is not None
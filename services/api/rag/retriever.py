@@ -4,7 +4,7 @@ from __future__ import annotations
 from typing import Dict, List, Sequence, Tuple
 
 from .chroma_store import get_collection
-from .embeddings import embed_texts
+from .embed_batcher import embed_query
 
 
 def query_rag(
@@ -20,7 +20,7 @@ def query_rag(
         return "", [], 0.0, None
 
     where = {"agent": agent_id} if agent_id else None
-    embeddings = embed_texts([question])
+    embeddings = [embed_query(question)]
     results = collection.query(
         embeddings=embeddings,
         n_results=top_k,
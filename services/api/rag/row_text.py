@@ -0,0 +1,64 @@
+"""Columnar rendering of DataFrame rows into ``"col=value; ..."`` RAG documents."""
+from __future__ import annotations
+
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Columns surfaced as structured metadata next to the rendered row text.
+HIGHLIGHT_COLUMNS: Tuple[str, ...] = (
+    "application_id",
+    "decision",
+    "score",
+    "reason",
+    "pd",
+    "ltv",
+    "dti",
+    "stage",
+    "status",
+)
+
+
+def render_rows(
+    df: pd.DataFrame,
+    highlight_cols: Sequence[str] = (),
+) -> Tuple[List[str], List[Dict[str, str]]]:
+    """Render every row of ``df`` as ``"col=value; ..."`` (nulls skipped).
+
+    Works column by column, so the Python-level loop is over columns, not
+    cells. Returns the row texts plus, per row, the non-null values of
+    ``highlight_cols`` (as strings) collected in the same pass. Rows with no
+    non-null cells render as ``""``.
+    """
+    rows = len(df)
+    text = np.full(rows, "", dtype=object)
+    wanted = set(highlight_cols)
+    highlights: Dict[str, np.ndarray] = {}
+    for position, col in enumerate(df.columns):
+        series = df.iloc[:, position]
+        mask = series.notna().to_numpy()
+        if not mask.any():
+            continue
+        values = series.astype(str).to_numpy(dtype=object)
+        pieces = f"{col}=" + values
+        joined = np.where(text != "", text + "; " + pieces, pieces)
+        text = np.where(mask, joined, text)
+        if col in wanted and col not in highlights:
+            highlights[col] = np.where(mask, values, None)
+    if highlights:
+        names = list(highlights)
+        meta = [
+            {name: value for name, value in zip(names, row) if value is not None}
+            for row in zip(*highlights.values())
+        ]
+    else:
+        meta = [{} for _ in range(rows)]
+    return text.tolist(), meta
+
+
+def render_row_texts(df: pd.DataFrame) -> List[str]:
+    return render_rows(df)[0]
+
+
+__all__ = ["HIGHLIGHT_COLUMNS", "render_rows", "render_row_texts"]
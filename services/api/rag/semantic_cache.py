@@ -0,0 +1,200 @@
+"""Semantic response cache: reuse answers to paraphrased questions.
+
+Each cached response is keyed by the unit-normalised embedding of the
+question that produced it, inside a *scope* (page id + agent). A lookup
+embeds the new question and returns the closest cached answer in the same
+scope when its cosine similarity reaches ``CHAT_SEMANTIC_CACHE_THRESHOLD``.
+
+Entries expire after ``ttl`` seconds, the least recently used ones are
+evicted beyond ``max_entries``, and everything is dropped when the
+``version_fn`` fingerprint of the knowledge base changes.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("CHAT_SEMANTIC_CACHE", "true").lower() in {"true", "1", "yes"}
+SEMANTIC_THRESHOLD = float(os.getenv("CHAT_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("CHAT_SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+_VERSION_CHECK_SECONDS = 5.0
+
+
+@dataclass
+class _Entry:
+    scope: str
+    vector: np.ndarray
+    response: Dict[str, Any]
+    created_at: float
+    cost_ms: float  # time it took to build the response originally
+    hits: int = 0
+
+
+class SemanticResponseCache:
+    def __init__(
+        self,
+        *,
+        ttl: float,
+        threshold: float = SEMANTIC_THRESHOLD,
+        max_entries: int = SEMANTIC_MAX_ENTRIES,
+        version_fn: Optional[Callable[[], Hashable]] = None,
+    ):
+        self.ttl = ttl
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self._version_fn = version_fn
+        self._version: Hashable = None
+        self._version_checked_at = 0.0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()  # LRU order, oldest first
+        self._scopes: Dict[str, Tuple[List[int], Optional[np.ndarray]]] = {}  # scope -> (ids, stacked vectors)
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.latency_saved_ms = 0.0
+        self._lookup_ms = 0.0
+
+    # ── internal bookkeeping ─────────────────────────────────────
+    def _drop_locked(self, entry_ids: Iterable[int]) -> None:
+        touched = set()
+        for entry_id in entry_ids:
+            entry = self._entries.pop(entry_id, None)
+            if entry is not None:
+                touched.add(entry.scope)
+        for scope in touched:
+            self._scopes.pop(scope, None)
+
+    def _scope_matrix_locked(self, scope: str) -> Tuple[List[int], Optional[np.ndarray]]:
+        cached = self._scopes.get(scope)
+        if cached is None:
+            ids = [entry_id for entry_id, entry in self._entries.items() if entry.scope == scope]
+            matrix = np.stack([self._entries[entry_id].vector for entry_id in ids]) if ids else None
+            cached = self._scopes[scope] = (ids, matrix)
+        return cached
+
+    def _check_version(self) -> None:
+        if self._version_fn is None:
+            return
+        now = time.time()
+        if now - self._version_checked_at < _VERSION_CHECK_SECONDS:
+            return
+        self._version_checked_at = now
+        try:
+            version = self._version_fn()
+        except Exception as exc:
+            logger.debug("Knowledge base fingerprint unavailable: %s", exc)
+            return
+        if version != self._version:
+            if self._version is not None:
+                self.invalidate()
+            self._version = version
+
+    @staticmethod
+    def _unit(vector: Iterable[float]) -> Optional[np.ndarray]:
+        vec = np.asarray(list(vector), dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else None
+
+    # ── public API ───────────────────────────────────────────────
+    def lookup(
+        self, vector: Iterable[float], scope: str, overhead_ms: float = 0.0
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Closest cached response in ``scope`` and its similarity, or None.
+
+        ``overhead_ms`` (e.g. the time spent embedding the question) is
+        subtracted from the latency a hit saves.
+        """
+        started = time.perf_counter()
+        self._check_version()
+        vec = self._unit(vector)
+        result = None
+        saved_ms = 0.0
+        with self._lock:
+            self.lookups += 1
+            ids, matrix = self._scope_matrix_locked(scope)
+            if vec is not None and matrix is not None and matrix.shape[1] == vec.shape[0]:
+                similarities = matrix @ vec
+                now = time.time()
+                expired_rows = [
+                    row for row, entry_id in enumerate(ids) if now - self._entries[entry_id].created_at > self.ttl
+                ]
+                if expired_rows:
+                    self.expirations += len(expired_rows)
+                    similarities[expired_rows] = -1.0
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    entry = self._entries[ids[best]]
+                    self._entries.move_to_end(ids[best])
+                    entry.hits += 1
+                    self.hits += 1
+                    saved_ms = entry.cost_ms
+                    result = (dict(entry.response), float(similarities[best]))
+                self._drop_locked([ids[row] for row in expired_rows])
+            elapsed_ms = (time.perf_counter() - started) * 1000 + overhead_ms
+            self._lookup_ms += elapsed_ms
+            if result is not None:
+                self.latency_saved_ms += saved_ms - elapsed_ms
+        return result
+
+    def store(
+        self,
+        vector: Iterable[float],
+        scope: str,
+        response: Dict[str, Any],
+        cost_ms: float = 0.0,
+    ) -> None:
+        vec = self._unit(vector)
+        if vec is None:
+            return
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(scope, vec, dict(response), time.time(), cost_ms)
+            self._scopes.pop(scope, None)
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self.evictions += overflow
+                self._drop_locked(list(self._entries)[:overflow])
+
+    def invalidate(self) -> None:
+        """Drop every entry (the knowledge base changed)."""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = len(self._entries)
+            scopes = len({entry.scope for entry in self._entries.values()})
+        return {
+            "entries": entries,
+            "scopes": scopes,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved_ms, 1),
+            "avg_lookup_ms": round(self._lookup_ms / self.lookups, 2) if self.lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+__all__ = ["SEMANTIC_CACHE_ENABLED", "SemanticResponseCache"]
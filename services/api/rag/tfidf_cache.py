@@ -0,0 +1,167 @@
+"""Incrementally maintained TF-IDF index for the chat fallback retriever.
+
+Documents come from *sources* (a file, or a static list) identified by a key
+and a cheap signature such as ``(mtime, size)``. Each source is hashed into
+its own block of term counts with a stateless ``HashingVectorizer``, so a
+changed file only re-reads and re-hashes that file; there is no vocabulary to
+refit. IDF weights are recomputed from the stacked blocks' column counts,
+which is linear in the non-zeros.
+
+Signatures are checked at most every ``check_interval`` seconds, on a
+background thread; the previous snapshot keeps serving while a rebuild runs.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2**18
+
+
+@dataclass
+class TfidfSource:
+    key: str
+    signature: Hashable  # unchanged signature -> the cached block is reused
+    load: Callable[[], List[Dict[str, Any]]]  # documents with at least a "text" field
+
+
+@dataclass
+class _Block:
+    signature: Hashable
+    docs: List[Dict[str, Any]]
+    counts: sp.csr_matrix
+
+
+@dataclass
+class _Snapshot:
+    matrix: Optional[sp.csr_matrix]  # l2-normalised TF-IDF rows
+    idf: Optional[np.ndarray]
+    docs: List[Dict[str, Any]] = field(default_factory=list)
+    built_at: float = 0.0
+
+
+class IncrementalTfidfIndex:
+    def __init__(
+        self,
+        list_sources: Callable[[], List[TfidfSource]],
+        *,
+        check_interval: float = 60.0,
+        n_features: int = N_FEATURES,
+    ):
+        self._list_sources = list_sources
+        self.check_interval = check_interval
+        self._vectorizer = HashingVectorizer(
+            stop_words="english", alternate_sign=False, norm=None, n_features=n_features
+        )
+        self._blocks: Dict[str, _Block] = {}
+        self._snapshot: Optional[_Snapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()  # one refresh at a time
+        self.rebuilds = 0
+        self.last_refresh_seconds = 0.0
+
+    # ── building ─────────────────────────────────────────────────
+    def refresh(self) -> bool:
+        """Re-hash changed sources and publish a new snapshot; returns whether anything changed."""
+        with self._lock:
+            started = time.perf_counter()
+            self._checked_at = time.time()
+            sources = self._list_sources()
+            changed = self._snapshot is None or {source.key for source in sources} != set(self._blocks)
+            blocks: Dict[str, _Block] = {}
+            for source in sources:
+                block = self._blocks.get(source.key)
+                if block is None or block.signature != source.signature:
+                    changed = True
+                    try:
+                        docs = [doc for doc in source.load() if doc.get("text")]
+                    except Exception as exc:
+                        logger.warning("Failed to load TF-IDF source %s: %s", source.key, exc)
+                        continue
+                    counts = self._vectorizer.transform([doc["text"] for doc in docs]) if docs else None
+                    block = _Block(source.signature, docs, counts)
+                blocks[source.key] = block
+            if not changed:
+                return False
+            self._blocks = blocks
+            self._snapshot = self._build_snapshot(list(blocks.values()))
+            self.rebuilds += 1
+            self.last_refresh_seconds = time.perf_counter() - started
+            logger.debug(
+                "TF-IDF index rebuilt: %d docs from %d sources in %.2fs",
+                len(self._snapshot.docs),
+                len(blocks),
+                self.last_refresh_seconds,
+            )
+            return True
+
+    @staticmethod
+    def _build_snapshot(blocks: List[_Block]) -> _Snapshot:
+        parts = [block for block in blocks if block.counts is not None]
+        if not parts:
+            return _Snapshot(matrix=None, idf=None, built_at=time.time())
+        counts = sp.vstack([block.counts for block in parts], format="csr")
+        n_docs = counts.shape[0]
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        # Same smoothing as TfidfVectorizer(smooth_idf=True).
+        idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+        matrix = normalize(counts @ sp.diags(idf, format="csr"))
+        docs = [doc for block in parts for doc in block.docs]
+        return _Snapshot(matrix=matrix.tocsr(), idf=idf, docs=docs, built_at=time.time())
+
+    def warm(self) -> None:
+        """Build the first snapshot off the request path."""
+        self._refresh_in_background()
+
+    def _refresh_in_background(self) -> None:
+        def _run() -> None:
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.warning("TF-IDF background refresh failed: %s", exc)
+
+        threading.Thread(target=_run, name="tfidf-refresh", daemon=True).start()
+
+    def snapshot(self) -> _Snapshot:
+        """Current snapshot; builds synchronously only on first use."""
+        if self._snapshot is None:
+            self.refresh()
+        elif time.time() - self._checked_at > self.check_interval and not self._lock.locked():
+            self._checked_at = time.time()
+            self._refresh_in_background()
+        return self._snapshot
+
+    # ── querying ─────────────────────────────────────────────────
+    def search(self, query: str, top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+        snap = self.snapshot()
+        if snap.matrix is None or not query:
+            return []
+        q_vec = normalize(self._vectorizer.transform([query]) @ sp.diags(snap.idf, format="csr"))
+        scores = (snap.matrix @ q_vec.T).toarray().ravel()
+        if not scores.size:
+            return []
+        top = np.argsort(scores)[::-1][:top_k]
+        return [(float(scores[row]), snap.docs[row]) for row in top if scores[row] > 0]
+
+    def stats(self) -> Dict[str, Any]:
+        snap = self._snapshot
+        return {
+            "docs": len(snap.docs) if snap else 0,
+            "sources": len(self._blocks),
+            "rebuilds": self.rebuilds,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 3),
+            "built_at": snap.built_at if snap else None,
+        }
+
+
+__all__ = ["IncrementalTfidfIndex", "TfidfSource"]
@@ -1,9 +1,15 @@
 """Shared helpers for chatbot RAG ingestion."""
 from __future__ import annotations
 
+import hashlib
 from typing import List
 
 
+def content_id(source: str, text: str) -> str:
+    """Stable id for a chunk: same source + same text -> same id."""
+    return hashlib.sha1(f"{source}\x1f{text}".encode("utf-8")).hexdigest()[:24]
+
+
 def chunk_text(text: str, chunk_size: int, overlap: int) -> List[str]:
     """Return overlapping text chunks for embedding."""
     if chunk_size <= 0:
@@ -34,4 +40,4 @@ def select_device() -> str:
         return "cpu"
 
 
-__all__ = ["chunk_text", "select_device"]
+__all__ = ["chunk_text", "content_id", "select_device"]
@@ -0,0 +1,334 @@
+"""Event-driven ingest of new agent CSV outputs, running inside the API process.
+
+Linux inotify watches ``.tmp_runs``, ``exports`` and ``agents/*/output``
+(recursively). CSV writes are debounced for ``RAG_WATCHER_DEBOUNCE`` seconds,
+then handed to a bounded queue drained by one ingest thread that shares the
+process's encoder. Where inotify is unavailable the watcher falls back to an
+mtime scan every ``RAG_WATCHER_POLL`` seconds.
+"""
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import queue
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+WATCHER_ENABLED = os.getenv("RAG_WATCHER_ENABLED", "true").lower() in {"true", "1", "yes"}
+DEBOUNCE_SECONDS = float(os.getenv("RAG_WATCHER_DEBOUNCE", "2.0"))
+QUEUE_SIZE = int(os.getenv("RAG_WATCHER_QUEUE", "256"))
+POLL_SECONDS = float(os.getenv("RAG_WATCHER_POLL", "30"))
+_RESCAN_SECONDS = 60.0  # pick up watch roots created after startup
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+
+def default_watch_roots() -> List[Path]:
+    roots = [
+        PROJECT_ROOT / ".tmp_runs",
+        PROJECT_ROOT / "services" / "ui" / ".tmp_runs",
+        PROJECT_ROOT / "services" / "ui" / "exports",
+        PROJECT_ROOT / "anti-fraud-kyc-agent" / ".tmp_runs",
+    ]
+    agents_root = PROJECT_ROOT / "agents"
+    if agents_root.exists():
+        roots.extend(sorted(path / "output" for path in agents_root.iterdir() if path.is_dir()))
+    return roots
+
+
+class _Inotify:
+    """Minimal ctypes binding of inotify(7)."""
+
+    def __init__(self) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths: Dict[int, Path] = {}
+
+    def add_watch(self, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), _WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        self.paths[wd] = path
+
+    def read(self, timeout: float) -> List[tuple]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if mask & _IN_IGNORED:
+                self.paths.pop(wd, None)
+                continue
+            events.append((self.paths.get(wd), mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class RagWatcher:
+    def __init__(
+        self,
+        roots: Optional[List[Path]] = None,
+        *,
+        debounce: float = DEBOUNCE_SECONDS,
+        queue_size: int = QUEUE_SIZE,
+        poll_seconds: float = POLL_SECONDS,
+    ):
+        self.roots = [Path(root) for root in (roots or default_watch_roots())]
+        self.debounce = debounce
+        self.poll_seconds = poll_seconds
+        self.queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max(1, queue_size))
+        self._pending: Dict[Path, float] = {}  # path -> first event time of the current burst
+        self._last_event: Dict[Path, float] = {}
+        self._queued: Set[Path] = set()
+        self._watched: Set[Path] = set()
+        self._mtimes: Dict[Path, float] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._inotify: Optional[_Inotify] = None
+        self.backend = "stopped"
+        self.events = 0
+        self.enqueued = 0
+        self.deferred = 0
+        self.ingested_files = 0
+        self.ingested_rows = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._latency_total = 0.0
+
+    # ── lifecycle ────────────────────────────────────────────────
+    def start(self) -> None:
+        if self._threads:
+            return
+        try:
+            self._inotify = _Inotify()
+            self.backend = "inotify"
+        except Exception as exc:
+            logger.info("inotify unavailable (%s); RAG watcher falls back to polling", exc)
+            self._inotify = None
+            self.backend = "poll"
+        watch = self._watch_loop if self._inotify is not None else self._poll_loop
+        for target, name in ((watch, "rag-watch"), (self._ingest_loop, "rag-watch-ingest")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("RAG watcher started (%s) on %d roots", self.backend, len(self.roots))
+
+    def stop(self) -> None:
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self.backend = "stopped"
+
+    # ── event sources ────────────────────────────────────────────
+    def _add_tree(self, root: Path, *, initial: bool) -> None:
+        for dirpath, _, filenames in os.walk(root):
+            directory = Path(dirpath)
+            if directory not in self._watched:
+                try:
+                    self._inotify.add_watch(directory)
+                    self._watched.add(directory)
+                except OSError as exc:
+                    logger.debug("Cannot watch %s: %s", directory, exc)
+                    continue
+                if not initial:
+                    # Files may have landed before the watch existed.
+                    for name in filenames:
+                        self._note(directory / name)
+
+    def _watch_loop(self) -> None:
+        last_rescan = 0.0
+        started = False
+        while not self._stop.is_set():
+            now = time.time()
+            if now - last_rescan >= _RESCAN_SECONDS:
+                live = set(self._inotify.paths.values())
+                self._watched &= live
+                for root in self.roots:
+                    if root.is_dir() and root not in self._watched:
+                        # A root that appears after startup is new: ingest what it already holds.
+                        self._add_tree(root, initial=not started)
+                started = True
+                last_rescan = now
+            for directory, mask, name in self._inotify.read(timeout=min(self.debounce, 1.0) or 0.5):
+                if mask & _IN_Q_OVERFLOW:
+                    logger.warning("inotify event queue overflowed; some CSV writes were missed")
+                    continue
+                if directory is None:
+                    continue
+                path = directory / name
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        self._add_tree(path, initial=False)
+                    continue
+                if mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                    self._note(path)
+            self._flush_debounced()
+
+    def _poll_loop(self) -> None:
+        first = True
+        while not self._stop.is_set():
+            for root in self.roots:
+                if not root.is_dir():
+                    continue
+                for path in root.rglob("*.csv"):
+                    try:
+                        mtime = path.stat().st_mtime
+                    except OSError:
+                        continue
+                    if self._mtimes.get(path) != mtime:
+                        self._mtimes[path] = mtime
+                        if not first:
+                            self._note(path)
+            first = False
+            deadline = time.time() + self.poll_seconds
+            while time.time() < deadline and not self._stop.is_set():
+                self._flush_debounced()
+                self._stop.wait(min(self.debounce, 1.0) or 0.5)
+
+    # ── debounce + queue ─────────────────────────────────────────
+    def _note(self, path: Path) -> None:
+        if path.suffix.lower() != ".csv":
+            return
+        now = time.time()
+        with self._lock:
+            self.events += 1
+            self._pending.setdefault(path, now)
+            self._last_event[path] = now
+
+    def _flush_debounced(self) -> None:
+        now = time.time()
+        with self._lock:
+            ready = [path for path, last in self._last_event.items() if now - last >= self.debounce]
+            for path in ready:
+                if path in self._queued:
+                    # Already waiting for ingest; that run will read the latest content.
+                    self._pending.pop(path, None)
+                    self._last_event.pop(path, None)
+                    continue
+                try:
+                    self.queue.put_nowait((path, self._pending[path]))
+                except queue.Full:
+                    # Keep it pending and retry on the next flush instead of dropping it.
+                    self.deferred += 1
+                    continue
+                self._queued.add(path)
+                self.enqueued += 1
+                self._pending.pop(path, None)
+                self._last_event.pop(path, None)
+
+    # ── ingest worker ────────────────────────────────────────────
+    def _ingest_loop(self) -> None:
+        ingestor = None
+        while not self._stop.is_set():
+            try:
+                path, first_seen = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self._lock:
+                self._queued.discard(path)
+            try:
+                if ingestor is None:
+                    from .ingest import get_ingestor
+
+                    ingestor = get_ingestor()
+                if path.exists():
+                    _, rows = ingestor.ingest_files([path])
+                    self.ingested_files += 1
+                    self.ingested_rows += rows
+                    self._latency_total += time.time() - first_seen
+            except Exception as exc:
+                self.failures += 1
+                self.last_error = f"{path}: {exc}"
+                logger.warning("RAG watcher failed to ingest %s: %s", path, exc)
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._last_event)
+        return {
+            "backend": self.backend,
+            "roots": [str(root) for root in self.roots],
+            "watched_dirs": len(self._watched) if self.backend == "inotify" else None,
+            "debounce_seconds": self.debounce,
+            "events": self.events,
+            "pending_debounce": pending,
+            "queue_depth": self.queue.qsize(),
+            "queue_max": self.queue.maxsize,
+            "enqueued": self.enqueued,
+            "deferred_queue_full": self.deferred,
+            "ingested_files": self.ingested_files,
+            "ingested_rows": self.ingested_rows,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "avg_event_to_ingest_seconds": (
+                round(self._latency_total / self.ingested_files, 2) if self.ingested_files else 0.0
+            ),
+        }
+
+
+_WATCHER: Optional[RagWatcher] = None
+_WATCHER_LOCK = threading.Lock()
+
+
+def start_rag_watcher(roots: Optional[List[Path]] = None) -> Optional[RagWatcher]:
+    """Start the process-wide watcher once (no-op when ``RAG_WATCHER_ENABLED`` is off)."""
+    global _WATCHER
+    if not WATCHER_ENABLED:
+        return None
+    with _WATCHER_LOCK:
+        if _WATCHER is None:
+            _WATCHER = RagWatcher(roots)
+            _WATCHER.start()
+    return _WATCHER
+
+
+def stop_rag_watcher() -> None:
+    global _WATCHER
+    with _WATCHER_LOCK:
+        if _WATCHER is not None:
+            _WATCHER.stop()
+            _WATCHER = None
+
+
+def watcher_stats() -> Dict[str, Any]:
+    if _WATCHER is None:
+        return {"backend": "disabled" if not WATCHER_ENABLED else "stopped"}
+    return _WATCHER.stats()
+
+
+__all__ = ["RagWatcher", "default_watch_roots", "start_rag_watcher", "stop_rag_watcher", "watcher_stats"]
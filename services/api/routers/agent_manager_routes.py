@@ -11,6 +11,7 @@ import logging
 import time
 from typing import Any, Dict, Optional
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 
 from services.api.agent_manager import get_agent_manager
@@ -81,8 +82,9 @@ async def run_agent(request: AgentRunRequest = Body(...)):
             f"payload_keys={list(request.payload.keys())}"
         )
         
-        # Execute task
-        result = manager.run(
+        # Execute task (model inference and LLM calls block; keep them off the event loop)
+        result = await run_in_threadpool(
+            manager.run,
             task=request.task,
             engine=request.engine,
             **request.payload
@@ -5,6 +5,8 @@ from typing import Dict, Any, Optional
 import pandas as pd
 import io, json, uuid, os
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timezone
 
@@ -115,6 +117,31 @@ RUNS_DIR = Path(__file__).resolve().parent.parent / ".runs"
 RUNS_DIR.mkdir(parents=True, exist_ok=True)
 
 
+# Run CSVs are ingested one at a time by a single background worker; at most
+# RAG_AUTO_INGEST_MAX_PENDING runs wait behind it, further ones are skipped.
+AUTO_INGEST_MAX_PENDING = int(os.getenv("RAG_AUTO_INGEST_MAX_PENDING", "8"))
+_INGEST_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-ingest")
+_INGEST_SLOTS = threading.BoundedSemaphore(max(AUTO_INGEST_MAX_PENDING, 1))
+
+
+def _auto_ingest_run(csv_path: Path) -> None:
+    try:
+        from services.api.rag.ingest import get_ingestor
+        get_ingestor().ingest_files([csv_path], dry_run=False)
+        logger.info(f"Auto-ingested {csv_path} into RAG store")
+    except Exception as e:
+        logger.warning(f"Failed to auto-ingest CSV into RAG: {e}")
+    finally:
+        _INGEST_SLOTS.release()
+
+
+def _queue_auto_ingest(csv_path: Path) -> None:
+    if not _INGEST_SLOTS.acquire(blocking=False):
+        logger.warning(f"RAG auto-ingest queue full, skipping {csv_path}")
+        return
+    _INGEST_POOL.submit(_auto_ingest_run, csv_path)
+
+
 def _cleanup_old_csv_runs(runs_dir: Path, agent_id: str, keep_last_n: int = 10):
     """Keep only the last N CSV files per agent, delete older ones."""
     if not runs_dir.exists():
@@ -276,14 +303,9 @@ async def run_agent(
     out_df.to_csv(csv_path, index=False)
     out_df.to_json(json_path, orient="records")
 
-    # Auto-ingest CSV into RAG store after each run
-    try:
-        from services.api.rag.ingest import LocalIngestor
-        ingestor = LocalIngestor()
-        ingestor.ingest_files([csv_path], max_rows=200, dry_run=False)
-        logger.info(f"Auto-ingested {csv_path} into RAG store")
-    except Exception as e:
-        logger.warning(f"Failed to auto-ingest CSV into RAG: {e}")
+    # Auto-ingest the full CSV into the RAG store after each run. Streaming ingest of
+    # large outputs takes a while, so it runs off the request thread.
+    _queue_auto_ingest(csv_path)
 
     # Cleanup: Keep only last 10 CSV runs per agent
     try:
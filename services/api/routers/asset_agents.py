@@ -79,14 +79,12 @@ async def run_asset_agent(request: Request, file: UploadFile | None = File(None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to persist merged.csv: {e}")
 
-    # Auto-ingest CSV into RAG store after each run
+    # Auto-ingest the full CSV into the RAG store through the shared, bounded agent-run queue
     try:
-        from services.api.rag.ingest import LocalIngestor
-        ingestor = LocalIngestor()
-        ingestor.ingest_files([Path(merged_path)], max_rows=200, dry_run=False)
-        logger.info(f"Auto-ingested {merged_path} into RAG store")
+        from services.api.routers.agents import _queue_auto_ingest
+        _queue_auto_ingest(Path(merged_path))
     except Exception as e:
-        logger.warning(f"Failed to auto-ingest CSV into RAG: {e}")
+        logger.warning(f"Failed to queue CSV for RAG auto-ingest: {e}")
 
     # Cleanup: Keep only last 10 CSV runs per agent
     try:
@@ -8,21 +8,29 @@ import tempfile
 import hashlib
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 from collections import deque
-
-import requests
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-from services.api.rag.embeddings import embed_texts, embeddings_available
-from services.api.rag.local_store import LocalVectorStore
-from services.api.rag.ingest import LocalIngestor
+from services.api.rag.bm25 import ensure_lexical_index
+from services.api.rag.embeddings import embeddings_available
+from services.api.rag.embed_batcher import embed_query
+from services.api.rag.local_store import get_local_store
+from services.api.rag.ingest import get_ingestor
+from services.api.rag.row_text import HIGHLIGHT_COLUMNS, render_row_texts, render_rows
+from services.api.rag.semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticResponseCache
+from services.api.rag.tfidf_cache import IncrementalTfidfIndex, TfidfSource
+from services.api.llm.http_pool import LLMClientError, LLMTimeoutError, llm_client
 from services.api.middleware.logging_middleware import add_log_entry
+from services.api.utils.response_cache import response_cache
+from services.api.utils.sse import SSE_HEADERS, sse_event
 
 # Try to import optional modules
 try:
@@ -65,13 +73,14 @@ CSV_SOURCE_DIRS = [
 ]
 CSV_MAX_FILES = int(os.getenv("CHAT_CSV_MAX_FILES", "6"))
 CSV_MAX_ROWS = int(os.getenv("CHAT_CSV_MAX_ROWS", "200"))
-VECTOR_CACHE_TTL = int(os.getenv("CHAT_RAG_REFRESH_SECONDS", "60"))
+VECTOR_CACHE_TTL = int(os.getenv("CHAT_RAG_REFRESH_SECONDS", "60"))  # how often source mtimes are checked
 RESPONSE_CACHE_TTL = int(os.getenv("CHAT_RESPONSE_CACHE_SECONDS", "300"))  # 5 minutes
 RAG_QUALITY_THRESHOLD = float(os.getenv("CHAT_RAG_THRESHOLD", "0.35"))  # Updated from 0.3 to 0.35
+POLICY_BOOST = float(os.getenv("CHAT_POLICY_BOOST", "1.25"))  # score multiplier for policy-namespace hits
 MAX_CONVERSATION_HISTORY = int(os.getenv("CHAT_MAX_HISTORY", "10"))  # Last 10 turns
 
-# Response cache: {question_hash: (response, timestamp)}
-_response_cache: Dict[str, Tuple[Dict[str, Any], float]] = {}
+# Response cache keyed by question hash; shared by all workers with the SQLite backend
+_RESPONSE_CACHE = response_cache("chat")
 STATIC_SNIPPETS = [
     {
         "id": "fraud_flow",
@@ -110,6 +119,9 @@ RAG_TOP_K = int(os.getenv("CHAT_RAG_TOP_K", "5"))  # Increased from 3 to 5 for b
 USE_CHROMADB = os.getenv("USE_CHROMADB", "true").lower() in {"true", "1", "yes"}
 USE_RERANKING = os.getenv("USE_RERANKING", "true").lower() in {"true", "1", "yes"}
 RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "3"))  # After reranking, return top 3
+# Hybrid retrieval: BM25 over the same chunks, fused with dense hits by reciprocal rank.
+USE_HYBRID = os.getenv("CHAT_HYBRID_RETRIEVAL", "true").lower() in {"true", "1", "yes"}
+RRF_K = int(os.getenv("CHAT_RRF_K", "60"))
 
 _store_env = os.getenv("LOCAL_RAG_STORE")
 
@@ -136,9 +148,9 @@ if USE_CHROMADB and CHROMADB_AVAILABLE:
         logger.info("Using ChromaDB vector store with metadata filtering support")
     except Exception as exc:
         logger.warning(f"ChromaDB initialization failed, falling back to LocalVectorStore: {exc}")
-        LOCAL_STORE = LocalVectorStore(Path(_store_env) if _store_env else None)
+        LOCAL_STORE = get_local_store(Path(_store_env) if _store_env else None)
 else:
-    LOCAL_STORE = LocalVectorStore(Path(_store_env) if _store_env else None)
+    LOCAL_STORE = get_local_store(Path(_store_env) if _store_env else None)
     if USE_CHROMADB:
         logger.info("ChromaDB not available, using LocalVectorStore. Install chromadb for metadata filtering.")
 
@@ -149,11 +161,15 @@ if seed_policy_documents:
     except Exception as exc:
         logger.warning(f"Failed to seed policy documents: {exc}")
 
-_VECTOR_CACHE: Dict[str, Any] = {"built_at": 0.0, "vectorizer": None, "matrix": None, "docs": []}
+# Chunks stored before the BM25 index existed are indexed in the background.
+ensure_lexical_index(LOCAL_STORE)
+_RETRIEVAL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="chat-retrieval")
 
 OLLAMA_URL = _normalize_base(os.getenv("OLLAMA_URL", "http://localhost:11434"))
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "phi3:latest")  # Default to phi3:latest - better instruction following
 USE_OLLAMA = os.getenv("CHAT_USE_OLLAMA", "1") not in {"0", "false", "False"}
+# Lower temp (0.1) for precision, larger context (6000) for banking docs
+LLM_OPTIONS = {"temperature": 0.1, "top_p": 0.9, "num_predict": 6000, "num_ctx": 6000}
 USE_GEMMA_FALLBACK = os.getenv("CHAT_USE_GEMMA_FALLBACK", "1") not in {"0", "false", "False"}
 
 # Recommended models in priority order (smaller/faster models first for CPU)
@@ -189,45 +205,46 @@ class ChatResponse(BaseModel):
     source_type: Optional[str] = Field(default=None, description="Source: rag, general_knowledge, cached")
 
 
-def _load_documents() -> List[Dict[str, Any]]:
-    docs: List[Dict[str, Any]] = []
-    for snippet in STATIC_SNIPPETS:
-        docs.append(snippet)
+def _load_text_document(path: Path) -> List[Dict[str, Any]]:
+    text = path.read_text(encoding="utf-8")
+    return [{"id": path.name, "title": path.name.replace("_", " "), "text": text}]
 
-    for path in RAG_DOC_PATHS:
-        if not path.exists():
-            continue
-        try:
-            text = path.read_text(encoding="utf-8")
-            docs.append(
-                {
-                    "id": path.name,
-                    "title": path.name.replace("_", " "),
-                    "text": text,
-                }
-            )
-        except Exception as exc:
-            logger.warning("Failed to read %s: %s", path, exc)
-
-    docs.extend(_load_csv_documents())
-    return docs
-
-
-def _load_csv_documents() -> List[Dict[str, Any]]:
-    csv_docs: List[Dict[str, Any]] = []
-    highlight_cols = [
-        "application_id",
-        "decision",
-        "score",
-        "reason",
-        "pd",
-        "ltv",
-        "dti",
-        "stage",
-        "status",
+
+def _load_csv_document(path: Path) -> List[Dict[str, Any]]:
+    df = pd.read_csv(path, nrows=CSV_MAX_ROWS)
+    if df.empty:
+        return []
+    texts, highlight_rows = render_rows(df, HIGHLIGHT_COLUMNS)
+    return [
+        {
+            "id": f"{path.stem}-{idx}",
+            "title": f"{path.stem} row {idx + 1}",
+            "text": text,
+            "source": str(path),
+            "meta": highlights,
+        }
+        for idx, (text, highlights) in enumerate(zip(texts, highlight_rows))
+        if text
     ]
+
+
+def _file_source(path: Path, loader) -> Optional[TfidfSource]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return TfidfSource(str(path), (stat.st_mtime, stat.st_size), lambda: loader(path))
+
+
+def _tfidf_sources() -> List[TfidfSource]:
+    """Fallback corpus: static snippets, the RAG docs and the newest CSVs per source dir."""
+    sources: List[TfidfSource] = [TfidfSource("static", len(STATIC_SNIPPETS), lambda: list(STATIC_SNIPPETS))]
+    for path in RAG_DOC_PATHS:
+        source = _file_source(path, _load_text_document)
+        if source:
+            sources.append(source)
     for directory in CSV_SOURCE_DIRS:
-        if not directory.exists() or not directory.is_dir():
+        if not directory.is_dir():
             continue
         try:
             candidates = sorted(
@@ -239,62 +256,35 @@ def _load_csv_documents() -> List[Dict[str, Any]]:
             logger.warning("Failed to enumerate csv dir %s: %s", directory, exc)
             continue
         for path in candidates:
-            try:
-                df = pd.read_csv(path)
-            except Exception as exc:
-                logger.warning("Failed to read csv %s: %s", path, exc)
-                continue
-            if df.empty:
-                continue
-            subset = df.head(CSV_MAX_ROWS)
-            for idx, (_, row) in enumerate(subset.iterrows()):
-                kv_pairs = []
-                highlights = {}
-                for col, value in row.items():
-                    if pd.isna(value):
-                        continue
-                    text_value = str(value)
-                    kv_pairs.append(f"{col}={text_value}")
-                    if col in highlight_cols and col not in highlights:
-                        highlights[col] = text_value
-                if not kv_pairs:
-                    continue
-                csv_docs.append(
-                    {
-                        "id": f"{path.stem}-{idx}",
-                        "title": f"{path.stem} row {idx + 1}",
-                        "text": "; ".join(kv_pairs),
-                        "source": str(path),
-                        "meta": highlights,
-                    }
-                )
-    return csv_docs
-
-
-def _build_vector_store() -> Tuple[Optional[TfidfVectorizer], Optional[Any], List[Dict[str, Any]]]:
-    docs = _load_documents()
-    if not docs:
-        return None, None, []
-    texts = [doc["text"] for doc in docs]
-    vectorizer = TfidfVectorizer(stop_words="english")
-    matrix = vectorizer.fit_transform(texts)
-    return vectorizer, matrix, docs
-
-
-def _get_vector_store() -> Tuple[Optional[TfidfVectorizer], Optional[Any], List[Dict[str, Any]]]:
-    now = time.time()
-    global _VECTOR_CACHE
-    built_at = _VECTOR_CACHE.get("built_at", 0.0)
-    vectorizer = _VECTOR_CACHE.get("vectorizer")
-    if not vectorizer or (now - built_at) > VECTOR_CACHE_TTL:
-        vectorizer, matrix, docs = _build_vector_store()
-        _VECTOR_CACHE = {
-            "built_at": now,
-            "vectorizer": vectorizer,
-            "matrix": matrix,
-            "docs": docs,
-        }
-    return _VECTOR_CACHE["vectorizer"], _VECTOR_CACHE["matrix"], _VECTOR_CACHE["docs"]
+            source = _file_source(path, _load_csv_document)
+            if source:
+                sources.append(source)
+    return sources
+
+
+# Only sources whose mtime/size changed are re-read; rebuilds run off the request path.
+_TFIDF_INDEX = IncrementalTfidfIndex(_tfidf_sources, check_interval=VECTOR_CACHE_TTL)
+_TFIDF_INDEX.warm()
+
+
+def _knowledge_version() -> Tuple[Any, ...]:
+    """Cheap fingerprint of what /v1/chat answers from; a change empties the semantic cache.
+
+    The store's write generation moves on every add, delete and compaction
+    (in any worker), unlike its row count, which an upsert that replaces
+    rows leaves unchanged.
+    """
+    return LOCAL_STORE.version(), _TFIDF_INDEX.stats()["built_at"]
+
+
+# Paraphrased questions ("what is DTI" / "define DTI") reuse the nearest cached answer.
+_SEMANTIC_CACHE = (
+    SemanticResponseCache(ttl=RESPONSE_CACHE_TTL, version_fn=_knowledge_version) if SEMANTIC_CACHE_ENABLED else None
+)
+
+
+def _semantic_scope(payload: ChatRequest) -> str:
+    return f"{payload.page_id}|{getattr(payload, 'agent_id', None) or ''}"
 
 
 def _infer_mode(page_id: str, context: Dict[str, Any]) -> str:
@@ -354,7 +344,7 @@ def _retrieve_store_docs(question: str, context: Dict[str, Any]) -> List[Dict[st
     query = f"{question}\n{ctx_blob}"
     
     try:
-        vector = embed_texts([query])[0]
+        vector = embed_query(query)
     except Exception as exc:
         logger.warning("Failed to embed query for local store: %s", exc)
         return []
@@ -370,36 +360,18 @@ def _retrieve_store_docs(question: str, context: Dict[str, Any]) -> List[Dict[st
     # Query vector store (retrieve more for reranking if enabled)
     retrieve_k = RAG_TOP_K * 2 if USE_RERANKING and reranker_available() else RAG_TOP_K
     
-    # Try to query policies namespace if available, otherwise use general query
-    policy_hits = []
-    general_hits = []
-    
+    # One scoring pass: policy hits (boosted) plus the best hits from every other namespace
+    query_kwargs: Dict[str, Any] = {"boosts": {"policies": POLICY_BOOST}}
     if USE_CHROMADB and CHROMADB_AVAILABLE and isinstance(LOCAL_STORE, ChromaVectorStore):
-        # ChromaDB supports namespace filtering
-        try:
-            policy_hits = LOCAL_STORE.query(vector, top_k=RAG_TOP_K, namespace="policies", filter_dict=filter_dict, score_threshold=RAG_QUALITY_THRESHOLD)
-        except Exception:
-            pass
-        general_hits = LOCAL_STORE.query(
-            vector,
-            top_k=retrieve_k,
-            filter_dict=filter_dict,
-            score_threshold=RAG_QUALITY_THRESHOLD
-        )
-    else:
-        # LocalVectorStore - try namespace if supported
-        try:
-            policy_hits = LOCAL_STORE.query(vector, top_k=RAG_TOP_K, namespace="policies")
-        except Exception:
-            pass
-        general_hits = LOCAL_STORE.query(vector, top_k=retrieve_k)
+        query_kwargs.update(filter_dict=filter_dict, score_threshold=RAG_QUALITY_THRESHOLD)
+    lists = LOCAL_STORE.query_namespaces(vector, {"policies": RAG_TOP_K, None: retrieve_k}, **query_kwargs)
+    policy_hits = lists.get("policies", [])
     
-    # Merge policy and general hits with boosting
     merged: Dict[str, Dict[str, Any]] = {}
     
-    def _add_entry(hit: Dict[str, Any], boost: float = 1.0) -> Dict[str, Any]:
+    def _add_entry(hit: Dict[str, Any]) -> Dict[str, Any]:
         entry_id = hit.get("id") or hit.get("title") or hit.get("source") or f"local_doc_{len(merged)}"
-        score = float(hit.get("score") or 0.0) * boost
+        score = float(hit.get("score") or 0.0)
         snippet = hit.get("snippet") or hit.get("text", "")
         record = {
             "id": entry_id,
@@ -414,14 +386,7 @@ def _retrieve_store_docs(question: str, context: Dict[str, Any]) -> List[Dict[st
             merged[entry_id] = record
         return merged[entry_id]
     
-    # Add policy hits with boost
-    for hit in policy_hits:
-        _add_entry(hit, boost=1.25)
-    
-    # Add general hits (skip if already in policies)
-    for hit in general_hits:
-        if hit.get("namespace") == "policies":
-            continue
+    for hit in policy_hits + lists.get(None, []):
         _add_entry(hit)
     
     results = sorted(merged.values(), key=lambda item: item["score"], reverse=True)
@@ -435,45 +400,110 @@ def _retrieve_store_docs(question: str, context: Dict[str, Any]) -> List[Dict[st
         except Exception as exc:
             logger.warning(f"Reranking failed, using original results: {exc}")
     
-    # Ensure top policy is included if available
+    # Ensure top policy is included if available (policy lists come back best-first)
     if policy_hits and not any((entry and entry.get("metadata", {}).get("namespace") == "policies") for entry in results[:RAG_TOP_K]):
-        top_policy = max(
-            (_add_entry(hit, boost=1.25) for hit in policy_hits),
-            key=lambda item: item["score"],
-            default=None,
-        )
-        if top_policy:
-            results = [top_policy] + [item for item in results if item["id"] != top_policy["id"]]
+        top_policy = _add_entry(policy_hits[0])
+        results = [top_policy] + [item for item in results if item["id"] != top_policy["id"]]
     
     # Return top K results
     return results[:RAG_TOP_K]
 
 
+def _retrieve_lexical_docs(question: str, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """BM25 matches from the lexical mirror of the vector store (exact terms, acronyms, ids)."""
+    index = getattr(LOCAL_STORE, "lexical", None)
+    if index is None or not question:
+        return []
+    filter_dict = None
+    if USE_CHROMADB and CHROMADB_AVAILABLE and isinstance(LOCAL_STORE, ChromaVectorStore):
+        agent_type = context.get("agent_type")
+        if agent_type:
+            filter_dict = {"agent_type": str(agent_type)}
+    try:
+        hits = index.search(question, top_k=RAG_TOP_K, filter_dict=filter_dict)
+    except Exception as exc:
+        logger.warning("BM25 retrieval failed: %s", exc)
+        return []
+    return [
+        {
+            "id": hit["id"],
+            "title": hit.get("title") or hit["id"],
+            "score": hit["score"],
+            "snippet": (hit.get("snippet") or "")[:600],
+            "source": hit.get("source"),
+            "metadata": hit,
+        }
+        for hit in hits
+    ]
+
+
+def _fuse_ranked_lists(dense: List[Dict[str, Any]], lexical: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion: sum of 1 / (RRF_K + rank) over the lists a document appears in.
+
+    Dense hits keep their cosine ``score``. BM25 scores are unbounded and not
+    comparable to it, so lexical-only hits get ``score=None`` and carry their
+    match in ``bm25_score``; the fused order lives in ``rrf_score``.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for label, hits in (("dense", dense), ("bm25", lexical)):
+        for rank, hit in enumerate(hits, start=1):
+            entry = fused.get(hit["id"])
+            if entry is None:
+                entry = fused[hit["id"]] = dict(hit)
+                entry["rrf_score"] = 0.0
+                entry["matched_by"] = []
+                if label == "bm25":
+                    entry["score"] = None
+            if label == "bm25":
+                entry["bm25_score"] = float(hit["score"])
+            entry["rrf_score"] += 1.0 / (RRF_K + rank)
+            entry["matched_by"].append(label)
+    return sorted(fused.values(), key=lambda item: item["rrf_score"], reverse=True)
+
+
+def _relevance_label(doc: Dict[str, Any]) -> str:
+    """Human-readable relevance for prompts and source lists (dense score, else BM25 score)."""
+    if doc.get("score") is not None:
+        return f"relevance: {float(doc['score']):.3f}"
+    if doc.get("bm25_score") is not None:
+        return f"keyword match: {float(doc['bm25_score']):.1f}"
+    return "relevance: n/a"
+
+
+def _retrieve_hybrid_docs(question: str, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Dense and BM25 retrieval run concurrently, merged with reciprocal rank fusion."""
+    if not USE_HYBRID or getattr(LOCAL_STORE, "lexical", None) is None:
+        return _retrieve_store_docs(question, context)
+    dense_future = _RETRIEVAL_POOL.submit(_retrieve_store_docs, question, context)
+    lexical_future = _RETRIEVAL_POOL.submit(_retrieve_lexical_docs, question, context)
+    try:
+        dense = dense_future.result()
+    except Exception as exc:
+        logger.warning("Dense retrieval failed: %s", exc)
+        dense = []
+    lexical = lexical_future.result()
+    return _fuse_ranked_lists(dense, lexical)[:RAG_TOP_K]
+
+
 def _retrieve_fallback_docs(question: str, context: Dict[str, Any], top_k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
-    vectorizer, doc_matrix, doc_library = _get_vector_store()
-    if not question or not vectorizer or doc_matrix is None:
+    if not question:
         return []
     ctx_blob = " ".join(f"{k}:{v}" for k, v in context.items() if isinstance(v, (str, int, float)))
     query = f"{question}\n{ctx_blob}"
     try:
-        q_vec = vectorizer.transform([query])
-        scores = cosine_similarity(q_vec, doc_matrix).ravel()
+        matches = _TFIDF_INDEX.search(query, top_k)
     except Exception as exc:
         logger.warning("Vector retrieval failed: %s", exc)
         return []
-    idx = scores.argsort()[::-1][:top_k]
     results: List[Dict[str, Any]] = []
-    for rank in idx:
-        if scores[rank] <= 0:
-            continue
-        doc = doc_library[rank]
+    for rank, (score, doc) in enumerate(matches):
         excerpt = doc["text"].strip().splitlines()
         snippet = " ".join(excerpt[:6])[:600]
         results.append(
             {
                 "id": doc.get("id", f"doc_{rank}"),
                 "title": doc.get("title", doc.get("id", f"Doc {rank+1}")),
-                "score": float(scores[rank]),
+                "score": score,
                 "snippet": snippet,
                 "source": doc.get("source"),
                 "metadata": doc.get("meta", {}),
@@ -672,10 +702,7 @@ def _compose_lightweight_reply(payload: ChatRequest, retrieved: List[Dict[str, A
     if not key_points:
         key_points.append("- No clean text fragments were available even though documents were retrieved. Consider uploading clearer notes or asking for a different angle.")
     
-    source_lines = [
-        f"- {doc.get('title') or doc.get('id')} (score {float(doc.get('score') or 0.0):.2f})"
-        for doc in retrieved[:RAG_TOP_K]
-    ]
+    source_lines = [f"- {doc.get('title') or doc.get('id')} ({_relevance_label(doc)})" for doc in retrieved[:RAG_TOP_K]]
     
     response = f"**Executive Summary:** {summary_sentence}\n\n**Key Points:**\n" + "\n".join(key_points)
     
@@ -685,18 +712,13 @@ def _compose_lightweight_reply(payload: ChatRequest, retrieved: List[Dict[str, A
     return response[:1200] + ("..." if len(response) > 1200 else "")
 
 
-def _maybe_generate_llm_reply(payload: ChatRequest, retrieved: List[Dict[str, Any]], mode: str, model_name: Optional[str] = None, conversation_history: Optional[str] = None, initial_answer: Optional[str] = None) -> Optional[str]:
-    """Generate LLM reply using RAG context. Prioritizes RAG data."""
-    model_to_use = model_name or payload.model or OLLAMA_MODEL
-    if not USE_OLLAMA or not model_to_use or not retrieved:
-        logger.debug("Skipping LLM generation: USE_OLLAMA=%s, model=%s, retrieved=%d", USE_OLLAMA, model_to_use, len(retrieved))
-        return None
-    
+def _build_rag_prompt(payload: ChatRequest, retrieved: List[Dict[str, Any]], mode: str, conversation_history: Optional[str] = None, initial_answer: Optional[str] = None) -> str:
+    """Prompt for a RAG-grounded answer (shared by the blocking and streaming paths)."""
     # Filter and extract meaningful content from snippets
     filtered_retrieved = []
     for doc in retrieved[:5]:
         snippet = (doc.get("snippet") or doc.get("text") or "").strip()
-        score = doc.get("score", 0.0)
+        score = doc.get("score")
         
         # Extract meaningful text even from code snippets
         meaningful_text = _extract_meaningful_text(snippet)
@@ -704,7 +726,8 @@ def _maybe_generate_llm_reply(payload: ChatRequest, retrieved: List[Dict[str, An
             meaningful_text = snippet  # Fallback to original
         
         # Only skip if truly empty or very low relevance
-        if len(meaningful_text) > 30 and score > 0.1:
+        # Lexical-only hits have no dense score; their BM25 match already made them relevant
+        if len(meaningful_text) > 30 and (score is None or score > 0.1):
             # Create a modified doc with extracted text
             modified_doc = dict(doc)
             modified_doc["snippet"] = meaningful_text
@@ -718,7 +741,6 @@ def _maybe_generate_llm_reply(payload: ChatRequest, retrieved: List[Dict[str, An
     for idx, doc in enumerate(docs_to_use, start=1):
         snippet = (doc.get("snippet") or doc.get("text") or "").strip()
         title = doc.get("title") or doc.get("id", f"doc_{idx}")
-        score = doc.get("score", 0.0)
         # Clean up snippet - remove excessive code if present
         snippet_clean = snippet
         if "def " in snippet or "import " in snippet:
@@ -729,7 +751,7 @@ def _maybe_generate_llm_reply(payload: ChatRequest, retrieved: List[Dict[str, An
                 snippet_clean = " ".join(text_lines[:3])  # Reduced from 5 to 3 lines
         # Limit snippet length to reduce prompt size
         snippet_clean = snippet_clean[:400]  # Limit to 400 chars per snippet
-        context_blocks.append(f"[{title} (relevance: {score:.3f})]\n{snippet_clean}")
+        context_blocks.append(f"[{title} ({_relevance_label(doc)})]\n{snippet_clean}")
     
     context_blob = "\n\n".join(context_blocks)
     
@@ -813,45 +835,50 @@ def _maybe_generate_llm_reply(payload: ChatRequest, retrieved: List[Dict[str, An
         f"- **Key Point 3**: Additional details\n"
         f"\n**Answer:**"
     )
+    return f"{system_prompt}\n\n{user_prompt}"
+
+
+async def _maybe_generate_llm_reply(payload: ChatRequest, retrieved: List[Dict[str, Any]], mode: str, model_name: Optional[str] = None, conversation_history: Optional[str] = None, initial_answer: Optional[str] = None) -> Optional[str]:
+    """Generate LLM reply using RAG context. Prioritizes RAG data."""
+    model_to_use = model_name or payload.model or OLLAMA_MODEL
+    if not USE_OLLAMA or not model_to_use or not retrieved:
+        logger.debug("Skipping LLM generation: USE_OLLAMA=%s, model=%s, retrieved=%d", USE_OLLAMA, model_to_use, len(retrieved))
+        return None
+    prompt = _build_rag_prompt(payload, retrieved, mode, conversation_history, initial_answer)
     
     try:
         logger.debug("Calling Ollama LLM: model=%s, question=%s", model_to_use, payload.message[:50])
         # Reduced timeout - Ollama can be slow, but we want fast fallback
-        resp = requests.post(
+        data = await llm_client().post_json(
             f"{OLLAMA_URL.rstrip('/')}/api/generate",
-            json={
+            {
                 "model": model_to_use,
-                "prompt": f"{system_prompt}\n\n{user_prompt}",
+                "prompt": prompt,
                 "stream": False,
-                "options": {"temperature": 0.1, "top_p": 0.9, "num_predict": 6000, "num_ctx": 6000},  # Lower temp (0.1) for precision, larger context (6000) for banking docs
+                "options": LLM_OPTIONS,
             },
             timeout=30,  # Increased timeout to allow model to generate complete answers
         )
-        resp.raise_for_status()
-        data = resp.json()
         text = data.get("response") or data.get("data") or ""
         if isinstance(text, str) and text.strip():
             logger.debug("LLM generated response: %d chars", len(text))
             return text.strip()
         else:
             logger.warning("LLM returned empty response")
-    except requests.exceptions.Timeout:
-        logger.debug("LLM generate timeout after 10s for model %s - using lightweight reply", model_to_use)
-    except requests.exceptions.ConnectionError as exc:
-        logger.error("LLM connection error: %s - Is Ollama running at %s?", exc, OLLAMA_URL)
-    except requests.exceptions.HTTPError as exc:
-        logger.error("LLM HTTP error %d: %s", exc.response.status_code if hasattr(exc, 'response') else 0, exc)
+    except LLMTimeoutError:
+        logger.debug("LLM generate timeout after 30s for model %s - using lightweight reply", model_to_use)
+    except LLMClientError as exc:
+        if exc.status_code:
+            logger.error("LLM HTTP error %d: %s", exc.status_code, exc)
+        else:
+            logger.error("LLM connection error: %s - Is Ollama running at %s?", exc, OLLAMA_URL)
     except Exception as exc:
         logger.error("LLM generate failed: %s (type: %s)", exc, type(exc).__name__)
     return None
 
 
-def _generate_gemma_fallback(payload: ChatRequest, mode: str, model_name: Optional[str] = None, conversation_history: Optional[str] = None) -> Optional[str]:
-    """Generate generic model answer. Mode can be banking-specific or general."""
-    model_to_use = model_name or payload.model or OLLAMA_MODEL
-    if not USE_OLLAMA or not model_to_use:
-        return None
-    
+def _build_general_prompt(payload: ChatRequest, mode: str, conversation_history: Optional[str] = None) -> str:
+    """Prompt for a general-knowledge answer when retrieval found nothing."""
     # Use provided conversation history or build from payload
     if conversation_history is None:
         conversation_history = _build_conversation_context(payload.history if hasattr(payload, 'history') else [])
@@ -958,21 +985,28 @@ def _generate_gemma_fallback(payload: ChatRequest, mode: str, model_name: Option
             "- Use **bold** for key terms\n"
             "\n**Now answer the question:**"
         )
+    return f"{system_prompt}\n\n{user_prompt}"
+
+
+async def _generate_gemma_fallback(payload: ChatRequest, mode: str, model_name: Optional[str] = None, conversation_history: Optional[str] = None) -> Optional[str]:
+    """Generate generic model answer. Mode can be banking-specific or general."""
+    model_to_use = model_name or payload.model or OLLAMA_MODEL
+    if not USE_OLLAMA or not model_to_use:
+        return None
+    prompt = _build_general_prompt(payload, mode, conversation_history)
     
     try:
         logger.debug("Calling Ollama for generic fallback: model=%s", model_to_use)
-        resp = requests.post(
+        data = await llm_client().post_json(
             f"{OLLAMA_URL.rstrip('/')}/api/generate",
-            json={
+            {
                 "model": model_to_use,
-                "prompt": f"{system_prompt}\n\n{user_prompt}",
+                "prompt": prompt,
                 "stream": False,
-                "options": {"temperature": 0.1, "top_p": 0.9, "num_predict": 6000, "num_ctx": 6000},  # Lower temp (0.1) for precision, larger context (6000)
+                "options": LLM_OPTIONS,
             },
             timeout=30,  # Increased timeout to allow model to generate complete answers
         )
-        resp.raise_for_status()
-        data = resp.json()
         text = data.get("response") or data.get("data")
         if isinstance(text, str) and text.strip():
             return text.strip()
@@ -981,6 +1015,21 @@ def _generate_gemma_fallback(payload: ChatRequest, mode: str, model_name: Option
     return None
 
 
+async def _stream_llm_tokens(model_name: str, prompt: str) -> AsyncIterator[str]:
+    """Yield answer fragments from Ollama's streaming ``/api/generate`` as they arrive."""
+    async for chunk in llm_client().stream_json_lines(
+        f"{OLLAMA_URL.rstrip('/')}/api/generate",
+        {"model": model_name, "prompt": prompt, "stream": True, "options": LLM_OPTIONS},
+        timeout=(5, 30),  # the read timeout applies between fragments, not to the whole answer
+    ):
+        if chunk.get("error"):
+            raise RuntimeError(chunk["error"])
+        if chunk.get("response"):
+            yield chunk["response"]
+        if chunk.get("done"):
+            return
+
+
 def _dedupe_docs(items: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
     """Remove duplicate documents based on ID or title."""
     deduped: List[Dict[str, Any]] = []
@@ -1117,12 +1166,10 @@ def _faq_for_page(page_id: str) -> List[str]:
 
 
 @router.get("/v1/chat/models")
-def list_available_models() -> Dict[str, Any]:
+async def list_available_models() -> Dict[str, Any]:
     """List available Ollama models for chat generation. Prioritizes recommended models."""
     try:
-        resp = requests.get(f"{OLLAMA_URL.rstrip('/')}/api/tags", timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = await llm_client().get_json(f"{OLLAMA_URL.rstrip('/')}/api/tags", timeout=10)
         all_models = [model.get("name", "") for model in data.get("models", [])]
         
         # Sort models: recommended first, then others
@@ -1154,6 +1201,15 @@ def list_available_models() -> Dict[str, Any]:
         }
 
 
+@router.get("/v1/chat/cache")
+def chat_cache_stats() -> Dict[str, Any]:
+    """Exact and semantic response cache statistics."""
+    return {
+        "exact": {**_RESPONSE_CACHE.stats(), "ttl_seconds": RESPONSE_CACHE_TTL},
+        "semantic": _SEMANTIC_CACHE.stats() if _SEMANTIC_CACHE is not None else {"enabled": False},
+    }
+
+
 @router.post("/v1/chat/upload")
 async def upload_file_to_rag(
     file: UploadFile = File(...),
@@ -1181,7 +1237,7 @@ async def upload_file_to_rag(
             tmp_path = Path(tmp_file.name)
         
         try:
-            ingestor = LocalIngestor()
+            ingestor = get_ingestor()
             chunks = []
             
             # Process based on file type
@@ -1192,8 +1248,7 @@ async def upload_file_to_rag(
                     raise HTTPException(status_code=400, detail="CSV file is empty")
                 if max_rows:
                     df = df.head(max_rows)
-                for idx, row in df.iterrows():
-                    text = "; ".join(f"{col}={val}" for col, val in row.items() if pd.notna(val))
+                for idx, text in zip(df.index, render_row_texts(df)):
                     chunks.append({
                         "id": f"{Path(file.filename).stem}-{idx}",
                         "text": text,
@@ -1260,6 +1315,8 @@ async def upload_file_to_rag(
             
             # Ingest chunks
             total_ingested = ingestor.ingest_text_chunks(chunks, dry_run=False)
+            if _SEMANTIC_CACHE is not None and total_ingested:
+                _SEMANTIC_CACHE.invalidate()
             
             return {
                 "success": True,
@@ -1279,6 +1336,14 @@ async def upload_file_to_rag(
         raise HTTPException(status_code=500, detail=f"Failed to process file: {str(exc)}")
 
 
+def _retrieval_confidence(retrieved: List[Dict[str, Any]]) -> Tuple[str, float]:
+    """Confidence from the best dense score among the hits; lexical-only results read as medium."""
+    dense_scores = [float(doc["score"]) for doc in retrieved if doc.get("score") is not None]
+    if dense_scores:
+        return _get_confidence_level(max(dense_scores), "rag")
+    return _get_confidence_level(0.0, "lexical")
+
+
 def _get_confidence_level(score: float, source_type: str) -> Tuple[str, float]:
     """Determine confidence level based on RAG score or source type."""
     if source_type == "rag":
@@ -1290,6 +1355,8 @@ def _get_confidence_level(score: float, source_type: str) -> Tuple[str, float]:
             return "low", score
     elif source_type == "general_knowledge":
         return "medium", 0.5  # Medium confidence for general knowledge
+    elif source_type == "lexical":
+        return "medium", 0.5  # Exact-term BM25 matches without a dense score
     else:
         return "low", 0.3
 
@@ -1434,35 +1501,21 @@ def _format_response_with_structure(text: str, mode: str, confidence: str) -> st
     return formatted.strip()
 
 
+def _response_cache_key(question: str, page_id: str) -> str:
+    return hashlib.md5(f"{question.lower().strip()}:{page_id}".encode()).hexdigest()
+
+
 def _check_response_cache(question: str, page_id: str) -> Optional[Dict[str, Any]]:
     """Check if we have a cached response for this question."""
-    # Create cache key from question and page context
-    cache_key = hashlib.md5(f"{question.lower().strip()}:{page_id}".encode()).hexdigest()
-    
-    if cache_key in _response_cache:
-        cached_response, cached_time = _response_cache[cache_key]
-        age = time.time() - cached_time
-        if age < RESPONSE_CACHE_TTL:
-            logger.debug(f"Cache hit for question: {question[:50]} (age: {age:.1f}s)")
-            return cached_response
-        else:
-            # Expired cache entry
-            del _response_cache[cache_key]
-    
-    return None
+    cached_response = _RESPONSE_CACHE.get(_response_cache_key(question, page_id))
+    if cached_response is not None:
+        logger.debug(f"Cache hit for question: {question[:50]}")
+    return cached_response
 
 
 def _store_response_cache(question: str, page_id: str, response: Dict[str, Any]):
-    """Store response in cache."""
-    cache_key = hashlib.md5(f"{question.lower().strip()}:{page_id}".encode()).hexdigest()
-    _response_cache[cache_key] = (response, time.time())
-    
-    # Clean up old cache entries (keep last 100)
-    if len(_response_cache) > 100:
-        # Remove oldest 20 entries
-        sorted_entries = sorted(_response_cache.items(), key=lambda x: x[1][1])
-        for key, _ in sorted_entries[:20]:
-            del _response_cache[key]
+    """Store response in cache (expiry and LRU eviction are handled by the backend)."""
+    _RESPONSE_CACHE.set(_response_cache_key(question, page_id), response, ttl=RESPONSE_CACHE_TTL)
 
 
 def _build_conversation_context(history: List[ChatMessage], max_turns: int = MAX_CONVERSATION_HISTORY) -> str:
@@ -1585,20 +1638,54 @@ def _faq_for_page(page_id: str) -> List[str]:
     return [entry["question"] for entry in bucket][:10]  # Return up to 10 FAQs
 
 
-@router.post("/v1/chat", response_model=ChatResponse)
-def chat_endpoint(payload: ChatRequest) -> ChatResponse:
-    import time
-    start_time = time.time()
-    
-    if not payload.message.strip():
-        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+@dataclass
+class _ChatTurn:
+    """State shared by the blocking and streaming /v1/chat paths."""
 
-    # Check cache first
+    started: float
+    mode: str
+    context_summary: List[str]
+    model: Optional[str]
+    conversation_history: str
+    retrieved: List[Dict[str, Any]] = field(default_factory=list)
+    source_type: str = "general_knowledge"
+    confidence: str = "medium"
+    confidence_score: float = 0.5
+    rag_answer: str = ""
+    question_vector: Optional[List[float]] = None
+    rag_time: float = 0.0
+    tfidf_time: float = 0.0
+    llm_time: float = 0.0
+
+
+def _lookup_cached_reply(payload: ChatRequest) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+    """Exact cache first, then the semantic cache; also returns the question embedding for storing later."""
     cached_response = _check_response_cache(payload.message, payload.page_id)
     if cached_response:
-        cached_response["source_type"] = "cached"
-        return ChatResponse(**cached_response)
+        # Copy before tagging: the cache may hand the same dict to other requests.
+        return {**cached_response, "source_type": "cached"}, None
+
+    # Then the semantic cache: nearest earlier question in the same page/agent scope
+    question_vector = None
+    if _SEMANTIC_CACHE is not None:
+        try:
+            embed_start = time.time()
+            question_vector = embed_query(payload.message.strip())
+            semantic_hit = _SEMANTIC_CACHE.lookup(
+                question_vector, _semantic_scope(payload), overhead_ms=(time.time() - embed_start) * 1000
+            )
+        except Exception as exc:
+            logger.debug("Semantic cache lookup failed: %s", exc)
+            semantic_hit = None
+        if semantic_hit:
+            cached_response, similarity = semantic_hit
+            logger.debug("Semantic cache hit (similarity %.3f) for %r", similarity, payload.message[:80])
+            return {**cached_response, "source_type": "cached"}, question_vector
+    return None, question_vector
 
+
+def _prepare_chat_turn(payload: ChatRequest, started: float, question_vector: Optional[List[float]]) -> _ChatTurn:
+    """Log the request and retrieve context; everything up to the LLM call."""
     # Log chat request
     if add_log_entry:
         add_log_entry({
@@ -1608,8 +1695,6 @@ def chat_endpoint(payload: ChatRequest) -> ChatResponse:
             "model": payload.model,
         })
 
-    mode = _infer_mode(payload.page_id, payload.context)
-    context_summary = _summarize_context(payload.context)
     # Use unified chatbot agent if agent_id is provided and set to "chatbot"
     # This ensures all agents use the same chatbot backend for consistent behavior
     agent_id = getattr(payload, 'agent_id', None)
@@ -1618,6 +1703,15 @@ def chat_endpoint(payload: ChatRequest) -> ChatResponse:
     else:
         agent_key = _resolve_agent_key(payload.page_id)  # Fallback to page_id resolution
     
+    turn = _ChatTurn(
+        started=started,
+        mode=_infer_mode(payload.page_id, payload.context),
+        context_summary=_summarize_context(payload.context),
+        model=payload.model or OLLAMA_MODEL,
+        conversation_history=_build_conversation_context(payload.history if hasattr(payload, 'history') else []),
+        question_vector=question_vector,
+    )
+    
     # Try to get howto snippet if available
     howto_doc = None
     if get_howto_snippet:
@@ -1635,29 +1729,13 @@ def chat_endpoint(payload: ChatRequest) -> ChatResponse:
         except Exception:
             pass
     
-    # Check if question is banking-related
-    is_banking = _is_banking_related(payload.message, payload.page_id, payload.context)
-    
-    model_to_use = payload.model or OLLAMA_MODEL
-    llm_time = 0
-    rag_time = 0
-    tfidf_time = 0
-    reply_text = ""
-    confidence = "medium"
-    confidence_score = 0.5
-    source_type = "general_knowledge"
-    related_questions = []
-    retrieved: List[Dict[str, Any]] = []
-    
-    conversation_history = _build_conversation_context(payload.history if hasattr(payload, 'history') else [])
-    
     # ── Step 1: Retrieve from RAG (primary store first) ─────────────────────────
     primary_hits: List[Dict[str, Any]] = []
     if LOCAL_STORE.available:
         try:
             rag_start = time.time()
-            primary_hits = _retrieve_store_docs(payload.message, payload.context)
-            rag_time = (time.time() - rag_start) * 1000
+            primary_hits = _retrieve_hybrid_docs(payload.message, payload.context)
+            turn.rag_time = (time.time() - rag_start) * 1000
         except Exception as exc:
             logger.warning("Vector store retrieval failed: %s", exc)
     
@@ -1669,69 +1747,57 @@ def chat_endpoint(payload: ChatRequest) -> ChatResponse:
         try:
             tfidf_start = time.time()
             fallback_hits = _retrieve_fallback_docs(payload.message, payload.context)
-            tfidf_time = (time.time() - tfidf_start) * 1000
+            turn.tfidf_time = (time.time() - tfidf_start) * 1000
             primary_hits = fallback_hits
         except Exception as exc:
             logger.warning("TF-IDF fallback retrieval failed: %s", exc)
     
-    retrieved = _dedupe_docs(primary_hits, RAG_TOP_K) if primary_hits else []
+    turn.retrieved = _dedupe_docs(primary_hits, RAG_TOP_K) if primary_hits else []
     
-    if retrieved:
+    if turn.retrieved:
         # Use RAG-derived answer first
-        source_type = "rag"
-        top_score = float(retrieved[0].get("score") or 0.0)
-        confidence, confidence_score = _get_confidence_level(top_score, "rag")
-        rag_answer = _compose_lightweight_reply(payload, retrieved, mode)
-        
-        # Enhance with LLM if available (still grounded in context)
-        llm_answer = None
-        if USE_OLLAMA and model_to_use:
-            try:
-                llm_start = time.time()
-                llm_answer = _maybe_generate_llm_reply(
-                    payload,
-                    retrieved,
-                    mode,
-                    model_name=model_to_use,
-                    conversation_history=conversation_history,
-                    initial_answer=rag_answer,
-                )
-                llm_time = (time.time() - llm_start) * 1000
-            except Exception as exc:
-                logger.debug("LLM enhancement failed: %s", exc)
-                llm_answer = None
-        
-        reply_text = llm_answer.strip() if llm_answer else rag_answer
-        reply_text = _format_response_with_structure(reply_text, mode, confidence)
-        reply_text += "\n\n📚 *Answer grounded in your uploaded knowledge base.*"
+        turn.source_type = "rag"
+        turn.confidence, turn.confidence_score = _retrieval_confidence(turn.retrieved)
+        turn.rag_answer = _compose_lightweight_reply(payload, turn.retrieved, turn.mode)
     else:
         # ── Step 2: General-knowledge fallback via model ───────────────────────
         logger.info("No RAG context available – falling back to model knowledge.")
-        source_type = "general_knowledge"
-        confidence, confidence_score = _get_confidence_level(0.0, "general_knowledge")
-        
-        kb_answer = None
-        if USE_OLLAMA and model_to_use:
-            try:
-                llm_start = time.time()
-                kb_answer = _generate_gemma_fallback(payload, mode, model_to_use, conversation_history)
-                llm_time = (time.time() - llm_start) * 1000
-            except Exception as exc:
-                logger.debug("General knowledge generation failed: %s", exc)
-                kb_answer = None
-        
-        if not kb_answer:
+        turn.source_type = "general_knowledge"
+        turn.confidence, turn.confidence_score = _get_confidence_level(0.0, "general_knowledge")
+    return turn
+
+
+def _turn_prompt(payload: ChatRequest, turn: _ChatTurn) -> Optional[str]:
+    """The LLM prompt for this turn, or None when generation is disabled."""
+    if not USE_OLLAMA or not turn.model:
+        return None
+    if turn.retrieved:
+        # Enhance the RAG answer with the LLM (still grounded in context)
+        return _build_rag_prompt(
+            payload, turn.retrieved, turn.mode, turn.conversation_history, initial_answer=turn.rag_answer
+        )
+    return _build_general_prompt(payload, turn.mode, turn.conversation_history)
+
+
+def _finish_chat_turn(payload: ChatRequest, turn: _ChatTurn, llm_text: Optional[str], **log_fields: Any) -> Dict[str, Any]:
+    """Assemble the final reply from the LLM output, cache it and log the turn."""
+    if turn.retrieved:
+        reply_text = llm_text.strip() if llm_text else turn.rag_answer
+        reply_text = _format_response_with_structure(reply_text, turn.mode, turn.confidence)
+        reply_text += "\n\n📚 *Answer grounded in your uploaded knowledge base.*"
+    else:
+        if not llm_text:
             fallback_msg = (
                 f"I apologize, but I couldn't generate a complete answer for '{payload.message}'. "
                 "Please try rephrasing your question or upload relevant documents to the chat knowledge base."
             )
-            reply_text = _format_response_with_structure(fallback_msg, mode, confidence)
+            reply_text = _format_response_with_structure(fallback_msg, turn.mode, turn.confidence)
         else:
-            reply_text = _format_response_with_structure(kb_answer, mode, confidence)
+            reply_text = _format_response_with_structure(llm_text, turn.mode, turn.confidence)
         
         reply_text += "\n\n📘 *Answer generated from the assistant’s general knowledge base.*"
     
-    related_questions = _generate_related_questions(payload.message, mode, retrieved)
+    related_questions = _generate_related_questions(payload.message, turn.mode, turn.retrieved)
 
     actions = _suggest_actions(payload)
     timestamp = datetime.now(timezone.utc).isoformat()
@@ -1740,35 +1806,150 @@ def chat_endpoint(payload: ChatRequest) -> ChatResponse:
     # Build response
     response_data = {
         "reply": reply_text,
-        "mode": mode,
+        "mode": turn.mode,
         "actions": actions,
         "timestamp": timestamp,
-        "context_summary": context_summary,
-        "retrieved": retrieved,
+        "context_summary": turn.context_summary,
+        "retrieved": turn.retrieved,
         "faq_options": faq_options,
-        "confidence": confidence,
-        "confidence_score": confidence_score,
+        "confidence": turn.confidence,
+        "confidence_score": turn.confidence_score,
         "related_questions": related_questions,
-        "source_type": source_type,
+        "source_type": turn.source_type,
     }
     
     # Cache the response (only cache successful responses with good confidence)
-    if confidence in ["high", "medium"] and len(reply_text) > 50:
+    if turn.confidence in ["high", "medium"] and len(reply_text) > 50:
         _store_response_cache(payload.message, payload.page_id, response_data)
+        if _SEMANTIC_CACHE is not None and turn.question_vector is not None:
+            _SEMANTIC_CACHE.store(
+                turn.question_vector,
+                _semantic_scope(payload),
+                response_data,
+                cost_ms=(time.time() - turn.started) * 1000,
+            )
     
     # Log chat response with performance metrics
     if add_log_entry:
-        total_time = (time.time() - start_time) * 1000
+        total_time = (time.time() - turn.started) * 1000
         add_log_entry({
             "type": "chat_response",
             "duration_ms": total_time,
-            "rag_time_ms": rag_time,
-            "tfidf_time_ms": tfidf_time,
-            "llm_time_ms": llm_time,
-            "retrieved_count": len(retrieved),
+            "rag_time_ms": turn.rag_time,
+            "tfidf_time_ms": turn.tfidf_time,
+            "llm_time_ms": turn.llm_time,
+            "retrieved_count": len(turn.retrieved),
             "reply_length": len(reply_text),
-            "confidence": confidence,
-            "source_type": source_type,
+            "confidence": turn.confidence,
+            "source_type": turn.source_type,
+            **log_fields,
         })
+    return response_data
+
+
+@router.post("/v1/chat", response_model=ChatResponse)
+async def chat_endpoint(payload: ChatRequest) -> ChatResponse:
+    start_time = time.time()
+    
+    if not payload.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+
+    # Retrieval and caching are blocking (embeddings, vector store, SQLite) and run
+    # in the threadpool; only the LLM wait stays on the event loop.
+    # Check cache first
+    cached_response, question_vector = await run_in_threadpool(_lookup_cached_reply, payload)
+    if cached_response:
+        return ChatResponse(**cached_response)
+
+    turn = await run_in_threadpool(_prepare_chat_turn, payload, start_time, question_vector)
+    
+    llm_answer = None
+    if USE_OLLAMA and turn.model:
+        try:
+            llm_start = time.time()
+            if turn.retrieved:
+                # Enhance with LLM if available (still grounded in context)
+                llm_answer = await _maybe_generate_llm_reply(
+                    payload,
+                    turn.retrieved,
+                    turn.mode,
+                    model_name=turn.model,
+                    conversation_history=turn.conversation_history,
+                    initial_answer=turn.rag_answer,
+                )
+            else:
+                llm_answer = await _generate_gemma_fallback(payload, turn.mode, turn.model, turn.conversation_history)
+            turn.llm_time = (time.time() - llm_start) * 1000
+        except Exception as exc:
+            logger.debug("LLM generation failed: %s", exc)
+            llm_answer = None
+
+    return ChatResponse(**await run_in_threadpool(_finish_chat_turn, payload, turn, llm_answer))
+
+
+def _stream_meta(response: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        key: response.get(key)
+        for key in ("mode", "retrieved", "confidence", "confidence_score", "source_type", "context_summary")
+    }
+
+
+@router.post("/v1/chat/stream")
+async def chat_stream_endpoint(payload: ChatRequest) -> StreamingResponse:
+    """Streaming variant of ``/v1/chat`` (Server-Sent Events).
+
+    Events: ``meta`` (sources, confidence, mode) as soon as retrieval is done,
+    ``token`` for every fragment of the LLM answer, then ``done`` carrying the
+    full ``ChatResponse`` (formatted reply, as cached and logged). Errors after
+    the stream started arrive as an ``error`` event.
+    """
+    start_time = time.time()
+    if not payload.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty.")
+
+    async def _events() -> AsyncIterator[str]:
+        cached_response, question_vector = await run_in_threadpool(_lookup_cached_reply, payload)
+        if cached_response:
+            yield sse_event("meta", _stream_meta(cached_response))
+            yield sse_event("token", {"text": cached_response.get("reply", "")})
+            yield sse_event("done", ChatResponse(**cached_response).model_dump())
+            return
+
+        turn = await run_in_threadpool(_prepare_chat_turn, payload, start_time, question_vector)
+        yield sse_event("meta", _stream_meta({
+            "mode": turn.mode,
+            "retrieved": turn.retrieved,
+            "confidence": turn.confidence,
+            "confidence_score": turn.confidence_score,
+            "source_type": turn.source_type,
+            "context_summary": turn.context_summary,
+        }))
+
+        prompt = _turn_prompt(payload, turn)
+        parts: List[str] = []
+        first_token_ms = None
+        if prompt:
+            llm_start = time.time()
+            try:
+                async for token in _stream_llm_tokens(turn.model, prompt):
+                    if first_token_ms is None:
+                        first_token_ms = (time.time() - turn.started) * 1000
+                    parts.append(token)
+                    yield sse_event("token", {"text": token})
+            except Exception as exc:
+                logger.warning("LLM stream failed after %d fragments: %s", len(parts), exc)
+                if parts:
+                    # The client already shows a partial answer; the lightweight reply replaces it.
+                    yield sse_event("error", {"detail": "LLM stream interrupted", "partial": True})
+                    parts = []
+            turn.llm_time = (time.time() - llm_start) * 1000
+        llm_text = "".join(parts)
+        response_data = await run_in_threadpool(
+            _finish_chat_turn, payload, turn, llm_text or None, streamed=True, first_token_ms=first_token_ms
+        )
+        if not llm_text.strip():
+            # No LLM output: the lightweight RAG answer (or the fallback message) is the reply.
+            yield sse_event("token", {"text": response_data["reply"]})
+        yield sse_event("done", ChatResponse(**response_data).model_dump())
 
-    return ChatResponse(**response_data)
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,31 +1,37 @@
 """Chatbot endpoints backed by Phi-3 via Ollama + Chroma RAG."""
 from __future__ import annotations
 
+import hashlib
 import logging
-from typing import List
+import os
+from typing import AsyncIterator, List, Optional, Tuple
 
 from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from services.api.llm.ollama_client import OllamaError, ollama_generate
-from services.api.rag.chroma_store import reset_collection
-from services.api.rag.ingest_agents import ingest_agent_pages
+from services.api.llm.ollama_client import OllamaError, ollama_agenerate, ollama_astream
 from services.api.rag.ingest_csv import (
-    ingest_all_csvs,
     ingest_text_blob,
     ingest_uploaded_csv_bytes,
 )
-from services.api.rag.ingest_docs import ingest_docs
+from services.api.rag.refresh import get_refresh_job, list_refresh_jobs, submit_refresh
 from services.api.rag.run_history import prune_agent_run_history
 from services.api.rag.howto_loader import get_howto_snippet
 from services.api.rag.retriever import query_rag
 from services.api.utils.chatbot_events import log_chatbot_event
+from services.api.utils.response_cache import response_cache
+from services.api.utils.sse import SSE_HEADERS, sse_event
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chatbot", tags=["chatbot"])
 
 _BOOTSTRAPPED = False
+RESPONSE_CACHE_TTL = int(os.getenv("CHATBOT_RESPONSE_CACHE_SECONDS", "300"))
+# Shared across workers; emptied by ingests here and by finished refresh jobs.
+_RESPONSE_CACHE = response_cache("chatbot")
 
 
 class ChatbotRequest(BaseModel):
@@ -43,11 +49,10 @@ class ChatbotResponse(BaseModel):
 def _ensure_bootstrapped() -> None:
     global _BOOTSTRAPPED
     if not _BOOTSTRAPPED:
-        log_chatbot_event("bootstrap.start")
-        ingest_all_csvs()
-        ingest_agent_pages()
-        ingest_docs()
-        log_chatbot_event("bootstrap.finish")
+        # Incremental and in the background: chat is served from the current
+        # collection while sources changed since the last manifest are re-embedded.
+        job = submit_refresh()
+        log_chatbot_event("bootstrap.start", job_id=job.job_id)
         _BOOTSTRAPPED = True
 
 
@@ -78,38 +83,65 @@ def _build_prompt(context: str, question: str, *, rag_hit: bool) -> str:
     )
 
 
-@router.post("/refresh")
-def refresh_rag(reset: bool = False):
-    log_chatbot_event("rag.refresh.start", reset=reset)
-    reset_collection()
-    prune_stats = prune_agent_run_history()
-    csv_stats = ingest_all_csvs()
-    agent_stats = ingest_agent_pages()
-    doc_stats = ingest_docs()
-    log_chatbot_event(
-        "rag.refresh.finish",
-        reset=reset,
-        csv_rows=csv_stats.get("rows_indexed", 0),
-        agent_chunks=agent_stats.get("rows_indexed", 0),
-        doc_chunks=doc_stats.get("rows_indexed", 0),
-        pruned=prune_stats.get("entries_removed", 0),
-    )
+def _response_cache_key(payload: ChatbotRequest) -> str:
+    raw = f"{payload.question.lower().strip()}:{payload.agent_id or ''}:{payload.top_k}"
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _summarize_refresh(result: dict) -> dict:
+    empty = {"files_processed": 0, "rows_indexed": 0}
     return {
-        "status": "ok",
-        "csv": csv_stats,
-        "agent_ui": agent_stats,
-        "docs": doc_stats,
-        "pruned_runs": prune_stats,
+        "mode": result.get("mode"),
+        "seconds": result.get("seconds"),
+        "csv": result.get("csv", empty),
+        "agent_ui": result.get("agent_ui", empty),
+        "docs": result.get("doc", empty),
     }
 
 
+def _job_payload(job) -> dict:
+    payload = job.as_dict()
+    if job.result is not None:
+        payload["result"] = _summarize_refresh(job.result)
+    return payload
+
+
+@router.post("/refresh")
+def refresh_rag(full: bool = False, reset: bool = False):
+    """Queue a RAG refresh and return its job id immediately.
+
+    Only new/changed sources are re-embedded; ``full=true`` (or legacy
+    ``reset=true``) rebuilds into a shadow collection that is swapped in when
+    complete. Poll ``GET /chatbot/refresh/{job_id}`` for progress.
+    """
+    full = full or reset
+    prune_stats = prune_agent_run_history()
+    job = submit_refresh(full=full)
+    log_chatbot_event("rag.refresh.start", full=full, job_id=job.job_id)
+    return {"status": "accepted", "job_id": job.job_id, "job": _job_payload(job), "pruned_runs": prune_stats}
+
+
+@router.get("/refresh")
+def list_refresh_jobs_endpoint():
+    return {"jobs": [_job_payload(job) for job in list_refresh_jobs()]}
+
+
+@router.get("/refresh/{job_id}")
+def refresh_job_status(job_id: str):
+    job = get_refresh_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown refresh job '{job_id}'.")
+    return _job_payload(job)
+
+
 @router.post("/ingest")
 async def ingest_upload(file: UploadFile = File(...), agent_id: str | None = None):
     data = await file.read()
     try:
-        stats = ingest_uploaded_csv_bytes(data, file.filename, agent_id=agent_id)
+        stats = await run_in_threadpool(ingest_uploaded_csv_bytes, data, file.filename, agent_id=agent_id)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    _RESPONSE_CACHE.clear()
     return {"status": "ok", **stats}
 
 
@@ -121,21 +153,22 @@ async def ingest_any_file(file: UploadFile = File(...), agent_id: str | None = N
     name = file.filename or "upload"
     if name.lower().endswith(".csv"):
         try:
-            stats = ingest_uploaded_csv_bytes(payload, name, agent_id=agent_id)
+            stats = await run_in_threadpool(ingest_uploaded_csv_bytes, payload, name, agent_id=agent_id)
         except ValueError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
+        _RESPONSE_CACHE.clear()
         return {"status": "ok", **stats}
     try:
         text = payload.decode("utf-8", errors="ignore")
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f"Decode failed: {exc}") from exc
-    stats = ingest_text_blob(text, source=f"upload:{name}", agent_id=agent_id)
+    stats = await run_in_threadpool(ingest_text_blob, text, source=f"upload:{name}", agent_id=agent_id)
+    _RESPONSE_CACHE.clear()
     return {"status": "ok", **stats}
 
 
-@router.post("/chat", response_model=ChatbotResponse)
-def chat_with_agent(payload: ChatbotRequest):
-    _ensure_bootstrapped()
+def _prepare_chat(payload: ChatbotRequest) -> Tuple[str, List[dict], str, str, Optional[str]]:
+    """Retrieve context and build the prompt: ``(prompt, sources, context_used, mode, resolved_agent)``."""
     context, sources, best_score, resolved_agent = query_rag(
         payload.question,
         top_k=payload.top_k,
@@ -162,15 +195,83 @@ def chat_with_agent(payload: ChatbotRequest):
         best_score=best_score,
     )
     prompt = _build_prompt(context if rag_hit else "", payload.question, rag_hit=rag_hit)
-    try:
-        answer = ollama_generate(prompt)
-    except OllamaError as exc:
-        logger.error("Phi-3 request failed: %s", exc)
-        raise HTTPException(status_code=502, detail="Phi-3/Ollama backend unavailable.") from exc
+    return prompt, sources, context if rag_hit else "", mode, resolved_agent
+
+
+def _finish_chat(
+    payload: ChatbotRequest, cache_key: str, answer: str, sources: List[dict], context_used: str, mode: str,
+    resolved_agent: Optional[str],
+) -> ChatbotResponse:
     log_chatbot_event(
         "chat.answer",
         agent_id=payload.agent_id or "auto",
         resolved_agent=resolved_agent or payload.agent_id or "auto",
         mode=mode,
     )
-    return ChatbotResponse(answer=answer, sources=sources, context_used=context if rag_hit else "")
+    response = ChatbotResponse(answer=answer, sources=sources, context_used=context_used)
+    if answer.strip():
+        _RESPONSE_CACHE.set(cache_key, response.model_dump(), ttl=RESPONSE_CACHE_TTL)
+    return response
+
+
+def _cached_chat(payload: ChatbotRequest, cache_key: str) -> Optional[dict]:
+    _ensure_bootstrapped()
+    cached = _RESPONSE_CACHE.get(cache_key)
+    if cached is not None:
+        log_chatbot_event("chat.cache_hit", agent_id=payload.agent_id or "auto")
+    return cached
+
+
+# The chat handlers are async so the Phi-3 wait holds no worker thread; retrieval,
+# the cache and event logging are blocking and go through the threadpool.
+@router.post("/chat", response_model=ChatbotResponse)
+async def chat_with_agent(payload: ChatbotRequest):
+    cache_key = _response_cache_key(payload)
+    cached = await run_in_threadpool(_cached_chat, payload, cache_key)
+    if cached is not None:
+        return ChatbotResponse(**cached)
+    prompt, sources, context_used, mode, resolved_agent = await run_in_threadpool(_prepare_chat, payload)
+    try:
+        answer = await ollama_agenerate(prompt)
+    except OllamaError as exc:
+        logger.error("Phi-3 request failed: %s", exc)
+        raise HTTPException(status_code=502, detail="Phi-3/Ollama backend unavailable.") from exc
+    return await run_in_threadpool(
+        _finish_chat, payload, cache_key, answer, sources, context_used, mode, resolved_agent
+    )
+
+
+@router.post("/chat/stream")
+async def chat_with_agent_stream(payload: ChatbotRequest):
+    """Server-Sent Events variant of ``/chatbot/chat``.
+
+    Sends ``meta`` (sources, mode) once retrieval is done, a ``token`` event
+    per fragment of the Phi-3 answer and a final ``done`` event with the full
+    ``ChatbotResponse``. A backend failure arrives as an ``error`` event.
+    """
+    cache_key = _response_cache_key(payload)
+
+    async def _events() -> AsyncIterator[str]:
+        cached = await run_in_threadpool(_cached_chat, payload, cache_key)
+        if cached is not None:
+            yield sse_event("meta", {"sources": cached["sources"], "mode": "cached"})
+            yield sse_event("token", {"text": cached["answer"]})
+            yield sse_event("done", cached)
+            return
+        prompt, sources, context_used, mode, resolved_agent = await run_in_threadpool(_prepare_chat, payload)
+        yield sse_event("meta", {"sources": sources, "mode": mode, "context_used": context_used})
+        parts: List[str] = []
+        try:
+            async for token in ollama_astream(prompt):
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+        except OllamaError as exc:
+            logger.error("Phi-3 stream failed: %s", exc)
+            yield sse_event("error", {"detail": "Phi-3/Ollama backend unavailable.", "partial": bool(parts)})
+            return
+        response = await run_in_threadpool(
+            _finish_chat, payload, cache_key, "".join(parts).strip(), sources, context_used, mode, resolved_agent
+        )
+        yield sse_event("done", response.model_dump())
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers=SSE_HEADERS)
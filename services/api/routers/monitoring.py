@@ -1,17 +1,18 @@
 """Monitoring and log viewing endpoints."""
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import time
 from datetime import datetime, timezone
 from typing import Any, Dict, List
 
-import requests
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
+from services.api.llm.http_pool import llm_client
 from services.api.middleware.logging_middleware import (
     add_log_entry,
     clear_logs,
@@ -22,6 +23,7 @@ from services.api.middleware.visitor_tracker import (
     get_visitor_stats,
     load_visitor_data,
 )
+from services.api.utils.response_cache import CACHE_BACKEND, response_cache_stats
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["monitoring"])
@@ -97,27 +99,26 @@ def stream_logs():
 
 
 @router.get("/v1/monitoring/status")
-def get_system_status() -> SystemStatus:
+async def get_system_status() -> SystemStatus:
     """Get system status and health metrics."""
-    # Check API health
-    api_healthy = False
-    try:
-        resp = requests.get(f"{API_URL}/health", timeout=2)
-        api_healthy = resp.status_code == 200
-    except Exception:
-        pass
+    # Check API and Ollama health concurrently
+    client = llm_client()
+    api_resp, ollama_resp = await asyncio.gather(
+        client.request("GET", f"{API_URL}/health", timeout=2, retries=0),
+        client.request("GET", f"{OLLAMA_URL}/api/tags", timeout=5, retries=0),
+        return_exceptions=True,
+    )
+    api_healthy = not isinstance(api_resp, BaseException) and api_resp.status_code == 200
     
-    # Check Ollama health
     ollama_healthy = False
     ollama_models = []
-    try:
-        resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        if resp.status_code == 200:
-            ollama_healthy = True
-            data = resp.json()
+    if not isinstance(ollama_resp, BaseException) and ollama_resp.status_code == 200:
+        ollama_healthy = True
+        try:
+            data = ollama_resp.json()
             ollama_models = [m.get("name", "") for m in data.get("models", [])]
-    except Exception:
-        pass
+        except Exception:
+            pass
     
     # Calculate metrics from logs
     logs = get_recent_logs(limit=1000)
@@ -255,6 +256,15 @@ def get_chat_performance() -> Dict[str, Any]:
     }
 
 
+@router.get("/v1/monitoring/cache")
+def get_cache_stats() -> Dict[str, Any]:
+    """Response cache statistics for /v1/chat and /chatbot/chat.
+
+    With the shared SQLite backend the counters cover every worker on the host.
+    """
+    return {"backend": CACHE_BACKEND, "caches": response_cache_stats()}
+
+
 @router.get("/v1/monitoring/visitors")
 def get_visitors() -> Dict[str, Any]:
     """Get all tracked visitors."""
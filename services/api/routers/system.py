@@ -4,6 +4,8 @@ import os, json, time
 from typing import List, Dict, Any
 from fastapi import APIRouter
 
+from services.api.rag.watcher import watcher_stats
+
 router = APIRouter(tags=["system"])
 
 ROOT = os.path.expanduser("~/credit-appraisal-agent-poc")
@@ -45,3 +47,8 @@ def list_models() -> Dict[str, Any]:
         except Exception:
             pass
     return {"items": items, "active_model_path": active}
+
+@router.get("/v1/system/rag/watcher")
+def rag_watcher_status() -> Dict[str, Any]:
+    """Queue depth, debounce backlog and ingest counters of the in-process RAG watcher."""
+    return watcher_stats()
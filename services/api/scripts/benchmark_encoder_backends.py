@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Parity + throughput check of encoder/reranker backends against the torch path.
+
+For every backend the script reports:
+  * sentences/sec (bi-encoder) and pairs/sec (cross-encoder)
+  * parity: per-sentence cosine between backend and torch embeddings, and the
+    max absolute difference of query/document cosine scores (what retrieval ranks on)
+  * cross-encoder score drift and top-1 agreement vs torch
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List
+
+import numpy as np
+
+from services.api.rag.embeddings import DEFAULT_MODEL
+from services.api.rag.encoder_registry import BACKENDS, get_registry
+from services.api.rag.policies_text import CREDIT_ASSET_POLICY_TEXT
+from services.api.rag.reranker import DEFAULT_RERANKER_MODEL
+from services.api.rag.utils import chunk_text
+
+QUERIES = [
+    "What is the maximum LTV for residential collateral?",
+    "How is DTI calculated for credit appraisal?",
+    "When does an application require manual review?",
+    "What does the asset appraisal agent do with encumbrances?",
+    "Explain the PD threshold for approval.",
+]
+
+
+def _unit(arr: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(arr, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return arr / norms
+
+
+def _timed(fn, repeats: int):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeats
+
+
+def bench_bi(backends: List[str], docs: List[str], repeats: int) -> None:
+    registry = get_registry()
+    baseline = None
+    print(f"\nBi-encoder {DEFAULT_MODEL} ({len(docs)} sentences)")
+    print(f"{'backend':<12}{'sent/s':>10}{'min cos':>10}{'mean cos':>10}{'max |dscore|':>14}")
+    for backend in backends:
+        try:
+            model = registry.get(DEFAULT_MODEL, kind="bi", backend=backend)
+        except Exception as exc:
+            print(f"{backend:<12}  unavailable: {exc}")
+            continue
+        vectors, seconds = _timed(lambda: np.asarray(model.encode(docs, show_progress_bar=False)), repeats)
+        queries = np.asarray(model.encode(QUERIES, show_progress_bar=False))
+        vectors, queries = _unit(vectors), _unit(queries)
+        scores = queries @ vectors.T
+        if baseline is None:
+            baseline = (vectors, scores)
+            row = (1.0, 1.0, 0.0)
+        else:
+            per_row = np.sum(vectors * baseline[0], axis=1)
+            row = (per_row.min(), per_row.mean(), np.abs(scores - baseline[1]).max())
+        print(f"{backend:<12}{len(docs) / seconds:>10.1f}{row[0]:>10.4f}{row[1]:>10.4f}{row[2]:>14.4f}")
+        registry.unload(DEFAULT_MODEL, kind="bi", backend=backend)
+
+
+def bench_cross(backends: List[str], docs: List[str], repeats: int) -> None:
+    registry = get_registry()
+    pairs = [[query, doc] for query in QUERIES for doc in docs[:20]]
+    baseline = None
+    print(f"\nCross-encoder {DEFAULT_RERANKER_MODEL} ({len(pairs)} pairs)")
+    print(f"{'backend':<12}{'pairs/s':>10}{'max |dscore|':>14}{'top1 agree':>12}")
+    for backend in backends:
+        try:
+            model = registry.get(DEFAULT_RERANKER_MODEL, kind="cross", backend=backend)
+        except Exception as exc:
+            print(f"{backend:<12}  unavailable: {exc}")
+            continue
+        scores, seconds = _timed(lambda: np.asarray(model.predict(pairs, show_progress_bar=False)), repeats)
+        grid = scores.reshape(len(QUERIES), -1)
+        if baseline is None:
+            baseline = grid
+            drift, agree = 0.0, 1.0
+        else:
+            drift = float(np.abs(grid - baseline).max())
+            agree = float(np.mean(grid.argmax(axis=1) == baseline.argmax(axis=1)))
+        print(f"{backend:<12}{len(pairs) / seconds:>10.1f}{drift:>14.4f}{agree:>12.2f}")
+        registry.unload(DEFAULT_RERANKER_MODEL, kind="cross", backend=backend)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare torch / ONNX / int8 encoder backends.")
+    parser.add_argument("--backends", nargs="*", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip-cross", action="store_true", help="Only benchmark the bi-encoder.")
+    args = parser.parse_args()
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]  # torch is the parity baseline
+    docs = chunk_text(CREDIT_ASSET_POLICY_TEXT, 400, 50)
+    bench_bi(backends, docs, args.repeats)
+    if not args.skip_cross:
+        bench_cross(backends, docs, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
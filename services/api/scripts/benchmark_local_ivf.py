@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Report recall@k and latency of the LocalVectorStore IVF path against exact search."""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from services.api.rag.local_store import LocalVectorStore
+
+
+def synthetic_vectors(rows: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered Gaussian blobs, closer to real embedding structure than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    return centers[labels] + 0.35 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+
+def timed_ids(store: LocalVectorStore, queries: np.ndarray, top_k: int, **kwargs) -> tuple[List[List[str]], float]:
+    results: List[List[str]] = []
+    start = time.perf_counter()
+    for query in queries:
+        hits = store.query(query, top_k=top_k, **kwargs)
+        results.append([hit["id"] for hit in hits])
+    elapsed_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+    return results, elapsed_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF recall/latency for the local RAG store.")
+    parser.add_argument("--store", type=Path, default=None, help="Existing store directory (default: synthetic data).")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="*", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    if args.store:
+        store = LocalVectorStore(args.store, use_ivf=True, auto_compact=False)
+        if not store.available:
+            print(f"Store {args.store} is empty.")
+            return
+        # Perturbed copies of stored rows stand in for real questions.
+        segment = max(store._segments, key=lambda seg: seg.rows)
+        picks = rng.choice(segment.rows, min(args.queries, segment.rows), replace=False)
+        queries = np.asarray(segment.matrix[np.sort(picks)])
+        queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    else:
+        tmp_dir = Path(tempfile.mkdtemp(prefix="ivf_bench_"))
+        store = LocalVectorStore(tmp_dir, use_ivf=True, auto_compact=False)
+        clusters = max(16, args.rows // 500)
+        data = synthetic_vectors(args.rows + args.queries, args.dim, clusters, seed=1)
+        store.add_vectors(data[: args.rows], [{"id": str(i)} for i in range(args.rows)])
+        store.save()
+        queries = data[args.rows :]
+
+    start = time.perf_counter()
+    store.train_ivf(nlist=args.nlist)
+    train_s = time.perf_counter() - start
+    print(f"rows={store.count()} nlist={store._ivf.nlist} train={train_s:.1f}s queries={len(queries)} k={args.top_k}")
+
+    exact, exact_ms = timed_ids(store, queries, args.top_k, exact=True)
+    print(f"{'mode':<12}{'recall@k':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<12}{1.0:>10.3f}{exact_ms:>12.2f}{1.0:>10.1f}")
+    for nprobe in args.nprobe:
+        approx, approx_ms = timed_ids(store, queries, args.top_k, nprobe=nprobe)
+        recall = np.mean(
+            [len(set(a) & set(e)) / max(len(e), 1) for a, e in zip(approx, exact)]
+        )
+        print(f"{'nprobe=' + str(nprobe):<12}{recall:>10.3f}{approx_ms:>12.2f}{exact_ms / max(approx_ms, 1e-9):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Rewrite legacy ``_original_meta`` rows of Chroma collections to the typed JSON metadata codec."""
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+from services.api.rag.chroma_store import (
+    COLLECTION_NAME,
+    DB_ROOT,
+    ChromaVectorStore,
+    get_collection,
+    migrate_collection_metadata,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate Chroma metadata from Python repr strings to JSON.")
+    parser.add_argument("--store", type=Path, default=None, help="ChromaVectorStore directory (default: .chroma_store).")
+    parser.add_argument(
+        "--collections",
+        nargs="*",
+        default=["rag_documents"],
+        help="Collections inside --store to migrate.",
+    )
+    parser.add_argument("--legacy", action="store_true", help=f"Also migrate {COLLECTION_NAME} under {DB_ROOT}.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    for name in args.collections:
+        store = ChromaVectorStore(args.store, collection_name=name)
+        stats = store.migrate_metadata(batch_size=args.batch_size)
+        print(f"{store.store_dir}/{name}: {stats}")
+    if args.legacy:
+        stats = migrate_collection_metadata(get_collection(), batch_size=args.batch_size)
+        print(f"{DB_ROOT}/{COLLECTION_NAME}: {stats}")
+
+
+if __name__ == "__main__":
+    main()
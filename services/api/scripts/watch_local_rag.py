@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
-"""Continuously watch CSV output folders and ingest new files into the local RAG store."""
+"""Continuously watch CSV output folders and ingest new files into the local RAG store.
+
+The API now runs an inotify-based watcher in-process (``services.api.rag.watcher``)
+that shares its encoder; use this polling script only when the API is not running.
+"""
 from __future__ import annotations
 
 import argparse
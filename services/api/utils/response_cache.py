@@ -0,0 +1,317 @@
+"""Byte-bounded LRU caches for chat responses.
+
+Two backends share one small interface (``get`` / ``set`` / ``delete`` /
+``clear`` / ``stats``):
+
+* ``MemoryLRUCache`` — an ``OrderedDict`` in the current process; O(1) hits,
+  inserts and evictions, bounded by the encoded size of its values.
+* ``SQLiteLRUCache`` — one WAL-mode SQLite file that every uvicorn worker on
+  the host opens, so a response cached by one worker is a hit in all of
+  them. Byte totals and hit counters live in the database too.
+
+``RESPONSE_CACHE_BACKEND`` (``sqlite`` | ``memory``) picks the backend for
+``response_cache(name)``; each name (``chat``, ``chatbot``) is a separate
+namespace with its own byte budget.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "sqlite").lower()
+CACHE_PATH = Path(os.getenv("RESPONSE_CACHE_PATH", str(PROJECT_ROOT / ".cache" / "response_cache.sqlite")))
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_NAMES = ("chat", "chatbot")
+_EVICT_BATCH = 32
+
+
+def _encode(value: Dict[str, Any]) -> Tuple[str, int]:
+    """JSON payload and its size in bytes."""
+    payload = json.dumps(value, ensure_ascii=False, default=str)
+    return payload, len(payload.encode("utf-8"))
+
+
+class CacheBackend:
+    """Interface shared by the response cache backends."""
+
+    backend = "none"
+
+    def __init__(self, name: str, max_bytes: int = CACHE_MAX_BYTES):
+        self.name = name
+        self.max_bytes = max(1, max_bytes)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def _stats_payload(self, entries: int, size: int, hits: int, misses: int, evictions: int) -> Dict[str, Any]:
+        lookups = hits + misses
+        return {
+            "backend": self.backend,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "evictions": evictions,
+        }
+
+
+class MemoryLRUCache(CacheBackend):
+    """Per-process LRU bounded by the total size of the JSON-encoded values."""
+
+    backend = "memory"
+
+    def __init__(self, name: str, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__(name, max_bytes)
+        self._entries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()  # key -> (payload, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _pop_locked(self, key: str) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    self._pop_locked(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            payload = entry[0]
+        # Decoding hands every caller its own copy.
+        return json.loads(payload)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        payload, size = _encode(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop_locked(key)
+            self._entries[key] = (payload, time.time() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop_locked(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._pop_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return self._stats_payload(len(self._entries), self._bytes, self.hits, self.misses, self.evictions)
+
+
+class SQLiteLRUCache(CacheBackend):
+    """LRU shared by every process that opens ``path`` (SQLite WAL)."""
+
+    backend = "sqlite"
+
+    def __init__(self, name: str, path: Path = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__(name, max_bytes)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries(namespace, last_used);
+            CREATE TABLE IF NOT EXISTS counters (
+                namespace TEXT PRIMARY KEY,
+                entries INTEGER NOT NULL DEFAULT 0,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                evictions INTEGER NOT NULL DEFAULT 0
+            );
+            -- Running totals keep the size check O(1) instead of a SUM() per insert.
+            CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+                UPDATE counters SET entries = entries + 1, bytes = bytes + NEW.size
+                WHERE namespace = NEW.namespace;
+            END;
+            CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+                UPDATE counters SET entries = entries - 1, bytes = bytes - OLD.size
+                WHERE namespace = OLD.namespace;
+            END;
+            """
+        )
+        self._conn.execute("INSERT OR IGNORE INTO counters (namespace) VALUES (?)", (name,))
+
+    def _count(self, column: str) -> None:
+        self._conn.execute(f"UPDATE counters SET {column} = {column} + 1 WHERE namespace = ?", (self.name,))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?", (self.name, key)
+                ).fetchone()
+                if row is None or row[1] < now:
+                    if row is not None:
+                        self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.name, key))
+                    self._count("misses")
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE entries SET last_used = ? WHERE namespace = ? AND key = ?", (now, self.name, key)
+                )
+                self._count("hits")
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as exc:
+                self._rollback()
+                logger.debug("Response cache read failed: %s", exc)
+                return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        payload, size = _encode(value)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                # DELETE + INSERT (not REPLACE) so both triggers keep the totals right.
+                self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.name, key))
+                self._conn.execute(
+                    "INSERT INTO entries (namespace, key, value, size, expires_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.name, key, payload, size, now + ttl, now),
+                )
+                self._evict_locked(now)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as exc:
+                self._rollback()
+                logger.debug("Response cache write failed: %s", exc)
+
+    def _total_bytes_locked(self) -> int:
+        return self._conn.execute("SELECT bytes FROM counters WHERE namespace = ?", (self.name,)).fetchone()[0]
+
+    def _evict_locked(self, now: float) -> None:
+        if self._total_bytes_locked() <= self.max_bytes:
+            return
+        self._conn.execute("DELETE FROM entries WHERE namespace = ? AND expires_at < ?", (self.name, now))
+        excess = self._total_bytes_locked() - self.max_bytes
+        while excess > 0:
+            # Oldest entries first, just enough of them to get back under the budget.
+            victims = []
+            for key, size in self._conn.execute(
+                "SELECT key, size FROM entries WHERE namespace = ? ORDER BY last_used LIMIT ?",
+                (self.name, _EVICT_BATCH),
+            ):
+                victims.append((self.name, key))
+                excess -= size
+                if excess <= 0:
+                    break
+            if not victims:
+                return
+            self._conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+            self._conn.execute(
+                "UPDATE counters SET evictions = evictions + ? WHERE namespace = ?", (len(victims), self.name)
+            )
+
+    def _rollback(self) -> None:
+        try:
+            self._conn.execute("ROLLBACK")
+        except sqlite3.Error:
+            pass
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.name, key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ?", (self.name,))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size, hits, misses, evictions = self._conn.execute(
+                "SELECT entries, bytes, hits, misses, evictions FROM counters WHERE namespace = ?", (self.name,)
+            ).fetchone()
+        data = self._stats_payload(entries, size, hits, misses, evictions)
+        data["path"] = str(self.path)
+        return data
+
+
+_CACHES: Dict[str, CacheBackend] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def response_cache(name: str) -> CacheBackend:
+    """Process-wide cache for ``name``; falls back to memory when SQLite cannot be opened."""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None:
+            if CACHE_BACKEND == "sqlite":
+                try:
+                    cache = SQLiteLRUCache(name)
+                except Exception as exc:
+                    logger.warning("Shared response cache unavailable (%s); using in-process LRU", exc)
+            if cache is None:
+                cache = MemoryLRUCache(name)
+            _CACHES[name] = cache
+        return cache
+
+
+def response_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: response_cache(name).stats() for name in RESPONSE_CACHE_NAMES}
+
+
+__all__ = [
+    "CacheBackend",
+    "MemoryLRUCache",
+    "RESPONSE_CACHE_NAMES",
+    "SQLiteLRUCache",
+    "response_cache",
+    "response_cache_stats",
+]
@@ -0,0 +1,20 @@
+"""Server-Sent Events framing shared by the streaming chat endpoints."""
+from __future__ import annotations
+
+import json
+from typing import Any, Dict
+
+# Same headers as the monitoring log stream; X-Accel-Buffering stops nginx from holding tokens back.
+SSE_HEADERS: Dict[str, str] = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """One ``event:``/``data:`` frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+__all__ = ["SSE_HEADERS", "sse_event"]
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
 import os
+import time
 import requests
 import streamlit as st
 
+from services.api.llm.http_pool import LLMClientError, llm_client_sync
 from services.ui.theme_manager import apply_theme, render_theme_toggle
 from services.common.personas import list_personas
 from services.ui.data.chatbot_faqs import get_agent_faqs
@@ -36,6 +38,40 @@ def _post_json(path: str, payload: dict, *, params: dict | None = None, timeout:
     return resp.json()
 
 
+def _ask_chatbot(question: str, *, params: dict | None = None, timeout: int = 120) -> dict:
+    # Phi-3 answers take seconds; reuse pooled keep-alive connections to the API.
+    return llm_client_sync().post_json(
+        f"{API_URL.rstrip('/')}/chatbot/chat", {"question": question}, params=params, timeout=timeout
+    )
+
+
+def _wait_for_refresh(job_id: str, *, timeout: float = 600.0) -> dict:
+    """Poll a background RAG refresh job until it finishes (or the timeout passes)."""
+    deadline = time.time() + timeout
+    job: dict = {}
+    progress = st.progress(0.0, text="Refreshing RAG store…")
+    while time.time() < deadline:
+        resp = requests.get(f"{API_URL.rstrip('/')}/chatbot/refresh/{job_id}", timeout=10)
+        resp.raise_for_status()
+        job = resp.json()
+        progress.progress(min(float(job.get("progress") or 0.0), 1.0), text=f"Refresh {job.get('state')}…")
+        if job.get("state") in {"succeeded", "failed"}:
+            break
+        time.sleep(1.0)
+    progress.empty()
+    return job
+
+
+def _refresh_summary(job: dict) -> str:
+    result = job.get("result") or {}
+    return (
+        f"CSV rows: {result.get('csv', {}).get('rows_indexed', 0)} | "
+        f"Agent chunks: {result.get('agent_ui', {}).get('rows_indexed', 0)} | "
+        f"Doc chunks: {result.get('docs', {}).get('rows_indexed', 0)} | "
+        f"{result.get('mode', '')} refresh in {result.get('seconds', 0)}s"
+    )
+
+
 def _post_file(path: str, file_name: str, data: bytes, *, params: dict | None = None):
     files = {"file": (file_name, data, "application/octet-stream")}
     resp = requests.post(
@@ -98,22 +134,27 @@ with st.sidebar:
     if st.button("🔄 Refresh RAG DB"):
         try:
             meta = _post_json("/chatbot/refresh", {}, params=None)
-            st.success(
-                "CSV rows: "
-                f"{meta['csv'].get('rows_indexed', 0)} | Agent chunks: {meta['agent_ui'].get('rows_indexed', 0)} | "
-                f"Doc chunks: {meta['docs'].get('rows_indexed', 0)} | Pruned runs: {meta['pruned_runs'].get('entries_removed', 0)}"
-            )
+            job = _wait_for_refresh(meta["job_id"])
+            if job.get("state") == "failed":
+                st.error(f"Refresh failed: {job.get('error')}")
+            else:
+                st.success(
+                    f"{_refresh_summary(job)} | Pruned runs: {meta['pruned_runs'].get('entries_removed', 0)}"
+                )
         except requests.RequestException as exc:
             st.error(f"Refresh failed: {exc}")
 
     if st.button("♻️ Hard Reset & Rebuild RAG"):
         try:
-            meta = _post_json("/chatbot/refresh", {}, params={"reset": "true"})
-            st.success(
-                "Recreated store. CSV rows: "
-                f"{meta['csv'].get('rows_indexed', 0)}, agent chunks: {meta['agent_ui'].get('rows_indexed', 0)}, "
-                f"doc chunks: {meta['docs'].get('rows_indexed', 0)}, pruned runs: {meta['pruned_runs'].get('entries_removed', 0)}"
-            )
+            meta = _post_json("/chatbot/refresh", {}, params={"full": "true"})
+            job = _wait_for_refresh(meta["job_id"])
+            if job.get("state") == "failed":
+                st.error(f"Rebuild failed: {job.get('error')}")
+            else:
+                st.success(
+                    f"Rebuilt and swapped in a fresh collection. {_refresh_summary(job)} | "
+                    f"Pruned runs: {meta['pruned_runs'].get('entries_removed', 0)}"
+                )
         except requests.RequestException as exc:
             st.error(f"Rebuild failed: {exc}")
 
@@ -155,8 +196,8 @@ def _handle_prompt(prompt_text: str, agent_override: str | None = None):
             label = persona["name"] if persona else target_agent
             st.caption(f"Persona: {label}")
     try:
-        response = _post_json("/chatbot/chat", {"question": prompt_text}, params=agent_params)
-    except requests.RequestException as exc:
+        response = _ask_chatbot(prompt_text, params=agent_params)
+    except LLMClientError as exc:
         st.error(f"Chat backend error: {exc}")
         return
 
@@ -18,6 +18,8 @@ import json
 import time
 from typing import Dict, Any, Optional
 
+from services.api.llm.http_pool import LLMClientError, llm_client_sync
+
 # Import theme and navigation
 from services.ui.theme_manager import init_theme, render_theme_toggle
 from services.ui.utils.style import render_nav_bar_app
@@ -55,10 +57,8 @@ def call_agent_api(task: str, payload: Dict[str, Any], engine: Optional[str] = N
         request_data["engine"] = engine
 
     try:
-        response = requests.post(url, json=request_data, timeout=120)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return llm_client_sync().post_json(url, request_data, timeout=120)
+    except LLMClientError as e:
         return {"error": str(e), "result": None, "source": "error"}
 
 
@@ -4,7 +4,7 @@ import logging
 import os
 from typing import Any, Dict
 
-import requests
+from services.api.llm.http_pool import llm_client_sync
 
 __all__ = ["call_local_llm", "llm_generate_summary"]
 
@@ -26,9 +26,7 @@ def call_local_llm(prompt: str, timeout: int = 45) -> str:
     url = f"{endpoint}/chat"
     payload = {"prompt": prompt}
     try:
-        resp = requests.post(url, json=payload, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
+        data = llm_client_sync().post_json(url, payload, timeout=timeout)
         if isinstance(data, dict):
             for key in ("response", "text", "message"):
                 value = data.get(key)
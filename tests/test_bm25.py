@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import numpy as np
+
+from services.api.rag.bm25 import BM25Index, ensure_lexical_index, tokenize
+from services.api.rag.local_store import LocalVectorStore
+
+
+def test_tokenize_keeps_compound_ids_and_parts():
+    tokens = tokenize("What is the DTI for APP-00123?")
+    assert "dti" in tokens
+    assert "app-00123" in tokens
+    assert "00123" in tokens
+    assert "the" not in tokens
+
+
+def test_exact_terms_rank_first_and_removal_is_incremental(tmp_path):
+    index = BM25Index(tmp_path / "bm25.sqlite")
+    index.add(
+        [
+            ("dti", "DTI is the debt to income ratio", {"namespace": "policies"}),
+            ("ltv", "LTV is the loan to value ratio", {"namespace": "policies"}),
+            ("app", "Application APP-00123 was approved", {"namespace": "apps"}),
+            ("empty", "", {"namespace": "apps"}),
+        ]
+    )
+    assert index.count() == 3
+    assert index.search("dti")[0]["id"] == "dti"
+    assert index.search("app-00123")[0]["id"] == "app"
+    assert [hit["id"] for hit in index.search("ratio", namespace="apps")] == []
+
+    index.remove(["dti"])
+    assert [hit["id"] for hit in index.search("dti")] == []
+    index.remove_namespace("apps")
+    assert index.count() == 1
+
+
+def test_backfill_runs_once_per_store_version(tmp_path):
+    store = LocalVectorStore(tmp_path, auto_compact=False)
+    rows = np.eye(3, 8, dtype=np.float32)
+    # The empty chunk has no terms, so BM25 never holds as many rows as the store.
+    store.add_vectors(rows, [{"id": "a", "text": "DTI limit"}, {"id": "b", "text": "LTV cap"}, {"id": "c", "text": ""}])
+    store.save()
+
+    thread = ensure_lexical_index(store)
+    assert thread is not None
+    thread.join()
+    assert store.lexical.synced_version() == str(store.version())
+    assert ensure_lexical_index(store) is None
+
+    # Later writes go to BM25 directly and carry the sync mark forward.
+    store.add_vectors(np.eye(1, 8, 4, dtype=np.float32), [{"id": "d", "text": "APP-00123"}])
+    store.save()
+    assert ensure_lexical_index(store) is None
+    assert store.lexical.search("app-00123")[0]["id"] == "d"
+
+
+def test_rows_reach_bm25_only_once_saved(tmp_path):
+    store = LocalVectorStore(tmp_path, auto_compact=False)
+    store.add_vectors(np.eye(1, 8, dtype=np.float32), [{"id": "a", "text": "APP-00777 approved"}])
+    assert store.lexical.search("app-00777") == []
+    store.save()
+    assert store.lexical.search("app-00777")[0]["id"] == "a"
@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import importlib
+import json
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("sentence_transformers")
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+PAYLOAD = {"message": "What is the DTI limit?", "page_id": "credit_appraisal"}
+
+
+@pytest.fixture(scope="module")
+def chat(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("LOCAL_RAG_STORE", str(tmp_path_factory.mktemp("rag_store")))
+        mp.setenv("USE_CHROMADB", "false")
+        # Keep the router's caches (and the policy docs it embeds on import) out of the repo tree.
+        mp.setattr(importlib.import_module("services.api.utils.response_cache"), "CACHE_BACKEND", "memory")
+        mp.setattr(importlib.import_module("services.api.rag.embedding_cache"), "CACHE_ENABLED", False)
+        yield importlib.import_module("services.api.routers.chat")
+
+
+@pytest.fixture
+def client(chat):
+    app = FastAPI()
+    app.include_router(chat.router)
+    return TestClient(app)
+
+
+def _events(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_meta_then_tokens_then_done(chat, client, monkeypatch):
+    async def fake_tokens(model, prompt):
+        for token in ("DTI is ", "capped at ", "43%."):
+            yield token
+
+    def fake_finish(payload, turn, llm_text, **log_fields):
+        assert log_fields["streamed"] is True
+        return {"reply": llm_text, "mode": turn.mode, "timestamp": "now", "source_type": turn.source_type}
+
+    monkeypatch.setattr(chat, "_lookup_cached_reply", lambda payload: (None, None))
+    monkeypatch.setattr(
+        chat,
+        "_prepare_chat_turn",
+        lambda payload, started, vector: chat._ChatTurn(
+            started=time.time(), mode="rag", context_summary=[], model="phi3", conversation_history=""
+        ),
+    )
+    monkeypatch.setattr(chat, "_turn_prompt", lambda payload, turn: "prompt")
+    monkeypatch.setattr(chat, "_stream_llm_tokens", fake_tokens)
+    monkeypatch.setattr(chat, "_finish_chat_turn", fake_finish)
+
+    response = client.post("/v1/chat/stream", json=PAYLOAD)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert [name for name, _ in events] == ["meta", "token", "token", "token", "done"]
+    assert events[0][1]["mode"] == "rag"
+    assert "".join(data["text"] for name, data in events if name == "token") == "DTI is capped at 43%."
+    assert events[-1][1]["reply"] == "DTI is capped at 43%."
+
+
+def test_stream_serves_cache_hits_without_touching_the_cached_entry(chat, client, monkeypatch):
+    cached = {"reply": "Cached answer", "mode": "rag", "timestamp": "then", "source_type": "rag"}
+    monkeypatch.setattr(chat, "_check_response_cache", lambda question, page_id: cached)
+
+    events = _events(client.post("/v1/chat/stream", json=PAYLOAD).text)
+    assert [name for name, _ in events] == ["meta", "token", "done"]
+    assert events[0][1]["source_type"] == "cached"
+    assert events[-1][1]["reply"] == "Cached answer"
+    assert cached["source_type"] == "rag"
+
+
+def test_stream_rejects_blank_message(client):
+    assert client.post("/v1/chat/stream", json={**PAYLOAD, "message": "   "}).status_code == 400
+
+
+def test_rrf_promotes_documents_found_by_both_retrievers(chat):
+    dense = [{"id": "a", "score": 0.9}, {"id": "b", "score": 0.8}]
+    lexical = [{"id": "b", "score": 12.0}, {"id": "c", "score": 7.0}]
+    fused = chat._fuse_ranked_lists(dense, lexical)
+
+    assert [hit["id"] for hit in fused] == ["b", "a", "c"]
+    assert fused[0]["matched_by"] == ["dense", "bm25"]
+    assert fused[0]["score"] == 0.8
+    assert fused[0]["bm25_score"] == 12.0
+    # Lexical-only hits have no dense score; their BM25 score is carried separately.
+    assert fused[2]["score"] is None
+    assert fused[2]["bm25_score"] == 7.0
+
+
+def test_confidence_uses_dense_scores_and_reads_lexical_only_as_medium(chat):
+    fused = chat._fuse_ranked_lists([{"id": "a", "score": 0.62}], [{"id": "c", "score": 9.0}])
+    assert chat._retrieval_confidence(fused) == ("high", 0.62)
+    assert chat._retrieval_confidence(fused[1:]) == ("medium", 0.5)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from functools import partial
+
+import pytest
+
+pytest.importorskip("pandas")
+
+from services.api.rag import bulk_writer, csv_stream, ingest_csv  # noqa: E402
+from services.api.rag.csv_stream import CsvCheckpoint  # noqa: E402
+
+
+class FakeCollection:
+    name = "test_collection"
+
+    def __init__(self, fail_on_write: int = 0):
+        self.rows = {}
+        self.writes = 0
+        self.fail_on_write = fail_on_write
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.writes += 1
+        if self.writes == self.fail_on_write:
+            raise RuntimeError("worker killed")
+        self.rows.update(zip(ids, metadatas))
+
+    def get(self, ids=None, include=None, **_):
+        return {"ids": [doc_id for doc_id in ids or [] if doc_id in self.rows]}
+
+
+def _ingest(monkeypatch, collection, checkpoint_path, csv_path):
+    monkeypatch.setattr(ingest_csv, "get_collection", lambda: collection)
+    monkeypatch.setattr(ingest_csv, "get_checkpoint", lambda: CsvCheckpoint(checkpoint_path))
+    monkeypatch.setattr(ingest_csv, "delete_documents", lambda coll, **_: [])
+    monkeypatch.setattr(ingest_csv, "dedup_index", lambda coll: None)
+    monkeypatch.setattr(ingest_csv, "lexical_index", lambda coll: None)
+    monkeypatch.setattr(ingest_csv, "iter_csv_chunks", partial(csv_stream.iter_csv_chunks, chunk_rows=2))
+    fake_embed = lambda texts: [[float(len(text)), 1.0] for text in texts]  # noqa: E731
+    monkeypatch.setattr(ingest_csv, "bulk_upsert", partial(bulk_writer.bulk_upsert, embed_fn=fake_embed))
+    return ingest_csv._ingest_csv_file(csv_path)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / "credit_run.csv"
+    lines = ["application_id,decision,dti"]
+    lines += [f"APP-{i:03d},{'approve' if i % 2 else 'review'},{30 + i}" for i in range(7)]
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def test_resume_after_interruption_reports_the_full_id_set(monkeypatch, tmp_path, csv_path):
+    clean = _ingest(monkeypatch, FakeCollection(), tmp_path / "clean.json", csv_path)
+    assert clean.rows == 7
+
+    checkpoint_path = tmp_path / "resume.json"
+    collection = FakeCollection(fail_on_write=3)
+    with pytest.raises(RuntimeError):
+        _ingest(monkeypatch, collection, checkpoint_path, csv_path)
+    assert CsvCheckpoint(checkpoint_path).resume_offset(
+        f"{ingest_csv.CHECKPOINT_STORE}:{collection.name}", csv_path
+    ) == 4
+
+    resumed = _ingest(monkeypatch, collection, checkpoint_path, csv_path)
+    assert sorted(resumed.ids) == sorted(clean.ids)
+    assert set(collection.rows) == set(clean.ids)
+    # The sidecar is dropped once the file completes, so the next run starts over.
+    assert not any((tmp_path / "resume.ids").glob("*.jsonl"))
+
+
+def test_changed_file_does_not_resume(monkeypatch, tmp_path, csv_path):
+    checkpoint_path = tmp_path / "resume.json"
+    with pytest.raises(RuntimeError):
+        _ingest(monkeypatch, FakeCollection(fail_on_write=2), checkpoint_path, csv_path)
+    csv_path.write_text(csv_path.read_text() + "APP-999,approve,10\n")
+    store = f"{ingest_csv.CHECKPOINT_STORE}:{FakeCollection.name}"
+    assert CsvCheckpoint(checkpoint_path).resume_offset(store, csv_path) == 0
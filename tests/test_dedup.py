@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+from services.api.rag.dedup import NearDuplicateIndex
+
+TEXT = (
+    "Applicants with a debt to income ratio above forty three percent need a manual review "
+    "by the credit committee before any offer is issued"
+)
+
+
+def _index(tmp_path, **kwargs) -> NearDuplicateIndex:
+    return NearDuplicateIndex(tmp_path / "dedup.npz", **kwargs)
+
+
+def test_near_duplicate_from_other_source_is_dropped(tmp_path):
+    index = _index(tmp_path)
+    keep, _ = index.filter([("a", TEXT, "page.py")], session=set())
+    assert keep == [True]
+
+    copy = TEXT + " today"
+    keep, duplicate_of = index.filter([("b", copy, "page.py.bak")], session=set(), exists=lambda ids: set(ids))
+    assert keep == [False]
+    assert duplicate_of == ["a"]
+
+
+def test_same_source_and_unrelated_text_are_kept(tmp_path):
+    index = _index(tmp_path)
+    index.filter([("a", TEXT, "page.py")], session=set())
+    keep, _ = index.filter(
+        [("a2", TEXT, "page.py"), ("c", "Collateral appraisals expire after ninety days", "other.py")],
+        session=set(),
+        exists=lambda ids: set(ids),
+    )
+    assert keep == [True, True]
+
+
+def test_entries_whose_rows_are_gone_do_not_suppress(tmp_path):
+    index = _index(tmp_path)
+    index.filter([("a", TEXT, "page.py")], session=set())
+    keep, _ = index.filter([("b", TEXT, "copy.py")], session=set(), exists=lambda ids: set())
+    assert keep == [True]
+    assert index.stats()["entries"] == 1
+
+
+def test_save_reclaims_removed_slots(tmp_path):
+    index = _index(tmp_path)
+    index.filter([("a", TEXT, "page.py"), ("b", "Unrelated appraisal note for a house", "x.py")], session=set())
+    index.discard(["a"])
+    index.save()
+    reloaded = _index(tmp_path)
+    assert reloaded.stats()["entries"] == 1
+    keep, _ = reloaded.filter([("c", TEXT, "copy.py")], session=set(), exists=lambda ids: set(ids))
+    assert keep == [True]
+
+
+def test_table_rows_sharing_features_are_all_kept(tmp_path):
+    # Wide rows that differ only in their id and decision columns look ~95% similar to MinHash.
+    features = ", ".join(f"feature_{column}: {column * 7}" for column in range(30))
+    rows = [
+        (f"r{i}", f"application_id: APP-{i:05d}, {features}, decision: {decision}", "apps.csv")
+        for i, decision in enumerate(["approved", "approved", "rejected", "approved", "rejected"])
+    ]
+    index = _index(tmp_path)
+    keep, _ = index.filter(rows, session=set(), tabular=[True] * len(rows))
+    assert keep == [True] * len(rows)
+
+    # A copy of the file with identical rows is still recognised.
+    copies = [(f"c{i}", text, "apps.csv.bak") for i, (_, text, _) in enumerate(rows)]
+    keep, duplicate_of = index.filter(copies, session=set(), exists=lambda ids: set(ids), tabular=[True] * len(rows))
+    assert keep == [False] * len(rows)
+    assert duplicate_of == [doc_id for doc_id, _, _ in rows]
+
+
+def test_save_merges_entries_written_by_another_process(tmp_path):
+    first = _index(tmp_path)
+    second = _index(tmp_path)
+    first.filter([("a", TEXT, "page.py")], session=set())
+    second.filter([("b", "Collateral appraisals expire after ninety days", "other.py")], session=set())
+    first.save()
+    second.save()
+
+    reloaded = _index(tmp_path)
+    assert reloaded.stats()["entries"] == 2
+    keep, duplicate_of = reloaded.filter([("c", TEXT, "copy.py")], session=set(), exists=lambda ids: set(ids))
+    assert keep == [False]
+    assert duplicate_of == ["a"]
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import time
+
+import numpy as np
+
+from services.api.rag.embedding_cache import EmbeddingCache
+
+
+def test_embedding_cache_trims_least_recently_used_rows(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite", max_rows=10)
+    texts = [f"chunk {i}" for i in range(10)]
+    cache.put_many("m", texts, np.eye(10, dtype=np.float32))
+    time.sleep(0.01)
+    assert all(vec is not None for vec in cache.get_many("m", texts[5:]))
+
+    cache.put_many("m", ["new chunk"], np.ones((1, 10), dtype=np.float32))
+    # Trimmed to 90% of the bound; the untouched rows go first.
+    assert cache.stats()["rows"] == 9
+    assert sum(vec is None for vec in cache.get_many("m", texts[:5])) == 2
+    assert all(vec is not None for vec in cache.get_many("m", texts[5:] + ["new chunk"]))
+
+
+def test_embedding_cache_counts_rows_written_by_other_connections(tmp_path):
+    path = tmp_path / "embeddings.sqlite"
+    first = EmbeddingCache(path, max_rows=4)
+    second = EmbeddingCache(path, max_rows=4)
+    first.put_many("m", ["a", "b", "c"], np.eye(3, dtype=np.float32))
+    second.put_many("m", ["d", "e"], np.eye(2, 3, dtype=np.float32))
+    assert second.stats()["rows"] <= 4
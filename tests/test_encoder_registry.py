@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+import pytest
+
+from services.api.rag import encoder_registry
+from services.api.rag.encoder_registry import EncoderRegistry
+
+
+def test_invalid_default_backend_falls_back_to_torch_on_first_use(monkeypatch):
+    monkeypatch.setitem(encoder_registry.DEFAULT_BACKENDS, "bi", "tensorrt")
+    monkeypatch.setattr(encoder_registry, "_RESOLVED_BACKENDS", {})
+    loaded = []
+    registry = EncoderRegistry(loaders={"bi": lambda *key: loaded.append(key) or object()})
+
+    registry.get("mini", device="cpu")
+    assert loaded == [("mini", "cpu", "torch")]
+    # An explicit backend argument is still validated strictly.
+    with pytest.raises(ValueError):
+        registry.get("mini", device="cpu", backend="tensorrt")
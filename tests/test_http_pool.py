@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from services.api.llm.http_pool import AsyncLLMClient, LLMClientError
+
+
+def _send(method, statuses, monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        return httpx.Response(statuses[min(len(calls), len(statuses)) - 1])
+
+    client = AsyncLLMClient(retries=1, backoff=0)
+    monkeypatch.setattr(client, "_client", lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    resp = asyncio.run(client.request(method, "http://llm.test/api/generate", json={"prompt": "hi"}))
+    return resp.status_code, len(calls)
+
+
+@pytest.mark.parametrize(
+    "method, statuses, expected",
+    [
+        ("POST", [502, 200], (502, 1)),
+        ("POST", [504, 200], (504, 1)),
+        ("POST", [503, 200], (200, 2)),
+        ("POST", [429, 200], (200, 2)),
+        ("GET", [502, 200], (200, 2)),
+    ],
+)
+def test_posts_are_only_retried_when_the_request_was_not_processed(method, statuses, expected, monkeypatch):
+    assert _send(method, statuses, monkeypatch) == expected
+
+
+def test_posts_are_not_resent_after_the_connection_dropped(monkeypatch):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        raise httpx.RemoteProtocolError("Server disconnected without sending a response.", request=request)
+
+    client = AsyncLLMClient(retries=1, backoff=0)
+    monkeypatch.setattr(client, "_client", lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    with pytest.raises(LLMClientError):
+        asyncio.run(client.request("POST", "http://llm.test/api/generate", json={}))
+    assert calls == ["POST"]
+    with pytest.raises(LLMClientError):
+        asyncio.run(client.request("GET", "http://llm.test/api/tags"))
+    assert calls == ["POST", "GET", "GET"]
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import multiprocessing
+
+import numpy as np
+import pytest
+
+from services.api.rag.local_store import LocalVectorStore
+
+
+def _store(path, **kwargs) -> LocalVectorStore:
+    kwargs.setdefault("auto_compact", False)
+    return LocalVectorStore(path, **kwargs)
+
+
+def _rows(rng, count, dim=16):
+    return rng.normal(size=(count, dim)).astype(np.float32)
+
+
+def _meta(prefix, count, namespace="docs"):
+    return [{"id": f"{prefix}-{i}", "text": f"{prefix} chunk {i}", "namespace": namespace} for i in range(count)]
+
+
+def test_mmap_store_serves_normalized_rows_from_disk(tmp_path, rng):
+    vectors = _rows(rng, 6) * 5
+    store = _store(tmp_path)
+    store.add_vectors(vectors, _meta("v", 6))
+    store.save()
+
+    mapped = _store(tmp_path, mmap=True)
+    matrix = mapped._segments[0].matrix
+    assert isinstance(matrix, np.memmap)
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-5)
+    assert mapped.query(vectors[2], top_k=1, exact=True)[0]["id"] == "v-2"
+
+
+def test_namespace_and_metadata_filters_narrow_candidates(tmp_path, rng):
+    vectors = _rows(rng, 6)
+    meta = [
+        {"id": f"d{i}", "text": "t", "namespace": "a" if i < 3 else "b", "agent": "credit" if i % 2 else "asset"}
+        for i in range(6)
+    ]
+    store = _store(tmp_path)
+    store.add_vectors(vectors, meta)
+
+    hits = store.query(vectors[4], top_k=6, namespace="b", filter_dict={"agent": "asset"}, exact=True)
+    assert [hit["id"] for hit in hits] == ["d4"]
+    assert store.query(vectors[0], top_k=3, namespace="missing") == []
+    assert store.namespace_present("a")
+
+
+def test_add_delete_compact_reload_round_trip(tmp_path, rng):
+    store = _store(tmp_path)
+    vectors = _rows(rng, 10)
+    store.add_vectors(vectors, _meta("keep", 10))
+    store.add_vectors(_rows(rng, 5), _meta("drop", 5, namespace="old"))
+    store.save()
+    assert store.count() == 15
+
+    store.remove_namespace("old")
+    assert store.count() == 10
+    assert not store.namespace_present("old")
+
+    assert store.compact()
+    reloaded = _store(tmp_path)
+    assert reloaded.count() == 10
+    assert len(reloaded._segments) == 1
+    assert reloaded.existing_ids(["keep-3", "drop-1"]) == {"keep-3"}
+    top = reloaded.query(vectors[3], top_k=1, exact=True)
+    assert top[0]["id"] == "keep-3"
+    assert top[0]["score"] == pytest.approx(1.0, abs=1e-5)
+
+
+def test_two_instances_on_one_directory_keep_both_writes(tmp_path, rng):
+    first = _store(tmp_path)
+    second = _store(tmp_path)
+    first.add_vectors(_rows(rng, 3), _meta("first", 3))
+    second.add_vectors(_rows(rng, 4), _meta("second", 4))
+    first.save()
+    second.save()
+
+    assert second.count() == 7
+    assert first.refresh()
+    assert first.count() == 7
+    assert _store(tmp_path).count() == 7
+    segment_names = [seg.name for seg in _store(tmp_path)._segments]
+    assert len(set(segment_names)) == len(segment_names)
+
+
+def _write_from_process(path, prefix, seed):
+    rng = np.random.default_rng(seed)
+    store = _store(path)
+    for batch in range(3):
+        store.add_vectors(_rows(rng, 5), _meta(f"{prefix}-{batch}", 5))
+        store.save()
+
+
+def test_concurrent_processes_do_not_lose_segments(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_write_from_process, args=(tmp_path, f"p{i}", i)) for i in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=60)
+        assert worker.exitcode == 0
+    assert _store(tmp_path).count() == 3 * 3 * 5
+
+
+def test_ivf_probe_finds_stored_rows_before_and_after_reload(tmp_path, rng):
+    vectors = _rows(rng, 400)
+    store = _store(tmp_path, use_ivf=True, nprobe=4)
+    store.add_vectors(vectors, _meta("v", 400))
+    store.save()
+
+    assert store.train_ivf(nlist=8)
+    assert store.list_sizes().sum() == 400
+    assert store.query(vectors[42], top_k=1)[0]["id"] == "v-42"
+
+    reloaded = _store(tmp_path, use_ivf=True, nprobe=4)
+    assert reloaded.list_sizes().sum() == 400
+    assert reloaded.query(vectors[42], top_k=1)[0]["id"] == "v-42"
+
+
+def test_int8_adc_matches_float_ranking(tmp_path, rng):
+    vectors = _rows(rng, 200, dim=32)
+    meta = _meta("v", 200)
+    exact = _store(tmp_path / "float")
+    quantized = _store(tmp_path / "int8", quantize="int8", rescore_factor=0)
+    for store in (exact, quantized):
+        store.add_vectors(vectors, meta)
+        store.save()
+
+    query = vectors[17] + 0.05 * _rows(rng, 1, dim=32)[0]
+    expected = [hit["id"] for hit in exact.query(query, top_k=5, exact=True)]
+    approximate = quantized.query(query, top_k=5, exact=True)
+    assert approximate[0]["id"] == "v-17"
+    assert len({hit["id"] for hit in approximate} & set(expected)) >= 4
+    assert quantized.memory_stats()["quantize"] == "int8"
+
+
+def test_rejects_unknown_quantization(tmp_path):
+    with pytest.raises(ValueError):
+        _store(tmp_path, quantize="pq")
+
+
+def test_version_moves_on_every_persisted_write(tmp_path, rng):
+    store = _store(tmp_path)
+    store.add_vectors(_rows(rng, 4), _meta("a", 4))
+    store.save()
+    saved = store.version()
+    store.remove_namespace("docs")
+    assert store.version() > saved
+    assert _store(tmp_path).version() == store.version()
+
+
+def test_compaction_merges_recent_similar_segments_only(tmp_path, rng):
+    store = _store(tmp_path)
+    store.add_vectors(_rows(rng, 50), _meta("big", 50))
+    store.save()
+    for batch in range(4):
+        store.add_vectors(_rows(rng, 3), _meta(f"small{batch}", 3))
+        store.save()
+    big = store._segments[0].name
+    before = store.version()
+
+    assert store._needs_compaction()
+    assert store.compact()
+    assert [seg.rows for seg in store._segments] == [50, 12]
+    assert store._segments[0].name == big
+    # Reserving the merged segment's name is not a write; only the swap bumps the generation.
+    assert store.version() == before + 1
+    assert not store._needs_compaction()
+
+    assert store.compact(full=True)
+    assert [seg.rows for seg in _store(tmp_path)._segments] == [62]
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from services.api.utils.response_cache import MemoryLRUCache, SQLiteLRUCache, _encode
+
+ENTRY = {"reply": "x" * 200}
+ENTRY_BYTES = _encode(ENTRY)[1]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_cache(request, tmp_path):
+    def _make(name: str, max_bytes: int):
+        if request.param == "memory":
+            return MemoryLRUCache(name, max_bytes=max_bytes)
+        return SQLiteLRUCache(name, path=tmp_path / "responses.sqlite", max_bytes=max_bytes)
+
+    return _make
+
+
+def test_response_cache_evicts_least_recent_under_byte_bound(make_cache):
+    cache = make_cache("chat", max_bytes=3 * ENTRY_BYTES)
+    for key in ("a", "b", "c"):
+        cache.set(key, ENTRY, ttl=60)
+        time.sleep(0.01)  # distinct last_used for the SQLite backend
+    assert cache.get("a") == ENTRY  # "b" is now the least recently used
+    time.sleep(0.01)
+    cache.set("d", ENTRY, ttl=60)
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 3 * ENTRY_BYTES
+    assert stats["evictions"] == 1
+    assert cache.get("b") is None
+    assert all(cache.get(key) == ENTRY for key in ("a", "c", "d"))
+
+
+def test_response_cache_skips_values_over_the_bound_and_expires(make_cache):
+    cache = make_cache("chatbot", max_bytes=ENTRY_BYTES)
+    cache.set("big", {"reply": "x" * 1000}, ttl=60)
+    assert cache.get("big") is None
+    cache.set("short", ENTRY, ttl=-1)
+    assert cache.get("short") is None
+
+
+def test_response_cache_hands_out_copies(make_cache):
+    cache = make_cache("chat", max_bytes=10 * ENTRY_BYTES)
+    cache.set("k", ENTRY, ttl=60)
+    cache.get("k")["source_type"] = "cached"
+    assert "source_type" not in cache.get("k")
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import numpy as np
+
+from services.api.rag import semantic_cache
+from services.api.rag.semantic_cache import SemanticResponseCache
+
+QUESTION = np.array([1.0, 0.0, 0.0])
+PARAPHRASE = np.array([0.98, 0.05, 0.0])
+OTHER = np.array([0.0, 1.0, 0.0])
+
+
+def test_paraphrase_hits_within_scope_only():
+    cache = SemanticResponseCache(ttl=60, threshold=0.9)
+    cache.store(QUESTION, "page|agent", {"reply": "DTI is debt to income"})
+
+    hit = cache.lookup(PARAPHRASE, "page|agent")
+    assert hit is not None
+    response, similarity = hit
+    assert response["reply"] == "DTI is debt to income"
+    assert similarity >= 0.9
+    assert cache.lookup(OTHER, "page|agent") is None
+    assert cache.lookup(PARAPHRASE, "other|agent") is None
+
+
+def test_hits_are_copies():
+    cache = SemanticResponseCache(ttl=60, threshold=0.9)
+    cache.store(QUESTION, "s", {"reply": "x"})
+    response, _ = cache.lookup(QUESTION, "s")
+    response["source_type"] = "cached"
+    assert "source_type" not in cache.lookup(QUESTION, "s")[0]
+
+
+def test_expired_and_evicted_entries_miss(monkeypatch):
+    cache = SemanticResponseCache(ttl=60, threshold=0.9, max_entries=1)
+    cache.store(QUESTION, "s", {"reply": "first"})
+    cache.store(OTHER, "s", {"reply": "second"})
+    assert cache.lookup(QUESTION, "s") is None
+    assert cache.stats()["evictions"] == 1
+
+    now = semantic_cache.time.time()
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now + 120)
+    assert cache.lookup(OTHER, "s") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_knowledge_version_change_invalidates(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "_VERSION_CHECK_SECONDS", 0.0)
+    version = {"value": 1}
+    cache = SemanticResponseCache(ttl=60, threshold=0.9, version_fn=lambda: version["value"])
+    cache.lookup(QUESTION, "s")
+    cache.store(QUESTION, "s", {"reply": "old"})
+    assert cache.lookup(QUESTION, "s") is not None
+
+    version["value"] = 2
+    assert cache.lookup(QUESTION, "s") is None
+    assert cache.stats()["invalidations"] == 1